@@ -0,0 +1,29 @@
+"""user survey result survey_id user_id index
+
+Revision ID: c896d12af8ef
+Revises: 72e7f0f121a7
+Create Date: 2026-10-17 10:12:41.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c896d12af8ef'
+down_revision: Union[str, None] = '72e7f0f121a7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # CONCURRENTLY нельзя выполнять внутри транзакции
+    with op.get_context().autocommit_block():
+        op.create_index('ix_user_survey_result_table_survey_id_user_id', 'user_survey_result_table', ['survey_id', 'user_id'], unique=False, postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_user_survey_result_table_survey_id_user_id', table_name='user_survey_result_table', postgresql_concurrently=True, if_exists=True)
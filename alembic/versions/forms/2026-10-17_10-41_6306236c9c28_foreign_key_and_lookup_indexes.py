@@ -0,0 +1,63 @@
+"""foreign key and lookup indexes
+
+Revision ID: 6306236c9c28
+Revises: c896d12af8ef
+Create Date: 2026-10-17 10:41:07.552918
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6306236c9c28'
+down_revision: Union[str, None] = 'c896d12af8ef'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Индексы по первичным ключам дублируют индекс самого PRIMARY KEY
+PRIMARY_KEY_INDEXES: list[tuple[str, str]] = [
+    ('ix_user_table_id', 'user_table'),
+    ('ix_survey_table_id', 'survey_table'),
+    ('ix_question_table_id', 'question_table'),
+    ('ix_question_answer_table_id', 'question_answer_table'),
+    ('ix_user_survey_result_table_id', 'user_survey_result_table'),
+    ('ix_user_question_result_table_id', 'user_question_result_table'),
+    ('ix_user_answer_result_table_id', 'user_answer_result_table'),
+    ('ix_code_table_id', 'code_table'),
+    ('ix_survey_document_table_id', 'survey_document_table'),
+]
+
+LOOKUP_INDEXES: list[tuple[str, str, list[str]]] = [
+    ('ix_user_table_email', 'user_table', ['email']),
+    ('ix_survey_table_user_id', 'survey_table', ['user_id']),
+    ('ix_question_table_survey_id', 'question_table', ['survey_id']),
+    ('ix_question_answer_table_question_id', 'question_answer_table', ['question_id']),
+    ('ix_user_survey_result_table_user_id', 'user_survey_result_table', ['user_id']),
+    ('ix_user_question_result_table_user_survey_result_id', 'user_question_result_table', ['user_survey_result_id']),
+    ('ix_user_answer_result_table_user_question_result_id', 'user_answer_result_table', ['user_question_result_id']),
+    ('ix_survey_document_table_survey_id', 'survey_document_table', ['survey_id']),
+    ('ix_code_table_email_code_expire_datetime', 'code_table', ['email', 'code', 'expire_datetime']),
+]
+
+
+def upgrade() -> None:
+    # CONCURRENTLY нельзя выполнять внутри транзакции
+    with op.get_context().autocommit_block():
+        for index_name, table_name, columns in LOOKUP_INDEXES:
+            op.create_index(index_name, table_name, columns, unique=False, postgresql_concurrently=True, if_not_exists=True)
+
+        for index_name, table_name in PRIMARY_KEY_INDEXES:
+            op.drop_index(index_name, table_name=table_name, postgresql_concurrently=True, if_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for index_name, table_name in PRIMARY_KEY_INDEXES:
+            op.create_index(index_name, table_name, ['id'], unique=False, postgresql_concurrently=True, if_not_exists=True)
+
+        for index_name, table_name, columns in LOOKUP_INDEXES:
+            op.drop_index(index_name, table_name=table_name, postgresql_concurrently=True, if_exists=True)
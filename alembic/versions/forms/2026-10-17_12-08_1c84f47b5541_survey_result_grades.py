@@ -0,0 +1,31 @@
+"""survey result grades
+
+Revision ID: 1c84f47b5541
+Revises: b29ad85c8b09
+Create Date: 2026-10-17 12:08:15.730246
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1c84f47b5541'
+down_revision: Union[str, None] = 'b29ad85c8b09'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Существующие ответы проверяются задачей backfill_survey_grades
+    op.add_column('user_survey_result_table', sa.Column('score', sa.Integer(), nullable=True))
+    op.add_column('user_question_result_table', sa.Column('is_correct', sa.Boolean(), server_default=sa.false(), nullable=False))
+    op.add_column('user_question_result_table', sa.Column('score', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('user_question_result_table', 'score')
+    op.drop_column('user_question_result_table', 'is_correct')
+    op.drop_column('user_survey_result_table', 'score')
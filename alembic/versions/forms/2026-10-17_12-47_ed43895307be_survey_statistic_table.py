@@ -0,0 +1,39 @@
+"""survey statistic table
+
+Revision ID: ed43895307be
+Revises: 1c84f47b5541
+Create Date: 2026-10-17 12:47:52.160375
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'ed43895307be'
+down_revision: Union[str, None] = '1c84f47b5541'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('survey_statistic_table',
+    sa.Column('survey_id', sa.Uuid(), nullable=False),
+    sa.Column('response_count', sa.Integer(), nullable=False),
+    sa.Column('statistic', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+    sa.Column('refresh_statistic_datetime', sa.DateTime(), nullable=False),
+    sa.Column('id', sa.Uuid(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['survey_id'], ['survey_table.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('survey_id'),
+    if_not_exists=True
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('survey_statistic_table')
@@ -0,0 +1,29 @@
+"""user survey result survey_id user_id index
+
+Revision ID: 4907756463e2
+Revises: 6f7f180e2607
+Create Date: 2026-10-17 10:12:53.604127
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4907756463e2'
+down_revision: Union[str, None] = '6f7f180e2607'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # CONCURRENTLY нельзя выполнять внутри транзакции
+    with op.get_context().autocommit_block():
+        op.create_index('ix_user_survey_result_table_survey_id_user_id', 'user_survey_result_table', ['survey_id', 'user_id'], unique=False, postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_user_survey_result_table_survey_id_user_id', table_name='user_survey_result_table', postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,39 @@
+"""survey document incremental refresh state
+
+Revision ID: 6ebc5af05b44
+Revises: 67af2a6f0dd6
+Create Date: 2026-10-17 11:26:47.215530
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6ebc5af05b44'
+down_revision: Union[str, None] = '67af2a6f0dd6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('survey_document_table', sa.Column('last_survey_result_created_at', sa.DateTime(), nullable=True))
+    op.add_column('survey_document_table', sa.Column('last_survey_result_id', sa.Uuid(), nullable=True))
+    op.add_column('survey_document_table', sa.Column('rows_file_size', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('survey_document_table', sa.Column('survey_definition_hash', sa.String(), nullable=True))
+
+    # CONCURRENTLY нельзя выполнять внутри транзакции
+    with op.get_context().autocommit_block():
+        op.create_index('ix_user_survey_result_table_survey_id_created_at_id', 'user_survey_result_table', ['survey_id', 'created_at', 'id'], unique=False, postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_user_survey_result_table_survey_id_created_at_id', table_name='user_survey_result_table', postgresql_concurrently=True, if_exists=True)
+
+    op.drop_column('survey_document_table', 'survey_definition_hash')
+    op.drop_column('survey_document_table', 'rows_file_size')
+    op.drop_column('survey_document_table', 'last_survey_result_id')
+    op.drop_column('survey_document_table', 'last_survey_result_created_at')
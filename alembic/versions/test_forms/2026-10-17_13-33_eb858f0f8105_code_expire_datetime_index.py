@@ -0,0 +1,29 @@
+"""code expire_datetime index
+
+Revision ID: eb858f0f8105
+Revises: a26e50ba1d18
+Create Date: 2026-10-17 13:33:08.512733
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'eb858f0f8105'
+down_revision: Union[str, None] = 'a26e50ba1d18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Истекшие коды удаляются пачками по этому индексу, без полного прохода по таблице
+    with op.get_context().autocommit_block():
+        op.create_index('ix_code_table_expire_datetime', 'code_table', ['expire_datetime'], unique=False, postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_code_table_expire_datetime', table_name='code_table', postgresql_concurrently=True, if_exists=True)
@@ -1,4 +1,5 @@
 import os
+import socket
 
 from dotenv import load_dotenv
 
@@ -22,29 +23,92 @@ EMAIL_LOGIN = os.environ.get("EMAIL_LOGIN")
 EMAIL_SMTP_HOST = os.environ.get("EMAIL_SMTP_HOST")
 EMAIL_SMTP_PORT = int(os.environ.get("EMAIL_SMTP_PORT"))
 EMAIL_PASSWORD = os.environ.get("EMAIL_PASSWORD")
+EMAIL_SMTP_POOL_SIZE = int(os.environ.get("EMAIL_SMTP_POOL_SIZE", 4)) # Сколько SMTP соединений держит один процесс воркера
+EMAIL_QUEUE_KEY = "email_queue"
+EMAIL_RETRY_QUEUE_KEY = "email_retry_queue"
+EMAIL_BATCH_SCHEDULED_KEY = "email_batch_scheduled"
+EMAIL_STATUS_KEY_PREFIX = "email_status:"
+EMAIL_BATCH_SIZE = 100 # Сколько писем берется из очереди за раз
+EMAIL_BATCH_WINDOW_MS = 200 # Сколько копятся письма перед отправкой пачки
+EMAIL_MAX_ATTEMPTS = 3
+EMAIL_RETRY_DELAY_SECONDS = 30
+EMAIL_STATUS_EXPIRES_SECONDS = 24 * 60 * 60
 
 # CELERY 
 CELERY_WORKER_COUNT = 1
+CELERY_DATABASE_POOL_SIZE = 2 # Процесс воркера выполняет одну задачу за раз, большой пул ему не нужен
+CELERY_IO_QUEUE = "io" # Очередь I/O задач для асинхронного воркера
+CELERY_IO_DEAD_LETTER_QUEUE = "io.dead_letter" # Сообщения, которые асинхронный воркер не смог разобрать или не знает задачу
+CELERY_IO_PROCESSING_QUEUE_PREFIX = "io.processing:" # + имя воркера: сообщения, которые воркер выполняет сейчас
+CELERY_IO_SCHEDULED_QUEUE = "io.scheduled" # Сообщения с eta в будущем: sorted set по времени запуска
+# I/O задачи из fastapp.tasks.celery_tasks: по этому списку строятся task_routes и задачи асинхронного воркера
+CELERY_IO_TASKS = ("send_mail", "send_queued_emails", "delete_codes_by_email", "delete_expired_codes")
+
+# ASYNC WORKER
+ASYNC_WORKER_ENABLED = (os.environ.get("ASYNC_WORKER_ENABLED") == "True") # I/O задачи уходят в CELERY_IO_QUEUE
+ASYNC_WORKER_CONCURRENCY = int(os.environ.get("ASYNC_WORKER_CONCURRENCY", 200))
+ASYNC_WORKER_DATABASE_POOL_SIZE = 20
+# После перезапуска воркер с тем же именем возвращает в очередь сообщения, которые выполнял до падения
+ASYNC_WORKER_NAME = os.environ.get("ASYNC_WORKER_NAME") or socket.gethostname()
 CELERY_BROKER_URL = os.environ.get("CELERY_BROKER_URL")
 CELERY_BACKEND_URL = os.environ.get("CELERY_BACKEND_URL")
 
+# REDIS
+# Обязательна: в Redis лежат отозванные refresh токены, коды, очередь писем и кэш опросов
+REDIS_URL = os.environ.get("REDIS_URL") or CELERY_BROKER_URL
+
+if not REDIS_URL:
+    raise ValueError("REDIS_URL (or CELERY_BROKER_URL) is not set")
+
 # CODE
 CODE_EXPIRES_IN_MINUTES = int(os.environ.get("CODE_EXPIRES_IN_MINUTES"))
 MAX_EXISTING_CODE_COUNT = int(os.environ.get("MAX_EXISTING_CODE_COUNT"))
 VERIFICATION_CODE_LENGTH = int(os.environ.get("VERIFICATION_CODE_LENGTH"))
 VERIFICATION_CODE_ONLY_DIGITS = (os.environ.get("VERIFICATION_CODE_ONLY_DIGITS")  ==  "True")
+CODE_STORE_BACKEND = os.environ.get("CODE_STORE_BACKEND", "redis") # redis или database
+CODE_ADVISORY_LOCK_ID = 1 # Первый ключ pg_advisory_xact_lock при создании кода, второй - хэш email
+CODE_EXPIRY_BATCH_SIZE = 1000 # Сколько истекших кодов удаляется одной транзакцией
+CODE_EXPIRY_IDLE_KEY = "code_expiry_idle"
+CODE_EXPIRY_IDLE_BACKOFF_SECONDS = 5 * 60 # Пауза в очистке, если прошлый проход ничего не удалил
 
 # SURVEY DOCUMENT
-WAIT_BEFORE_REFRESH_DOCUMENT_MINUTES = 30
+WAIT_BEFORE_REFRESH_DOCUMENT_MINUTES = 1 # Обновление дописывает только новые прохождения, поэтому его можно запускать часто
+SURVEY_DOCUMENT_XLSX_REBUILD_MINUTES = 30 # xlsx не дописывается, а пересобирается целиком, поэтому реже
 SURVEY_DOCUMENT_SAVE_PATH="fastapp/media/survey_documents/"
+SURVEY_DOCUMENT_REFRESH_LAG_SECONDS = 60 # Ответы моложе этого ещё могут быть не закоммичены и в документ не попадают
+SURVEY_DOCUMENT_STREAM_CHUNK_SIZE = 1000 # Сколько строк ответов читается из базы за раз
+
+# SURVEY CACHE
+SURVEY_CACHE_LOCAL_MAX_SIZE = 1000 # Сколько опросов хранится в памяти процесса
+SURVEY_CACHE_LOCAL_TTL_SECONDS = 5 # Локальный кэш не очищается из других процессов, поэтому живет недолго
+SURVEY_CACHE_REDIS_TTL_SECONDS = 10 * 60
+SURVEY_SCORER_CACHE_MAX_SIZE = 1000 # Сколько проверяющих ответы объектов хранится в памяти процесса
+SURVEY_SCORER_CACHE_TTL_SECONDS = 60 # Правильные ответы меняются только вне API, перепроверка опроса подхватывается через минуту
+
+# SURVEY RESULTS
+SURVEY_RESULTS_PAGE_SIZE = 100
+SURVEY_RESULTS_MAX_PAGE_SIZE = 1000
+
+# SURVEY STATISTIC
+SURVEY_STATISTIC_REFRESH_SECONDS = 60 # Как часто пересчитывается статистика опроса
 
 # JWT
 JWT_SECRET = os.environ.get("JWT_SECRET")
 JWT_ALGORITHM = os.environ.get("JWT_ALGORITHM")
-ACCESS_TOKEN_EXPIRES_MINUTES = 15 * 8 # 2 hours
+ACCESS_TOKEN_EXPIRES_MINUTES = 15 # Короткий срок: refresh токены ротируются и отзываются
 REFRESH_TOKEN_EXPIRES_MINUTES = 15 * 24 * 60  # 15 days
+# Токены без claim type выдавались до разделения access и refresh, access жил 2 часа.
+# Такие токены различаются по сроку жизни и исчезают сами через REFRESH_TOKEN_EXPIRES_MINUTES после выкладки
+LEGACY_ACCESS_TOKEN_EXPIRES_MINUTES = 15 * 8
 REFRESH_COOKIE_NAME = "refresh"
+REVOKED_REFRESH_TOKEN_KEY_PREFIX = "revoked_refresh_token:"
+AUTH_TOKEN_CACHE_MAX_SIZE = 10000 # Сколько проверенных access токенов хранится в памяти процесса
+AUTH_USER_CACHE_MAX_SIZE = 10000
+AUTH_USER_CACHE_TTL_SECONDS = 30 # Кэш пользователей не очищается из других процессов, поэтому живет недолго
 SUB = "sub"
 EXP = "exp"
 IAT = "iat"
-JTI = "jti"
\ No newline at end of file
+JTI = "jti"
+TOKEN_TYPE = "type"
+ACCESS_TOKEN_TYPE = "access"
+REFRESH_TOKEN_TYPE = "refresh"
\ No newline at end of file
@@ -4,7 +4,7 @@ from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.ext.asyncio import AsyncSession
 
 import config
-from fastapp import dependencies, models, schemas, crud, exceptions
+from fastapp import dependencies, models, schemas, crud, exceptions, codes, emails
 from fastapp.database import get_db
 from fastapp.tasks import celery_tasks
 
@@ -18,16 +18,31 @@ oauth2_schema = OAuth2PasswordBearer(tokenUrl="login")
 async def send_code(email_schema: schemas.Email, db: AsyncSession = Depends(get_db)) -> JSONResponse:
     email: str = email_schema.email
     try:
-        code = await crud.create_code(db, email)
+        code = await codes.code_store.create_code(db, email)
     except exceptions.CodeMoreThanExisting:
         raise exceptions.AuthFailedException(detail="Code has already sent. Try later")
 
     message_title = f"Verifying on {config.PROJECT_TITLE}"
     message_body = f"Activation Code:\n{code}"
 
-    celery_tasks.send_mail.delay(email, message_title, message_body)
+    # Письма копятся в очереди и уходят пачкой, задача планируется одна на окно
+    mail_id, is_batch_scheduled = await emails.enqueue_email(email, message_title, message_body)
 
-    return JSONResponse({"status": "success"})
+    if is_batch_scheduled:
+        celery_tasks.send_queued_emails.apply_async(countdown=config.EMAIL_BATCH_WINDOW_MS / 1000)
+
+    return JSONResponse({"status": "success", "mail_id": mail_id})
+
+
+@router.get("/send_code/{mail_id}", status_code=status.HTTP_200_OK)
+async def get_send_code_status(mail_id: str) -> JSONResponse:
+    # queued, sent, retrying, failed или coalesced (вместо письма отправлен более новый код)
+    mail_status: str | None = await emails.get_email_status(mail_id)
+
+    if mail_status is None:
+        raise exceptions.NotFoundException(detail="Mail not found")
+
+    return JSONResponse({"status": mail_status})
 
 
 
@@ -38,14 +53,12 @@ async def register(response: Response, user_schema: schemas.UserCreate, db: Asyn
     if user:
         raise exceptions.AuthFailedException(detail="Email is already registered")
      
-    code: models.Code | None = await crud.get_code_by_user_email_and_code(db, user_schema.email, user_schema.code)
-
-    if not code:
+    if not await codes.code_store.check_code(db, user_schema.email, user_schema.code):
         raise exceptions.AuthFailedException(detail="Incorrect code")
     
     user: models.User = await crud.create_user(db, user_schema)
 
-    celery_tasks.delete_codes_by_email.delay(user.email)
+    await codes.code_store.delete_codes(db, user.email)
 
     token_pair: schemas.TokenPair = dependencies.create_token_pair(user_id=user.id)
     dependencies.add_refresh_token_cookie(response=response, token=token_pair.refresh.token)
@@ -61,12 +74,10 @@ async def login(response: Response, user_login: schemas.UserLogin, db: AsyncSess
     if not user:
         raise exceptions.NotFoundException("Account isn't registered. Please register first.")
     
-    code: models.User | None = await crud.get_code_by_user_email_and_code(db, user_login.email, user_login.code)
-
-    if not code:
+    if not await codes.code_store.check_code(db, user_login.email, user_login.code):
         raise exceptions.AuthFailedException("Incorrect code")
 
-    celery_tasks.delete_codes_by_email.delay(user.email)
+    await codes.code_store.delete_codes(db, user.email)
 
     token_pair: schemas.TokenPair  = dependencies.create_token_pair(user_id=user.id)
     dependencies.add_refresh_token_cookie(response=response, token=token_pair.refresh.token)
@@ -75,15 +86,22 @@ async def login(response: Response, user_login: schemas.UserLogin, db: AsyncSess
 
 
 @router.post("/refresh_token", response_model=schemas.JwtTokenGet)
-async def refresh_token(refresh_token: str | None = Cookie()):
+async def refresh_token(response: Response, refresh_token: str | None = Cookie()):
     if not refresh_token:
         raise exceptions.BadRequestException(detail="refresh token required")
 
-    jwt_token: schemas.JwtTokenGet = dependencies.refresh_token_state(token=refresh_token)
+    token_pair: schemas.TokenPair = await dependencies.rotate_refresh_token(token=refresh_token)
+    dependencies.add_refresh_token_cookie(response=response, token=token_pair.refresh.token)
 
-    return jwt_token
+    return token_pair.access
 
 
 @router.post("/logout")
-async def logout(response: Response, ) -> JSONResponse:
+async def logout(response: Response, refresh_token: str | None = Cookie(None)) -> JSONResponse:
+    if refresh_token:
+        try:
+            await dependencies.revoke_refresh_token(dependencies.decode_refresh_token(refresh_token))
+        except exceptions.AuthFailedException:
+            pass # Просроченный или чужой токен отзывать не нужно
+
     dependencies.remove_refresh_token_from_cookie(response)
@@ -1,19 +1,21 @@
+import os
 import uuid
 import datetime
 
-from fastapi import APIRouter, Query, Depends, HTTPException, status, Header
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi import APIRouter, Query, Depends, HTTPException, status, Header, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
 import config
 from fastapp.database import get_db
 from fastapp.tasks import celery_tasks
-from fastapp import dependencies, exceptions, schemas, crud, models
+from fastapp import dependencies, exceptions, schemas, crud, models, cache, scoring
 
 router = APIRouter(prefix="/v1", tags=["v1"])
 
 
-@router.get("/survey", response_model=list[schemas.SurveyGet])
+@router.get("/survey", response_model=list[schemas.SurveyOwnerGet])
 async def get_my_surveys(user: models.User = Depends(dependencies.get_user_from_access_token), db: AsyncSession = Depends(get_db)) -> JSONResponse:
     surveys: list[models.Survey] = await crud.get_surveys_by_user_id(db, user.id)
     
@@ -37,38 +39,94 @@ async def create_survey(survey_schema: schemas.SurveyCreate, user: models.User =
 
 
 @router.get("/survey/{survey_id}/", response_model=schemas.SurveyGet)
-async def get_survey_by_id(survey_id: uuid.UUID, authorization: str | None = Header(None), db: AsyncSession = Depends(get_db)) -> JSONResponse:
-    survey: models.Survey | None = await crud.get_survey_by_id(db, survey_id, load_user_answers=True)
-    
-    await dependencies.check_survey_is_valid(db, survey, authorization)
+async def get_survey_by_id(survey_id: uuid.UUID, authorization: str | None = Header(None), if_none_match: str | None = Header(None), db: AsyncSession = Depends(get_db)) -> Response:
+    cached_survey: cache.CachedSurvey | None = await dependencies.get_cached_survey(db, survey_id)
+
+    if cached_survey is None:
+        raise exceptions.NotFoundException(detail="Survey not found")
+
+    await dependencies.check_survey_is_valid(db, cached_survey, authorization)
+
+    headers: dict[str, str] = {"ETag": cached_survey.etag, "Cache-Control": "no-cache"}
+
+    if dependencies.is_etag_matched(if_none_match, cached_survey.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    # Тело уже сериализовано SurveyGet, повторная валидация не нужна
+    return Response(content=cached_survey.payload, media_type="application/json", headers=headers)
+
 
-    return survey
+@router.get("/survey/{survey_id}/answer", response_model=list[schemas.UserSurveyResultOwnerGet])
+async def get_answers_for_survey(survey_id: uuid.UUID, response: Response, cursor: str | None = Query(None), limit: int = Query(config.SURVEY_RESULTS_PAGE_SIZE, ge=1, le=config.SURVEY_RESULTS_MAX_PAGE_SIZE), user: models.User = Depends(dependencies.get_user_from_access_token), db: AsyncSession = Depends(get_db)) -> JSONResponse:
+    return await _get_survey_results_page(db, response, survey_id, user, cursor, limit, load_questions=True)
 
 
-@router.get("/survey/{survey_id}/answer", response_model=list[schemas.UserSurveyResultGet])
-async def get_answers_for_survey(survey_id: uuid.UUID, user: models.User = Depends(dependencies.get_user_from_access_token), db: AsyncSession = Depends(get_db)) -> JSONResponse:
-    survey: models.Survey = await crud.get_survey_by_id(db, survey_id, load_user_answers=True)
+@router.get("/survey/{survey_id}/answer/compact", response_model=list[schemas.UserSurveyResultCompactGet])
+async def get_compact_answers_for_survey(survey_id: uuid.UUID, response: Response, cursor: str | None = Query(None), limit: int = Query(config.SURVEY_RESULTS_PAGE_SIZE, ge=1, le=config.SURVEY_RESULTS_MAX_PAGE_SIZE), user: models.User = Depends(dependencies.get_user_from_access_token), db: AsyncSession = Depends(get_db)) -> JSONResponse:
+    return await _get_survey_results_page(db, response, survey_id, user, cursor, limit, load_questions=False)
+
+
+async def _get_survey_results_page(db: AsyncSession, response: Response, survey_id: uuid.UUID, user: models.User, cursor: str | None, limit: int, load_questions: bool) -> list[models.UserSurveyResult]:
+    survey: models.Survey | None = await crud.get_survey_by_id(db, survey_id)
+
+    if not survey:
+        raise exceptions.NotFoundException(detail="Survey not found")
 
     if survey.user_id != user.id:
         raise exceptions.NotAllowedException(detail="You are not the creator of this survey")
-    
-    user_servey_results: list[models.UserSurveyResult] = survey.user_survey_results
+
+    after: tuple[datetime.datetime, uuid.UUID] | None = dependencies.decode_survey_results_cursor(cursor) if cursor else None
+
+    user_servey_results: list[models.UserSurveyResult] = await crud.get_survey_results_by_survey_id(db, survey_id, after, limit, load_questions)
+
+    # Курсор следующей страницы передается в заголовке, тело ответа остается списком
+    if len(user_servey_results) == limit:
+        response.headers["X-Next-Cursor"] = dependencies.encode_survey_results_cursor(user_servey_results[-1])
 
     return user_servey_results
 
 
+@router.get("/survey/{survey_id}/answer/export")
+async def export_answers_for_survey(survey_id: uuid.UUID, export_format: schemas.SurveyResultsExportFormatEnum = Query(schemas.SurveyResultsExportFormatEnum.ndjson, alias="format"), user: models.User = Depends(dependencies.get_user_from_access_token), db: AsyncSession = Depends(get_db)) -> StreamingResponse:
+    survey: models.Survey | None = await crud.get_survey_by_id(db, survey_id)
+
+    if not survey:
+        raise exceptions.NotFoundException(detail="Survey not found")
+
+    if survey.user_id != user.id:
+        raise exceptions.NotAllowedException(detail="You are not the creator of this survey")
+
+    media_types: dict[str, str] = {
+        schemas.SurveyResultsExportFormatEnum.ndjson: "application/x-ndjson",
+        schemas.SurveyResultsExportFormatEnum.csv: "text/csv",
+    }
+
+    return StreamingResponse(
+        dependencies.stream_survey_results_export(survey_id, export_format),
+        media_type=media_types[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{survey_id}.{export_format.value}"'}
+    )
+
+
 @router.post("/survey/{survey_id}/answer", response_model=schemas.UserSurveyResultId)
 async def send_answer_for_survey(survey_id: uuid.UUID, survey_result_create_schema: schemas.UserSurveyResultCreate, authorization: str | None = Header(None), db: AsyncSession = Depends(get_db)) -> JSONResponse:
-    user: models.User | None = None
     user_id: uuid.UUID | None = None
-    survey: models.Survey = await crud.get_survey_by_id(db, survey_id, load_user_answers=True)
+    cached_survey: cache.CachedSurvey | None = await dependencies.get_cached_survey(db, survey_id)
+
+    if cached_survey is None:
+        raise exceptions.NotFoundException(detail="Survey not found")
     
-    await dependencies.check_survey_is_valid(db, survey, authorization)
+    user: models.User | None = await dependencies.check_survey_is_valid(db, cached_survey, authorization)
     
     if user:
         user_id: uuid.UUID = user.id
 
-    survey_result_id: uuid.UUID = await crud.create_answer_for_survey(db, user_id, survey_id, survey_result_create_schema)
+    survey_scorer: scoring.SurveyScorer | None = await dependencies.get_survey_scorer(db, survey_id)
+
+    if survey_scorer is None:
+        raise exceptions.NotFoundException(detail="Survey not found")
+
+    survey_result_id: uuid.UUID = await crud.create_answer_for_survey(db, user_id, survey_id, survey_scorer, survey_result_create_schema)
 
     survey_result_id_schema = schemas.UserSurveyResultId(survey_result_id=survey_result_id)
 
@@ -77,7 +135,7 @@ async def send_answer_for_survey(survey_id: uuid.UUID, survey_result_create_sche
 
 @router.post("/survey/{survey_id}/document/refresh")
 async def refresh_survey_document(survey_id: uuid.UUID, user: models.User = Depends(dependencies.get_user_from_access_token), db: AsyncSession = Depends(get_db)) -> JSONResponse:
-    survey: models.Survey = await crud.get_survey_by_id(db, survey_id, load_user_answers=True)
+    survey: models.Survey = await crud.get_survey_by_id(db, survey_id)
    
     if survey.user_id != user.id:
         raise exceptions.NotAllowedException(detail="You are not the creator of this survey")
@@ -102,22 +160,85 @@ async def refresh_survey_document(survey_id: uuid.UUID, user: models.User = Depe
 
 
 @router.get("/survey/{survey_id}/document/download")
-async def download_survey_document(survey_id: uuid.UUID, user: models.User = Depends(dependencies.get_user_from_access_token), db: AsyncSession = Depends(get_db)) -> FileResponse:
-    survey: models.Survey = await crud.get_survey_by_id(db, survey_id, load_user_answers=True, load_document_survey=True)
-    
+async def download_survey_document(survey_id: uuid.UUID, document_format: schemas.SurveyDocumentFormatEnum = Query(schemas.SurveyDocumentFormatEnum.xlsx, alias="format"), user: models.User = Depends(dependencies.get_user_from_access_token), db: AsyncSession = Depends(get_db)) -> FileResponse:
+    survey: models.Survey | None = await crud.get_survey_by_id(db, survey_id, load_document_survey=True)
+
+    if not survey:
+        raise exceptions.NotFoundException(detail="Survey not found")
+
     if survey.user_id != user.id:
         raise exceptions.NotAllowedException(detail="You are not the creator of this survey")
 
+    if survey.document is None:
+        raise exceptions.NotFoundException(detail="Document not found. Refresh the document")
+
     survey_document_filename: str = survey.document.title
-    survey_document_path: str = f"{config.SURVEY_DOCUMENT_SAVE_PATH}/{survey_document_filename}.xlsx"
+    survey_document_path: str = f"{config.SURVEY_DOCUMENT_SAVE_PATH}/{survey_document_filename}.{document_format.value}"
+
+    # parquet дописывается частями, один файл собирается из них при скачивании, если части изменились
+    if document_format == schemas.SurveyDocumentFormatEnum.parquet:
+        await run_in_threadpool(dependencies.get_survey_parquet_parts(survey_document_filename).merge, survey_document_path)
+
+    # Документ еще не собран или собран до появления этого формата
+    if not os.path.exists(survey_document_path):
+        raise exceptions.NotFoundException(detail="Document not found. Refresh the document")
+
+    media_types: dict[str, str] = {
+        schemas.SurveyDocumentFormatEnum.xlsx: "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        schemas.SurveyDocumentFormatEnum.parquet: "application/vnd.apache.parquet",
+    }
+
+    return FileResponse(path=survey_document_path, filename=f"{survey_document_filename}.{document_format.value}", media_type=media_types[document_format])
+
+
+@router.get("/survey/{survey_id}/statistics", response_model=schemas.SurveyStatisticGet)
+async def get_survey_statistics(survey_id: uuid.UUID, user: models.User = Depends(dependencies.get_user_from_access_token), db: AsyncSession = Depends(get_db)) -> JSONResponse:
+    survey: models.Survey | None = await crud.get_survey_by_id(db, survey_id)
+
+    if not survey:
+        raise exceptions.NotFoundException(detail="Survey not found")
+
+    if survey.user_id != user.id:
+        raise exceptions.NotAllowedException(detail="You are not the creator of this survey")
+
+    survey_statistic: models.SurveyStatistic | None = await crud.get_survey_statistic_by_survey_id(db, survey_id)
+
+    if survey_statistic is None:
+        if await crud.create_survey_statistic(db, survey_id) is not None:
+            celery_tasks.refresh_survey_statistic.delay(survey_id)
+
+        return JSONResponse({"status": "Statistics are being calculated. Try later"}, status_code=status.HTTP_202_ACCEPTED)
+
+    survey_statistic_schema: schemas.SurveyStatisticGet | None = None
 
-    return FileResponse(path=survey_document_path, filename=survey_document_filename, media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+    if survey_statistic.statistic is not None:
+        survey_statistic_schema = schemas.SurveyStatisticGet(
+            survey_id=survey_id,
+            response_count=survey_statistic.response_count,
+            questions=survey_statistic.statistic["questions"],
+            score_histogram=survey_statistic.statistic["score_histogram"],
+            updated_at=survey_statistic.updated_at
+        )
+
+    # Отдаем сохраненную статистику, а устаревшую пересчитываем в фоне
+    if survey_statistic.refresh_statistic_datetime < datetime.datetime.now():
+        celery_tasks.refresh_survey_statistic.delay(survey_id)
+        await crud.update_survey_statistic_refresh_datetime_by_id(db, survey_statistic.id)
+
+    if survey_statistic_schema is None:
+        return JSONResponse({"status": "Statistics are being calculated. Try later"}, status_code=status.HTTP_202_ACCEPTED)
+
+    return survey_statistic_schema
 
 
 @router.post("/survey/{survey_id}/finish")
 async def finish_survey(survey_id: uuid.UUID, user: models.User = Depends(dependencies.get_user_from_access_token), db: AsyncSession = Depends(get_db)) -> JSONResponse:
-    survey: models.Survey = await crud.get_survey_by_id(db, survey_id, load_user_answers=True, load_document_survey=True)
-    
+    # Нужен только владелец опроса, ответы и документ не загружаем
+    survey: models.Survey | None = await crud.get_survey_by_id(db, survey_id)
+
+    if not survey:
+        raise exceptions.NotFoundException(detail="Survey not found")
+
     if survey.user_id != user.id:
         raise exceptions.NotAllowedException(detail="You are not the creator of this survey")
 
@@ -0,0 +1,144 @@
+import json
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+from redis import asyncio as aioredis
+from redis.exceptions import RedisError
+
+import config
+from fastapp.redis_client import redis_client
+
+
+class LocalTTLCache:
+    """LRU кэш внутри процесса, записи живут не дольше ttl_seconds."""
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._items: OrderedDict[object, tuple[float, object]] = OrderedDict()
+
+    def get(self, key: object) -> object | None:
+        item: tuple[float, object] | None = self._items.get(key)
+
+        if item is None:
+            return None
+
+        expire_time, value = item
+
+        if expire_time < time.monotonic():
+            del self._items[key]
+            return None
+
+        self._items.move_to_end(key)
+
+        return value
+
+    def set(self, key: object, value: object, ttl_seconds: float | None = None):
+        self._items[key] = (time.monotonic() + (self.ttl_seconds if ttl_seconds is None else ttl_seconds), value)
+        self._items.move_to_end(key)
+
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+    def delete(self, key: object):
+        self._items.pop(key, None)
+
+
+class CachedSurvey:
+    """Готовый JSON SurveyGet и поля опроса, нужные для проверки доступа."""
+
+    def __init__(self, payload: bytes):
+        self.payload = payload
+
+        survey: dict = json.loads(payload)
+        self.id = uuid.UUID(survey["id"])
+        self.user_id = uuid.UUID(survey["user_id"])
+        self.is_anonim: bool = survey["is_anonim"]
+        self.send_multiple_times: bool = survey["send_multiple_times"]
+        self.expire_datetime: datetime | None = datetime.fromisoformat(survey["expire_datetime"]) if survey["expire_datetime"] else None
+
+        # Версия опроса меняется вместе с updated_at, по ней клиенты и CDN перепроверяют ответ
+        version: str = survey["updated_at"] or survey["created_at"]
+        self.etag: str = f'"{self.id.hex}-{datetime.fromisoformat(version).timestamp():.6f}"'
+
+
+class SurveyCache:
+    """Двухуровневый кэш опубликованных опросов: LRU процесса и Redis.
+
+    Локальный уровень не знает об изменениях в других процессах, поэтому
+    его TTL короткий. Redis очищается явно при изменении даты завершения.
+    Если Redis недоступен, запросы идут в базу как без кэша.
+    """
+
+    def __init__(self, redis: aioredis.Redis | None, local_max_size: int, local_ttl_seconds: float, redis_ttl_seconds: int):
+        self._local_cache = LocalTTLCache(local_max_size, local_ttl_seconds)
+        self._redis = redis
+        self.redis_ttl_seconds = redis_ttl_seconds
+
+    @staticmethod
+    def _get_key(survey_id: uuid.UUID) -> str:
+        return f"survey:{survey_id}"
+
+    async def get(self, survey_id: uuid.UUID) -> CachedSurvey | None:
+        key: str = self._get_key(survey_id)
+        cached_survey: CachedSurvey | None = self._local_cache.get(key)
+
+        if cached_survey is not None or self._redis is None:
+            return cached_survey
+
+        try:
+            payload: bytes | None = await self._redis.get(key)
+        except RedisError:
+            return None
+
+        if payload is None:
+            return None
+
+        cached_survey = CachedSurvey(payload)
+        self._local_cache.set(key, cached_survey)
+
+        return cached_survey
+
+    async def set(self, survey_id: uuid.UUID, payload: bytes) -> CachedSurvey:
+        key: str = self._get_key(survey_id)
+        cached_survey = CachedSurvey(payload)
+
+        self._local_cache.set(key, cached_survey)
+
+        if self._redis is not None:
+            try:
+                await self._redis.set(key, payload, ex=self.redis_ttl_seconds)
+            except RedisError:
+                pass
+
+        return cached_survey
+
+    async def invalidate(self, survey_id: uuid.UUID):
+        key: str = self._get_key(survey_id)
+
+        self._local_cache.delete(key)
+
+        if self._redis is not None:
+            try:
+                await self._redis.delete(key)
+            except RedisError:
+                pass
+
+
+survey_cache = SurveyCache(
+    redis_client,
+    config.SURVEY_CACHE_LOCAL_MAX_SIZE,
+    config.SURVEY_CACHE_LOCAL_TTL_SECONDS,
+    config.SURVEY_CACHE_REDIS_TTL_SECONDS
+)
+
+# Проверка ответов на опрос: survey_id -> SurveyScorer, собирается один раз на опрос, а не на каждую отправку
+survey_scorer_cache = LocalTTLCache(config.SURVEY_SCORER_CACHE_MAX_SIZE, config.SURVEY_SCORER_CACHE_TTL_SECONDS)
+
+# Проверенные access токены: sha256 токена -> payload, запись живет до exp токена
+verified_token_cache = LocalTTLCache(config.AUTH_TOKEN_CACHE_MAX_SIZE, config.ACCESS_TOKEN_EXPIRES_MINUTES * 60)
+
+# Пользователи по sub: поля User, по которым собирается объект без запроса в базу
+user_cache = LocalTTLCache(config.AUTH_USER_CACHE_MAX_SIZE, config.AUTH_USER_CACHE_TTL_SECONDS)
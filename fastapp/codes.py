@@ -0,0 +1,97 @@
+import time
+from abc import ABC, abstractmethod
+
+from redis import asyncio as aioredis
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import config
+from fastapp import crud, dependencies, exceptions
+from fastapp.redis_client import redis_client
+from fastapp.tasks import celery_tasks
+
+
+# Коды email хранятся в одном sorted set: code -> время истечения.
+# Просроченные коды убираются, живые считаются и новый добавляется атомарно
+CREATE_CODE_SCRIPT = """
+redis.call("ZREMRANGEBYSCORE", KEYS[1], "-inf", ARGV[1])
+if redis.call("ZCARD", KEYS[1]) >= tonumber(ARGV[3]) then
+    return 0
+end
+redis.call("ZADD", KEYS[1], ARGV[2], ARGV[4])
+redis.call("EXPIRE", KEYS[1], ARGV[5])
+return 1
+"""
+
+
+class CodeStore(ABC):
+    """Хранилище кодов подтверждения email."""
+
+    @abstractmethod
+    async def create_code(self, db: AsyncSession, email: str) -> str:
+        ...
+
+    @abstractmethod
+    async def check_code(self, db: AsyncSession, email: str, code: str) -> bool:
+        ...
+
+    @abstractmethod
+    async def delete_codes(self, db: AsyncSession, email: str):
+        ...
+
+
+class DatabaseCodeStore(CodeStore):
+    """Коды в code_table, просроченные удаляет задача celery beat."""
+
+    async def create_code(self, db: AsyncSession, email: str) -> str:
+        return await crud.create_code(db, email)
+
+    async def check_code(self, db: AsyncSession, email: str, code: str) -> bool:
+        return await crud.get_code_by_user_email_and_code(db, email, code) is not None
+
+    async def delete_codes(self, db: AsyncSession, email: str):
+        celery_tasks.delete_codes_by_email.delay(email)
+
+
+class RedisCodeStore(CodeStore):
+    """Коды в Redis, истекают по TTL ключа. Каждая операция - один запрос в Redis."""
+
+    def __init__(self, redis: aioredis.Redis):
+        self._redis = redis
+        self._create_code_script = redis.register_script(CREATE_CODE_SCRIPT)
+
+    @staticmethod
+    def _get_key(email: str) -> str:
+        return f"verification_code:{email}"
+
+    async def create_code(self, db: AsyncSession, email: str) -> str:
+        code: str = dependencies.generate_random_string(config.VERIFICATION_CODE_LENGTH, config.VERIFICATION_CODE_ONLY_DIGITS)
+        code_expires_in_seconds: int = config.CODE_EXPIRES_IN_MINUTES * 60
+        now: float = time.time()
+
+        is_created: int = await self._create_code_script(
+            keys=[self._get_key(email)],
+            args=[now, now + code_expires_in_seconds, config.MAX_EXISTING_CODE_COUNT, code, code_expires_in_seconds]
+        )
+
+        if not is_created:
+            raise exceptions.CodeMoreThanExisting()
+
+        return code
+
+    async def check_code(self, db: AsyncSession, email: str, code: str) -> bool:
+        code_expire_time: float | None = await self._redis.zscore(self._get_key(email), code)
+
+        return code_expire_time is not None and code_expire_time >= time.time()
+
+    async def delete_codes(self, db: AsyncSession, email: str):
+        await self._redis.delete(self._get_key(email))
+
+
+def _create_code_store() -> CodeStore:
+    if config.CODE_STORE_BACKEND == "database":
+        return DatabaseCodeStore()
+
+    return RedisCodeStore(redis_client)
+
+
+code_store: CodeStore = _create_code_store()
@@ -1,13 +1,15 @@
 import datetime
 import uuid
+from typing import AsyncIterator
 
-from sqlalchemy import insert, select, delete, update, and_
+from sqlalchemy import insert, select, delete, update, and_, exists, tuple_, func, literal, Row
 from sqlalchemy.orm import selectinload
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.sql._typing import _ColumnExpressionArgument
 
 import config
-from fastapp import models, dependencies, schemas, exceptions
+from fastapp import models, dependencies, schemas, exceptions, scoring, cache
 
 
 # User
@@ -124,18 +126,37 @@ async def create_code(
     db: AsyncSession,
     email: str
 ) -> str:
-    email_codes: list[models.Code] = await get_codes_by_user_email(db, email)
-    if len(email_codes) < config.MAX_EXISTING_CODE_COUNT:
-        code: str = dependencies.generate_random_string(config.VERIFICATION_CODE_LENGTH, config.VERIFICATION_CODE_ONLY_DIGITS)
-        create_code_stmt = insert(models.Code).values(email=email, code=code, expire_datetime=datetime.datetime.now() + datetime.timedelta(minutes=config.CODE_EXPIRES_IN_MINUTES))
+    code: str = dependencies.generate_random_string(config.VERIFICATION_CODE_LENGTH, config.VERIFICATION_CODE_ONLY_DIGITS)
+    now: datetime.datetime = datetime.datetime.now()
 
-        await db.execute(create_code_stmt)
-        await db.commit()
+    # Параллельные запросы одного email ждут друг друга до конца транзакции.
+    # Счетчик проверяется следующим запросом, который в READ COMMITTED уже видит коды, вставленные до снятия блокировки
+    await db.execute(select(func.pg_advisory_xact_lock(config.CODE_ADVISORY_LOCK_ID, func.hashtext(email))))
 
-        return code
-    else:
+    existing_code_count = select(func.count()).select_from(models.Code).where(
+        models.Code.email == email,
+        models.Code.expire_datetime >= now
+    ).scalar_subquery()
+
+    create_code_stmt = insert(models.Code).from_select(
+        ["id", "created_at", "email", "code", "expire_datetime"],
+        select(
+            literal(uuid.uuid4(), models.Code.id.type),
+            literal(now, models.Code.created_at.type),
+            literal(email, models.Code.email.type),
+            literal(code, models.Code.code.type),
+            literal(now + datetime.timedelta(minutes=config.CODE_EXPIRES_IN_MINUTES), models.Code.expire_datetime.type)
+        ).where(existing_code_count < config.MAX_EXISTING_CODE_COUNT)
+    ).returning(models.Code.id)
+
+    code_id: uuid.UUID | None = (await db.execute(create_code_stmt)).scalar_one_or_none()
+    await db.commit()
+
+    if code_id is None:
         raise exceptions.CodeMoreThanExisting()
 
+    return code
+
 
 async def _delete_code(
     db: AsyncSession,
@@ -159,13 +180,23 @@ async def delete_codes_by_email(
 
 
 async def delete_expired_codes(
-    db: AsyncSession
-) -> None:
-    whereclause = (
+    db: AsyncSession,
+    batch_size: int
+) -> int:
+    # Одна пачка по индексу expire_datetime. Строки, заблокированные другими
+    # транзакциями (например, удалением кодов при входе), пропускаются до следующего прохода
+    expired_code_ids_stmt = select(models.Code.id).where(
         models.Code.expire_datetime < datetime.datetime.now()
-    )
+    ).order_by(
+        models.Code.expire_datetime
+    ).limit(batch_size).with_for_update(skip_locked=True)
 
-    return await _delete_code(db, whereclause)
+    delete_expired_codes_stmt = delete(models.Code).where(models.Code.id.in_(expired_code_ids_stmt))
+
+    deleted_count: int = (await db.execute(delete_expired_codes_stmt)).rowcount
+    await db.commit()
+
+    return deleted_count
 
 
 # Survey
@@ -175,29 +206,33 @@ async def create_survey(
     user_id: uuid.UUID,
     survey_schema: schemas.SurveyCreate
 ) -> uuid.UUID:
-    insert_survey_stmt = insert(models.Survey).values(
-        user_id=user_id, **survey_schema.model_dump(exclude={"questions"})
-    ).returning(models.Survey.id)
-
-    survey_model = await db.execute(insert_survey_stmt)
-    survey_id: uuid.UUID = survey_model.scalar()
+    # Id генерируются на клиенте, поэтому вопросы и ответы вставляются
+    # одним многострочным INSERT на таблицу, без RETURNING на каждую строку
+    survey_id: uuid.UUID = uuid.uuid4()
+    question_rows: list[dict] = []
+    answer_rows: list[dict] = []
+
+    for question_schema in survey_schema.questions:
+        question_id: uuid.UUID = uuid.uuid4()
+        question_rows.append(
+            dict(id=question_id, survey_id=survey_id, **question_schema.model_dump(exclude={"answers"}))
+        )
 
-    question_schemas: list[schemas.QuestionCreate] = survey_schema.questions
-    for question_schema in question_schemas:
-        insert_question_stmt = insert(models.Question).values(
-            survey_id=survey_id, **question_schema.model_dump(exclude={"answers"})
-        ).returning(models.Question.id)
+        for answer_schema in question_schema.answers:
+            answer_rows.append(
+                dict(id=uuid.uuid4(), question_id=question_id, **answer_schema.model_dump())
+            )
 
-        question_model = await db.execute(insert_question_stmt)
-        question_id: uuid.UUID = question_model.scalar()
+    insert_survey_stmt = insert(models.Survey).values(
+        id=survey_id, user_id=user_id, **survey_schema.model_dump(exclude={"questions"})
+    )
+    await db.execute(insert_survey_stmt)
 
-        answer_schemas: list[schemas.QuestionAnswerCreate] = question_schema.answers
-        for answer_schema in answer_schemas:
-            insert_answer_stmt = insert(models.QuestionAnswer).values(
-                question_id=question_id, **answer_schema.model_dump()
-            )
+    if question_rows:
+        await db.execute(insert(models.Question), question_rows)
 
-            await db.execute(insert_answer_stmt)
+    if answer_rows:
+        await db.execute(insert(models.QuestionAnswer), answer_rows)
 
     await db.commit()
 
@@ -222,13 +257,13 @@ async def _get_surveys(
             selectinload(models.Survey.user),
             selectinload(models.Survey.questions).
             selectinload(models.Question.answers),
-        ).options(
-            selectinload(models.Survey.user_survey_results).
-            selectinload(models.UserSurveyResult.survey)
         )
 
     if load_user_answers:
         select_surveys_stmt = select_surveys_stmt.options(
+            selectinload(models.Survey.user_survey_results).
+            selectinload(models.UserSurveyResult.survey)
+        ).options(
             selectinload(models.Survey.user_survey_results).
             selectinload(models.UserSurveyResult.user_questions).
             selectinload(models.UserQuestionResult.user_answers),
@@ -295,6 +330,9 @@ async def update_survey_expire_datetime_by_id(
     await db.execute(update_survey_expire_datetime_stmt)
     await db.commit()
 
+    # В кэше лежит старая дата завершения, опрос перечитается из базы
+    await cache.survey_cache.invalidate(survey_id)
+
 
 # Survey Result
 
@@ -302,68 +340,102 @@ async def create_answer_for_survey(
     db: AsyncSession,
     user_id: uuid.UUID | None,
     survey_id: uuid.UUID,
+    survey_scorer: scoring.SurveyScorer,
     survey_result_create_schema: schemas.UserSurveyResultCreate
 ) -> uuid.UUID:
-    survey: models.Survey = await get_survey_by_id(db, survey_id)
+    # Вопросы опроса не читаются из базы: survey_scorer берется из кэша в роуте
+    required_question_ids: set[uuid.UUID] = set(survey_scorer.required_question_ids)
+
+    question_result_schemas: list[schemas.UserQuestionsResultCreate] = survey_result_create_schema.user_questions
+
+    # Ответы проверяются один раз при сохранении
+    respondent_grade: scoring.RespondentGrade = survey_scorer.grade_respondent([
+        (question_result_schema.question_id, [answer_result_schema.text for answer_result_schema in question_result_schema.user_answers])
+        for question_result_schema in question_result_schemas
+    ])
+
+    survey_result_id: uuid.UUID = uuid.uuid4()
+    question_result_rows: list[dict] = []
+    answer_result_rows: list[dict] = []
+
+    for question_result_schema, question_grade in zip(question_result_schemas, respondent_grade.question_grades):
+        question_result_id: uuid.UUID = uuid.uuid4()
+        question_result_rows.append(
+            dict(
+                id=question_result_id, user_survey_result_id=survey_result_id,
+                is_correct=question_grade.is_correct, score=question_grade.score,
+                **question_result_schema.model_dump(exclude={"user_answers"})
+            )
+        )
 
-    if survey:
-        required_question_ids: list[uuid.UUID] = [question.id for question in survey.questions if question.is_required]
-        
-        insert_survey_result_stmt = insert(models.UserSurveyResult).values(
-            user_id=user_id, survey_id=survey_id
-        ).returning(models.UserSurveyResult.id)
+        has_at_least_one_non_empty_answer = False
 
-        survey_result = await db.execute(insert_survey_result_stmt)
-        survey_result_id: uuid.UUID = survey_result.scalar()
+        answer_result_schemas: list[schemas.UserAnswerResultCreate] = question_result_schema.user_answers
+        for answer_result_schema, answer_is_correct in zip(answer_result_schemas, question_grade.answer_is_correct):
+            answer_result_rows.append(
+                dict(id=uuid.uuid4(), user_question_result_id=question_result_id, is_correct=answer_is_correct, **answer_result_schema.model_dump())
+            )
 
+            if answer_result_schema.text != "":
+                has_at_least_one_non_empty_answer = True
 
-        question_result_schemas: list[schemas.UserQuestionsResultCreate] = survey_result_create_schema.user_questions
-        for question_result_schema in question_result_schemas:
-            insert_question_result_stmt = insert(models.UserQuestionResult).values(
-                user_survey_result_id=survey_result_id, **question_result_schema.model_dump(exclude={"user_answers"})
-            ).returning(models.UserQuestionResult.id)
+        if has_at_least_one_non_empty_answer:
+            required_question_ids.discard(question_result_schema.question_id)
 
-            question_result_model = await db.execute(insert_question_result_stmt)
-            question_result_id: uuid.UUID = question_result_model.scalar()
+    if len(required_question_ids) != 0: # Has not answer for all required questions
+        string_required_question_ids: list[str] = [str(required_question_id) for required_question_id in required_question_ids]
+        raise exceptions.BadRequestException(detail="Not answered to this questions: " + ",".join(string_required_question_ids))
 
-            has_at_least_one_non_empty_answer = False
+    insert_survey_result_stmt = insert(models.UserSurveyResult).values(
+        id=survey_result_id, user_id=user_id, survey_id=survey_id, score=respondent_grade.score
+    )
+    await db.execute(insert_survey_result_stmt)
 
-            answer_result_schemas: list[schemas.UserAnswerResultCreate] = question_result_schema.user_answers
-            for answer_result_schema in answer_result_schemas:
-                insert_answer_stmt = insert(models.UserAnswerResult).values(
-                    user_question_result_id=question_result_id, **answer_result_schema.model_dump()
-                )
+    if question_result_rows:
+        await db.execute(insert(models.UserQuestionResult), question_result_rows)
 
-                if answer_result_schema.text != "":
-                    has_at_least_one_non_empty_answer = True
+    if answer_result_rows:
+        await db.execute(insert(models.UserAnswerResult), answer_result_rows)
 
-                await db.execute(insert_answer_stmt)
-            
-            if has_at_least_one_non_empty_answer:
-                try:
-                    required_question_ids.remove(question_result_schema.question_id)
-                except ValueError:
-                    pass
+    await db.commit()
+
+    return survey_result_id
+
+
+async def has_user_passed_survey(
+    db: AsyncSession,
+    survey_id: uuid.UUID,
+    user_id: uuid.UUID
+) -> bool:
+    has_survey_result_stmt = select(
+        exists().where(and_(
+            models.UserSurveyResult.survey_id == survey_id,
+            models.UserSurveyResult.user_id == user_id
+        ))
+    )
 
-        if len(required_question_ids) == 0: # Has answer for all required questions
-            await db.commit()
+    has_survey_result: bool = await db.scalar(has_survey_result_stmt)
 
-            return survey_result_id
-        else:
-            string_required_question_ids: list[str] = [str(required_question_id) for required_question_id in required_question_ids]
-            raise exceptions.BadRequestException(detail="Not answered to this questions: " + ",".join(string_required_question_ids))
+    return has_survey_result
 
 
 async def _get_survey_results(
     db: AsyncSession,
     whereclause: _ColumnExpressionArgument[bool] | None = None,
-    load_inner_models: bool = True
+    load_inner_models: bool = True,
+    load_questions: bool = True,
+    limit: int | None = None
 ) -> list[models.UserSurveyResult]:
     select_survey_results_stmt = select(models.UserSurveyResult)
 
     if whereclause is not None:
         select_survey_results_stmt = select_survey_results_stmt.where(whereclause)
 
+    if limit is not None:
+        select_survey_results_stmt = select_survey_results_stmt.order_by(
+            models.UserSurveyResult.created_at, models.UserSurveyResult.id
+        ).limit(limit)
+
     if load_inner_models:
         select_survey_results_stmt = select_survey_results_stmt.options(
             selectinload(models.UserSurveyResult.survey)
@@ -372,6 +444,8 @@ async def _get_survey_results(
             selectinload(models.UserSurveyResult.user_questions).
             selectinload(models.UserQuestionResult.user_answers)
         )
+
+    if load_inner_models and load_questions:
         select_survey_results_stmt = select_survey_results_stmt.options(
             selectinload(models.UserSurveyResult.user_questions).
             selectinload(models.UserQuestionResult.question).
@@ -383,6 +457,173 @@ async def _get_survey_results(
     return survey_results
 
 
+async def stream_survey_result_answers(
+    db: AsyncSession,
+    survey_id: uuid.UUID,
+    after: tuple[datetime.datetime, uuid.UUID] | None = None,
+    created_before: datetime.datetime | None = None,
+    chunk_size: int = config.SURVEY_DOCUMENT_STREAM_CHUNK_SIZE
+) -> AsyncIterator[Row]:
+    # Одна строка на ответ, строки одного прохождения идут подряд в порядке (created_at, id).
+    # after - последнее уже обработанное прохождение (created_at, id).
+    # Читается серверным курсором порциями по chunk_size строк
+    whereclause = (
+        models.UserSurveyResult.survey_id == survey_id
+    )
+
+    if after is not None:
+        whereclause = and_(
+            whereclause,
+            tuple_(models.UserSurveyResult.created_at, models.UserSurveyResult.id) > tuple_(*after)
+        )
+
+    if created_before is not None:
+        whereclause = and_(
+            whereclause,
+            models.UserSurveyResult.created_at < created_before
+        )
+
+    select_survey_result_answers_stmt = select(
+        models.UserSurveyResult.id.label("survey_result_id"),
+        models.UserSurveyResult.created_at,
+        models.UserSurveyResult.score,
+        models.User.email,
+        models.User.name,
+        models.User.surname,
+        models.UserQuestionResult.id.label("question_result_id"),
+        models.UserQuestionResult.question_id,
+        models.UserAnswerResult.text,
+    ).select_from(models.UserSurveyResult).outerjoin(
+        models.User, models.User.id == models.UserSurveyResult.user_id
+    ).outerjoin(
+        models.UserQuestionResult, models.UserQuestionResult.user_survey_result_id == models.UserSurveyResult.id
+    ).outerjoin(
+        models.UserAnswerResult, models.UserAnswerResult.user_question_result_id == models.UserQuestionResult.id
+    ).where(
+        whereclause
+    ).order_by(
+        models.UserSurveyResult.created_at, models.UserSurveyResult.id, models.UserQuestionResult.id
+    ).execution_options(yield_per=chunk_size)
+
+    survey_result_answers = await db.stream(select_survey_result_answers_stmt)
+
+    async for survey_result_answer in survey_result_answers:
+        yield survey_result_answer
+
+
+async def get_survey_results_page(
+    db: AsyncSession,
+    survey_id: uuid.UUID,
+    after: tuple[datetime.datetime, uuid.UUID] | None = None,
+    limit: int = config.SURVEY_DOCUMENT_STREAM_CHUNK_SIZE,
+    only_not_graded: bool = False
+) -> list[Row]:
+    # Страница (created_at, id) прохождений опроса, после прохождения after
+    whereclause = (
+        models.UserSurveyResult.survey_id == survey_id
+    )
+
+    if after is not None:
+        whereclause = and_(
+            whereclause,
+            tuple_(models.UserSurveyResult.created_at, models.UserSurveyResult.id) > tuple_(*after)
+        )
+
+    if only_not_graded:
+        whereclause = and_(
+            whereclause,
+            models.UserSurveyResult.score.is_(None)
+        )
+
+    select_survey_results_stmt = select(
+        models.UserSurveyResult.created_at, models.UserSurveyResult.id
+    ).where(
+        whereclause
+    ).order_by(
+        models.UserSurveyResult.created_at, models.UserSurveyResult.id
+    ).limit(limit)
+
+    survey_results: list[Row] = (await db.execute(select_survey_results_stmt)).all()
+
+    return survey_results
+
+
+async def get_answers_by_survey_result_ids(
+    db: AsyncSession,
+    survey_result_ids: list[uuid.UUID]
+) -> list[Row]:
+    # Одна строка на ответ, строки одного прохождения и одного вопроса идут подряд
+    select_answers_stmt = select(
+        models.UserQuestionResult.user_survey_result_id.label("survey_result_id"),
+        models.UserQuestionResult.id.label("question_result_id"),
+        models.UserQuestionResult.question_id,
+        models.UserAnswerResult.id.label("answer_result_id"),
+        models.UserAnswerResult.text,
+    ).select_from(models.UserQuestionResult).outerjoin(
+        models.UserAnswerResult, models.UserAnswerResult.user_question_result_id == models.UserQuestionResult.id
+    ).where(
+        models.UserQuestionResult.user_survey_result_id.in_(survey_result_ids)
+    ).order_by(
+        models.UserQuestionResult.user_survey_result_id, models.UserQuestionResult.id
+    )
+
+    answers: list[Row] = (await db.execute(select_answers_stmt)).all()
+
+    return answers
+
+
+async def get_survey_ids_with_not_graded_results(
+    db: AsyncSession
+) -> list[uuid.UUID]:
+    select_survey_ids_stmt = select(models.UserSurveyResult.survey_id).where(
+        models.UserSurveyResult.score.is_(None)
+    ).distinct()
+
+    survey_ids: list[uuid.UUID] = (await db.scalars(select_survey_ids_stmt)).all()
+
+    return survey_ids
+
+
+async def update_survey_results_grades(
+    db: AsyncSession,
+    survey_result_rows: list[dict],
+    question_result_rows: list[dict],
+    answer_result_rows: list[dict]
+):
+    # Массовый UPDATE по первичному ключу: строки вида {"id": ..., "score": ...}
+    if survey_result_rows:
+        await db.execute(update(models.UserSurveyResult), survey_result_rows)
+
+    if question_result_rows:
+        await db.execute(update(models.UserQuestionResult), question_result_rows)
+
+    if answer_result_rows:
+        await db.execute(update(models.UserAnswerResult), answer_result_rows)
+
+    await db.commit()
+
+
+async def get_survey_results_by_survey_id(
+    db: AsyncSession,
+    survey_id: uuid.UUID,
+    after: tuple[datetime.datetime, uuid.UUID] | None = None,
+    limit: int = config.SURVEY_RESULTS_PAGE_SIZE,
+    load_questions: bool = True
+) -> list[models.UserSurveyResult]:
+    # Keyset пагинация по (created_at, id)
+    whereclause = (
+        models.UserSurveyResult.survey_id == survey_id
+    )
+
+    if after is not None:
+        whereclause = and_(
+            whereclause,
+            tuple_(models.UserSurveyResult.created_at, models.UserSurveyResult.id) > tuple_(*after)
+        )
+
+    return await _get_survey_results(db, whereclause, load_questions=load_questions, limit=limit)
+
+
 async def get_survey_results_by_user_id(
     db: AsyncSession,
     user_id: uuid.UUID
@@ -459,7 +700,176 @@ async def update_survey_document_refresh_datetime_by_id(
 ):
     update_survey_document_stmt = update(models.SurveyDocument).where(
         models.SurveyDocument.id == survey_document_id
+    ).values(
+        refresh_document_datetime=datetime.datetime.now() + datetime.timedelta(minutes=config.WAIT_BEFORE_REFRESH_DOCUMENT_MINUTES)
+    )
+
+    await db.execute(update_survey_document_stmt)
+    await db.commit()
+
+
+async def update_survey_document_state_by_id(
+    db: AsyncSession,
+    survey_document_id: uuid.UUID,
+    last_survey_result_created_at: datetime.datetime | None,
+    last_survey_result_id: uuid.UUID | None,
+    rows_file_size: int,
+    survey_definition_hash: str
+):
+    update_survey_document_stmt = update(models.SurveyDocument).where(
+        models.SurveyDocument.id == survey_document_id
+    ).values(
+        last_survey_result_created_at=last_survey_result_created_at,
+        last_survey_result_id=last_survey_result_id,
+        rows_file_size=rows_file_size,
+        survey_definition_hash=survey_definition_hash
     )
 
     await db.execute(update_survey_document_stmt)
     await db.commit()
+
+
+# Survey Statistic
+
+async def create_survey_statistic(
+    db: AsyncSession,
+    survey_id: uuid.UUID
+) -> uuid.UUID | None:
+    # None - строку уже создал параллельный запрос
+    insert_survey_statistic_stmt = postgresql_insert(models.SurveyStatistic).values(
+        survey_id=survey_id
+    ).on_conflict_do_nothing(
+        index_elements=[models.SurveyStatistic.survey_id]
+    ).returning(models.SurveyStatistic.id)
+
+    return_survey_statistic_model = await db.execute(insert_survey_statistic_stmt)
+    survey_statistic_id: uuid.UUID | None = return_survey_statistic_model.scalar()
+
+    await db.commit()
+
+    return survey_statistic_id
+
+
+async def get_survey_statistic_by_survey_id(
+    db: AsyncSession,
+    survey_id: uuid.UUID
+) -> models.SurveyStatistic | None:
+    select_survey_statistic_stmt = select(models.SurveyStatistic).where(
+        models.SurveyStatistic.survey_id == survey_id
+    )
+
+    survey_statistic: models.SurveyStatistic | None = await db.scalar(select_survey_statistic_stmt)
+
+    return survey_statistic
+
+
+async def update_survey_statistic_refresh_datetime_by_id(
+    db: AsyncSession,
+    survey_statistic_id: uuid.UUID
+):
+    update_survey_statistic_stmt = update(models.SurveyStatistic).where(
+        models.SurveyStatistic.id == survey_statistic_id
+    ).values(
+        refresh_statistic_datetime=datetime.datetime.now() + datetime.timedelta(seconds=config.SURVEY_STATISTIC_REFRESH_SECONDS)
+    )
+
+    await db.execute(update_survey_statistic_stmt)
+    await db.commit()
+
+
+async def update_survey_statistic_by_survey_id(
+    db: AsyncSession,
+    survey_id: uuid.UUID,
+    response_count: int,
+    statistic: dict
+):
+    update_survey_statistic_stmt = update(models.SurveyStatistic).where(
+        models.SurveyStatistic.survey_id == survey_id
+    ).values(
+        response_count=response_count,
+        statistic=statistic
+    )
+
+    await db.execute(update_survey_statistic_stmt)
+    await db.commit()
+
+
+async def count_survey_results(
+    db: AsyncSession,
+    survey_id: uuid.UUID
+) -> int:
+    count_survey_results_stmt = select(func.count()).select_from(models.UserSurveyResult).where(
+        models.UserSurveyResult.survey_id == survey_id
+    )
+
+    survey_results_count: int = await db.scalar(count_survey_results_stmt)
+
+    return survey_results_count
+
+
+async def count_survey_answers_by_text(
+    db: AsyncSession,
+    survey_id: uuid.UUID
+) -> list[Row]:
+    # (question_id, text, pick_count) - сколько раз выбран каждый ответ
+    count_answers_stmt = select(
+        models.UserQuestionResult.question_id,
+        models.UserAnswerResult.text,
+        func.count().label("pick_count")
+    ).select_from(models.UserSurveyResult).join(
+        models.UserQuestionResult, models.UserQuestionResult.user_survey_result_id == models.UserSurveyResult.id
+    ).join(
+        models.UserAnswerResult, models.UserAnswerResult.user_question_result_id == models.UserQuestionResult.id
+    ).where(
+        models.UserSurveyResult.survey_id == survey_id
+    ).group_by(
+        models.UserQuestionResult.question_id, models.UserAnswerResult.text
+    )
+
+    answer_counts: list[Row] = (await db.execute(count_answers_stmt)).all()
+
+    return answer_counts
+
+
+async def count_survey_question_results(
+    db: AsyncSession,
+    survey_id: uuid.UUID
+) -> list[Row]:
+    # (question_id, result_count, correct_count) по каждому вопросу
+    count_question_results_stmt = select(
+        models.UserQuestionResult.question_id,
+        func.count().label("result_count"),
+        func.count().filter(models.UserQuestionResult.is_correct).label("correct_count")
+    ).select_from(models.UserSurveyResult).join(
+        models.UserQuestionResult, models.UserQuestionResult.user_survey_result_id == models.UserSurveyResult.id
+    ).where(
+        models.UserSurveyResult.survey_id == survey_id
+    ).group_by(
+        models.UserQuestionResult.question_id
+    )
+
+    question_result_counts: list[Row] = (await db.execute(count_question_results_stmt)).all()
+
+    return question_result_counts
+
+
+async def count_survey_results_by_score(
+    db: AsyncSession,
+    survey_id: uuid.UUID
+) -> list[Row]:
+    # (score, count) - гистограмма баллов, непроверенные прохождения не учитываются
+    count_scores_stmt = select(
+        models.UserSurveyResult.score,
+        func.count().label("count")
+    ).where(and_(
+        models.UserSurveyResult.survey_id == survey_id,
+        models.UserSurveyResult.score.is_not(None)
+    )).group_by(
+        models.UserSurveyResult.score
+    ).order_by(
+        models.UserSurveyResult.score
+    )
+
+    score_counts: list[Row] = (await db.execute(count_scores_stmt)).all()
+
+    return score_counts
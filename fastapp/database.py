@@ -15,13 +15,13 @@ class DatabaseSessionManager:
         self.session_maker = None
         self.session = None
 
-    def init_db(self, another_databse_uri: str | None = None):
+    def init_db(self, another_databse_uri: str | None = None, pool_size: int = 100):
         database_uri = SQLALCHEMY_ASYNC_DATABASE_URL
         if another_databse_uri:
             database_uri = another_databse_uri
 
         self.engine = create_async_engine(
-            database_uri, pool_size=100, max_overflow=0, pool_pre_ping=False
+            database_uri, pool_size=pool_size, max_overflow=0, pool_pre_ping=False
         )
         self.sync_engine = create_engine(SQLALCHEMY_SYNC_DATABASE_URL)
 
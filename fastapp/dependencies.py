@@ -1,20 +1,25 @@
+import os
 import uuid
 import random
 import string
+import io
+import csv
+import json
+import base64
 import hashlib
+import time
+from typing import AsyncIterator, Iterable
 from datetime import timedelta, datetime, timezone
 
-import pandas as pd
 import jwt
-from openpyxl import load_workbook
-from openpyxl.utils import get_column_letter
-from openpyxl.styles import Alignment
 from fastapi import Depends, Header, Response
+from sqlalchemy import inspect, Row
 from sqlalchemy.ext.asyncio import AsyncSession
 
 import config
-from fastapp import crud, schemas, exceptions, models
-from fastapp.database import get_db
+from fastapp import crud, schemas, exceptions, models, documents, scoring, cache
+from fastapp.database import get_db, sessionmanager
+from fastapp.redis_client import redis_client
 
 
 def generate_random_string(length: int = random.randint(1, 128), only_digits: bool = False) -> str:
@@ -57,6 +62,10 @@ def _create_access_token(payload: dict, minutes: int | None = None) -> schemas.J
         minutes=minutes or config.ACCESS_TOKEN_EXPIRES_MINUTES
     )
     
+    # У каждого токена свой jti и тип, refresh токен нельзя предъявить вместо access
+    payload[config.JTI] = str(uuid.uuid4())
+    payload[config.TOKEN_TYPE] = config.ACCESS_TOKEN_TYPE
+
     access_token: schemas.JwtTokenCreate = _create_token(payload, expire)
 
     return access_token
@@ -67,14 +76,16 @@ def _create_refresh_token(payload: dict) -> schemas.JwtTokenCreate:
         minutes=config.REFRESH_TOKEN_EXPIRES_MINUTES
     )
 
+    payload[config.JTI] = str(uuid.uuid4())
+    payload[config.TOKEN_TYPE] = config.REFRESH_TOKEN_TYPE
+
     refresh_token: schemas.JwtTokenCreate = _create_token(payload, expire)
 
     return refresh_token
 
 
 def create_token_pair(user_id: uuid.UUID) -> schemas.TokenPair:
-    payload = {config.SUB: str(user_id), config.JTI: str(
-        uuid.uuid4()), config.IAT: _get_utc_now()}
+    payload = {config.SUB: str(user_id), config.IAT: _get_utc_now()}
 
     return schemas.TokenPair(
         access=_create_access_token(payload={**payload}),
@@ -82,20 +93,91 @@ def create_token_pair(user_id: uuid.UUID) -> schemas.TokenPair:
     )
 
 
+def _get_token_type(payload: dict) -> str | None:
+    token_type: str | None = payload.get(config.TOKEN_TYPE)
+
+    # Токен выдан до появления claim type: access и refresh тогда отличались только сроком жизни,
+    # поэтому старый refresh токен по-прежнему нельзя предъявить вместо access
+    if token_type is None and config.EXP in payload and config.IAT in payload:
+        token_lifetime_seconds: float = payload[config.EXP] - payload[config.IAT]
+        token_type = config.ACCESS_TOKEN_TYPE if token_lifetime_seconds <= config.LEGACY_ACCESS_TOKEN_EXPIRES_MINUTES * 60 else config.REFRESH_TOKEN_TYPE
+
+    return token_type
+
+
 def decode_access_token(token: str) -> dict:
     payload = jwt.decode(token, config.JWT_SECRET,
                          algorithms=[config.JWT_ALGORITHM])
 
+    if _get_token_type(payload) != config.ACCESS_TOKEN_TYPE:
+        raise jwt.exceptions.InvalidTokenError("Not an access token")
+
     return payload
 
 
-def refresh_token_state(token: str) -> schemas.JwtTokenGet:
-    payload = jwt.decode(token, config.JWT_SECRET,
-                         algorithms=[config.JWT_ALGORITHM])
+def decode_access_token_cached(token: str) -> dict:
+    # Подпись токена проверяется один раз, дальше payload берется по хэшу токена до его exp
+    token_hash: bytes = hashlib.sha256(token.encode("utf-8")).digest()
+    payload: dict | None = cache.verified_token_cache.get(token_hash)
 
-    access_token = _create_access_token(payload=payload)
+    if payload is None:
+        payload = decode_access_token(token)
+        cache.verified_token_cache.set(token_hash, payload, ttl_seconds=payload[config.EXP] - time.time())
 
-    return access_token
+    return payload
+
+
+def invalidate_cached_user(user_id: uuid.UUID | str):
+    # Вызывать при изменении или удалении пользователя
+    cache.user_cache.delete(str(user_id))
+
+
+def decode_refresh_token(token: str) -> dict:
+    try:
+        payload = jwt.decode(token, config.JWT_SECRET,
+                             algorithms=[config.JWT_ALGORITHM])
+    except jwt.exceptions.ExpiredSignatureError:
+        raise exceptions.AuthFailedException(detail="Refresh token expired")
+    except jwt.exceptions.InvalidTokenError:
+        raise exceptions.AuthFailedException(detail="Invalid refresh token")
+
+    if _get_token_type(payload) != config.REFRESH_TOKEN_TYPE:
+        raise exceptions.AuthFailedException(detail="Invalid refresh token")
+
+    return payload
+
+
+async def revoke_refresh_token(payload: dict) -> bool:
+    # Один SET NX в Redis: jti попадает в список отозванных до конца жизни токена.
+    # False - токен уже был отозван раньше
+    ttl_seconds: int = max(int(payload[config.EXP] - time.time()), 1)
+
+    return bool(await redis_client.set(f"{config.REVOKED_REFRESH_TOKEN_KEY_PREFIX}{payload[config.JTI]}", 1, nx=True, ex=ttl_seconds))
+
+
+async def rotate_refresh_token(token: str) -> schemas.TokenPair:
+    # Refresh токен одноразовый: при обновлении он отзывается и выдается новая пара
+    payload: dict = decode_refresh_token(token)
+
+    if not await revoke_refresh_token(payload):
+        raise exceptions.AuthFailedException(detail="Refresh token has already been used")
+
+    return create_token_pair(user_id=payload[config.SUB])
+
+
+def encode_survey_results_cursor(survey_result: models.UserSurveyResult) -> str:
+    cursor: str = f"{survey_result.created_at.isoformat()}|{survey_result.id}"
+
+    return base64.urlsafe_b64encode(cursor.encode("utf-8")).decode("utf-8")
+
+
+def decode_survey_results_cursor(cursor: str) -> tuple[datetime, uuid.UUID]:
+    try:
+        created_at, survey_result_id = base64.urlsafe_b64decode(cursor.encode("utf-8")).decode("utf-8").split("|")
+
+        return datetime.fromisoformat(created_at), uuid.UUID(survey_result_id)
+    except ValueError:
+        raise exceptions.BadRequestException(detail="Invalid cursor")
 
 
 def add_refresh_token_cookie(response: Response, token: str):
@@ -116,105 +198,448 @@ def remove_refresh_token_from_cookie(response: Response):
     )
 
 
-def create_excel_with_data(file_name: str, data_main: list[dict], data_tasks: list[dict]):
-    df_main = pd.DataFrame(data_main)
+async def _iterate_survey_results(
+    db: AsyncSession,
+    survey_id: uuid.UUID,
+    after: tuple[datetime, uuid.UUID] | None = None,
+    created_before: datetime | None = None
+) -> AsyncIterator[dict]:
+    # Собирает построчный поток ответов из базы обратно в прохождения,
+    # в памяти держится только текущее прохождение
+    survey_result: dict | None = None
+    question_result: dict | None = None
+
+    async for row in crud.stream_survey_result_answers(db, survey_id, after, created_before):
+        if survey_result is None or survey_result["id"] != row.survey_result_id:
+            if survey_result is not None:
+                yield survey_result
+
+            survey_result = {
+                "id": row.survey_result_id,
+                "created_at": row.created_at,
+                "score": row.score,
+                "email": row.email or "",
+                "name": row.name or "",
+                "surname": row.surname or "",
+                "user_questions": []
+            }
+            question_result = None
 
-    with pd.ExcelWriter(f"{file_name}.xlsx", engine="openpyxl") as writer:
-        df_main.to_excel(writer, sheet_name="Основная таблица", index=False)
+        if row.question_result_id is None:
+            continue
 
-        for task_num, task_entries in enumerate(data_tasks, start=1):
-            task_data = []
+        if question_result is None or question_result["id"] != row.question_result_id:
+            question_result = {
+                "id": row.question_result_id,
+                "question_id": row.question_id,
+                "user_answers": []
+            }
+            survey_result["user_questions"].append(question_result)
 
-            for entry in task_entries:
-                row = [entry["email"]] + entry["answers"]
-                task_data.append(row)
+        if row.text is not None:
+            question_result["user_answers"].append(row.text)
 
-            max_answers = max(len(entry["answers"]) for entry in task_entries)
-            columns = ["email"] + [f"Ответ {i + 1}" for i in range(max_answers)]
+    if survey_result is not None:
+        yield survey_result
 
-            df_task = pd.DataFrame(task_data, columns=columns)
-            sheet_name = f"Задание #{task_num}"
-            df_task.to_excel(writer, sheet_name=sheet_name, index=False)
-    
-    wb = load_workbook(f"{file_name}.xlsx")
 
-    for sheet in wb.sheetnames:
-        ws = wb[sheet]
-        
-        for row in ws.iter_rows():
-            for cell in row:
-                cell.alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
-            ws.row_dimensions[row[0].row].height = 30  # Устанавливаем высоту строки
-        
-        for col in range(1, ws.max_column + 1):
-            max_length = max(len(str(ws.cell(row=row, column=col).value)) for row in range(1, ws.max_row + 1))
-            ws.column_dimensions[get_column_letter(col)].width = max_length + 2  # Добавляем небольшой отступ
+async def stream_survey_results_export(survey_id: uuid.UUID, export_format: schemas.SurveyResultsExportFormatEnum) -> AsyncIterator[str]:
+    # Сессия открывается здесь: сессия из get_db закрывается до того, как ответ начнет отправляться
+    db: AsyncSession = sessionmanager.session_maker()
+
+    try:
+        if export_format == schemas.SurveyResultsExportFormatEnum.ndjson:
+            # Одна строка на прохождение
+            async for survey_result in _iterate_survey_results(db, survey_id):
+                yield json.dumps(survey_result, ensure_ascii=False, default=str) + "\n"
+        else:
+            # Одна строка на ответ
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(["survey_result_id", "created_at", "email", "name", "surname", "score", "question_result_id", "question_id", "text"])
+            buffered_rows: int = 0
+
+            async for row in crud.stream_survey_result_answers(db, survey_id):
+                writer.writerow([
+                    row.survey_result_id, row.created_at.isoformat(), row.email or "", row.name or "", row.surname or "",
+                    row.score if row.score is not None else "", row.question_result_id or "", row.question_id or "",
+                    row.text if row.text is not None else ""
+                ])
+                buffered_rows += 1
+
+                if buffered_rows >= config.SURVEY_DOCUMENT_STREAM_CHUNK_SIZE:
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate(0)
+                    buffered_rows = 0
+
+            yield buffer.getvalue()
+    finally:
+        await db.close()
+
 
+def _get_survey_definition_hash(questions: list[models.Question]) -> str:
+    survey_definition: list = [
+        [
+            str(question.id),
+            question.type,
+            question.score,
+            len(question.answers),
+            list(sorted([question_answer.text for question_answer in question.answers if question_answer.is_correct]))
+        ] for question in sorted(questions, key=lambda question: str(question.id))
+    ]
 
-    wb.save(f"{file_name}.xlsx")
+    return hashlib.sha256(json.dumps(survey_definition).encode("utf-8")).hexdigest()
+
+
+def _get_question_sheets_info(questions: list[models.Question]) -> list[tuple[str, int]]:
+    # (question_id, сколько колонок ответов) для листов заданий
+    return [
+        (str(question.id), 1 if question.type == "text" else max(len(question.answers), 1))
+        for question in questions
+    ]
+
+
+def _write_survey_document_file(file_path: str, question_sheets_info: list[tuple[str, int]], rows_file: documents.SurveyRowsFile):
+    document_writer = documents.ExcelDocumentWriter(file_path)
+    main_sheet: documents.ExcelSheetWriter = document_writer.add_sheet("Основная таблица", ["email", "name", "surname", "score"])
+    question_sheets: dict[str, documents.ExcelSheetWriter] = {}
+
+    for task_num, (question_id, max_answers) in enumerate(question_sheets_info, start=1):
+        question_sheets[question_id] = document_writer.add_sheet(f"Задание #{task_num}", documents.create_answers_header(max_answers))
+
+    for row in rows_file:
+        for user_question_result in row["user_questions"]:
+            question_sheet: documents.ExcelSheetWriter | None = question_sheets.get(user_question_result["question_id"])
+
+            if question_sheet is not None:
+                question_sheet.append([row["email"]] + user_question_result["user_answers"])
+
+        main_sheet.append([row["email"], row["name"], row["surname"], row["score"]])
+
+    document_writer.save()
+
+
+def _get_survey_document_rows_file_size(file_path: str) -> int | None:
+    # Размер файла строк, из которого собран xlsx. None - xlsx еще не собран
+    if not os.path.exists(file_path) or not os.path.exists(f"{file_path}.rows"):
+        return None
+
+    with open(f"{file_path}.rows") as rows_size_file:
+        return int(rows_size_file.read())
+
+
+def _set_survey_document_rows_file_size(file_path: str, rows_file_size: int):
+    with open(f"{file_path}.rows", "w") as rows_size_file:
+        rows_size_file.write(str(rows_file_size))
+
+
+def _get_question_answer_ids(questions: list[models.Question]) -> dict[str, dict[str, str]]:
+    # question_id -> {текст варианта: answer_id} для parquet документа
+    return {
+        str(question.id): {question_answer.text: str(question_answer.id) for question_answer in question.answers}
+        for question in questions
+    }
+
+
+def get_survey_parquet_parts(survey_document_title: str) -> documents.ParquetDocumentParts:
+    return documents.ParquetDocumentParts(f"{config.SURVEY_DOCUMENT_SAVE_PATH}{survey_document_title}.parquet.parts")
+
+
+def _write_survey_parquet_file(file_path: str, question_answer_ids: dict[str, dict[str, str]], rows: Iterable[dict]):
+    document_writer = documents.ParquetDocumentWriter(file_path)
+
+    for row in rows:
+        created_at: datetime = datetime.fromisoformat(row["created_at"])
+
+        for user_question_result in row["user_questions"]:
+            answer_ids: dict[str, str] | None = question_answer_ids.get(user_question_result["question_id"])
+
+            if answer_ids is None:
+                continue
+
+            for user_answer in user_question_result["user_answers"]:
+                document_writer.append({
+                    "survey_result_id": row["id"],
+                    "created_at": created_at,
+                    "email": row["email"],
+                    "score": row["score"],
+                    "question_id": user_question_result["question_id"],
+                    "answer_id": answer_ids.get(user_answer),
+                    "text": user_answer,
+                })
+
+    document_writer.save()
+
+
+def _append_survey_results_rows(rows_file: documents.SurveyRowsFile, survey_scorer: scoring.SurveyScorer, survey_results: list[dict]):
+    survey_results_user_questions: list[list[dict]] = [
+        [
+            user_question_result for user_question_result in survey_result["user_questions"]
+            if user_question_result["question_id"] in survey_scorer.question_indexes
+        ] for survey_result in survey_results
+    ]
+
+    for survey_result, user_questions in zip(survey_results, survey_results_user_questions):
+        user_score: int | None = survey_result["score"]
+
+        # Баллы сохраняются при отправке ответа. Проверяем только прохождения, сохраненные до этого
+        # и еще не обработанные backfill_survey_grades: их мало, поэтому по одному
+        if user_score is None:
+            user_score = survey_scorer.grade_respondent(
+                [(user_question_result["question_id"], user_question_result["user_answers"]) for user_question_result in user_questions]
+            ).score
+
+        rows_file.append({
+            "id": survey_result["id"],
+            "created_at": survey_result["created_at"],
+            "email": survey_result["email"],
+            "name": survey_result["name"],
+            "surname": survey_result["surname"],
+            "score": user_score,
+            "user_questions": [
+                {
+                    "question_id": user_question_result["question_id"],
+                    "user_answers": list(sorted(user_question_result["user_answers"]))
+                } for user_question_result in user_questions
+            ]
+        })
 
 
 async def refresh_survey_document(db: AsyncSession, survey_document_id: uuid.UUID, survey_document_title: str):
     survey_document: models.SurveyDocument = await crud.get_survey_document_by_id(db, survey_document_id)
     survey_id: uuid.UUID = survey_document.survey_id
 
-    survey: models.Survey | None = await crud.get_survey_by_id(db, survey_id, True)
+    survey: models.Survey | None = await crud.get_survey_by_id(db, survey_id)
 
     if survey:
-        file_name: str = f"{config.SURVEY_DOCUMENT_SAVE_PATH}{survey_document_title}"
-        document_main_data: list[dict] = []
-        document_data_tasks: list[dict] = []
-        questions_info: dict = {}
+        file_path: str = f"{config.SURVEY_DOCUMENT_SAVE_PATH}{survey_document_title}.xlsx"
+        parquet_file_path: str = f"{config.SURVEY_DOCUMENT_SAVE_PATH}{survey_document_title}.parquet"
+        rows_file = documents.SurveyRowsFile(f"{config.SURVEY_DOCUMENT_SAVE_PATH}{survey_document_title}.jsonl")
+        parquet_parts: documents.ParquetDocumentParts = get_survey_parquet_parts(survey_document_title)
 
         questions: list[models.Question] = survey.questions
+        survey_scorer = scoring.SurveyScorer(questions)
+        survey_definition_hash: str = _get_survey_definition_hash(questions)
+        # После commit объекты опроса истекают, поэтому нужное для листов берем заранее
+        question_sheets_info: list[tuple[str, int]] = _get_question_sheets_info(questions)
+        question_answer_ids: dict[str, dict[str, str]] = _get_question_answer_ids(questions)
+
+        # Если вопросы не менялись, досчитываем только новые прохождения
+        previous_survey_definition_hash: str | None = survey_document.survey_definition_hash
+        last_survey_result: tuple[datetime, uuid.UUID] | None = None
+        rows_file_size: int = 0
+        is_incremental: bool = False
+
+        if (
+            previous_survey_definition_hash == survey_definition_hash
+            and survey_document.last_survey_result_id is not None
+            and rows_file.has_size(survey_document.rows_file_size)
+        ):
+            last_survey_result = (survey_document.last_survey_result_created_at, survey_document.last_survey_result_id)
+            rows_file_size = survey_document.rows_file_size
+            is_incremental = True
+
+        # Вопросы изменились после прошлой сборки: сохраненные баллы посчитаны по старым правильным
+        # ответам, поэтому перед полной пересборкой опрос перепроверяется. survey_document после этого не читаем
+        if previous_survey_definition_hash is not None and previous_survey_definition_hash != survey_definition_hash:
+            await regrade_survey(db, survey_id)
+
+        previous_rows_file_size: int = rows_file_size
+        parquet_parts.truncate(rows_file_size, parquet_file_path)
+        # Документы, собранные до частей, не имеют ни одной: первая часть берет весь файл строк
+        parquet_rows_offset: int = rows_file_size if parquet_parts.get_part_names() else 0
+        created_before: datetime = datetime.now() - timedelta(seconds=config.SURVEY_DOCUMENT_REFRESH_LAG_SECONDS)
+
+        # Прохождения дописываются пачками, в памяти держится не больше пачки
+        survey_results: list[dict] = []
+
+        rows_file.open(rows_file_size)
+        try:
+            async for survey_result in _iterate_survey_results(db, survey_id, last_survey_result, created_before):
+                survey_results.append(survey_result)
+                last_survey_result = (survey_result["created_at"], survey_result["id"])
+
+                if len(survey_results) >= config.SURVEY_DOCUMENT_STREAM_CHUNK_SIZE:
+                    _append_survey_results_rows(rows_file, survey_scorer, survey_results)
+                    survey_results = []
+
+            if survey_results:
+                _append_survey_results_rows(rows_file, survey_scorer, survey_results)
+        finally:
+            rows_file_size = rows_file.close()
+
+        # Новые строки дописываются в parquet отдельной частью до сохранения состояния:
+        # если сохранить его не удастся, следующее обновление удалит эту часть в truncate
+        if not is_incremental or rows_file_size != parquet_rows_offset:
+            _write_survey_parquet_file(
+                parquet_parts.get_part_path(parquet_rows_offset), question_answer_ids, rows_file.iterate(parquet_rows_offset)
+            )
+
+        last_survey_result_created_at, last_survey_result_id = last_survey_result if last_survey_result else (None, None)
+        await crud.update_survey_document_state_by_id(
+            db, survey_document_id, last_survey_result_created_at, last_survey_result_id, rows_file_size, survey_definition_hash
+        )
+
+        # xlsx нельзя дописать, он собирается из всего файла строк. Поэтому при частых обновлениях
+        # он пересобирается не чаще SURVEY_DOCUMENT_XLSX_REBUILD_MINUTES, а новые строки сразу есть в parquet
+        document_rows_file_size: int | None = _get_survey_document_rows_file_size(file_path)
+
+        if (
+            is_incremental
+            and document_rows_file_size is not None
+            and (
+                document_rows_file_size == rows_file_size
+                or os.path.getmtime(file_path) > time.time() - config.SURVEY_DOCUMENT_XLSX_REBUILD_MINUTES * 60
+            )
+        ):
+            return
+
+        _write_survey_document_file(file_path, question_sheets_info, rows_file)
+        _set_survey_document_rows_file_size(file_path, rows_file_size)
+
+
+async def regrade_survey(db: AsyncSession, survey_id: uuid.UUID, only_not_graded: bool = False) -> int:
+    # Пересчитывает is_correct и баллы сохраненных ответов, например после изменения правильных ответов.
+    # Прохождения обрабатываются страницами по (created_at, id), каждая страница - один массовый UPDATE
+    survey: models.Survey | None = await crud.get_survey_by_id(db, survey_id)
+
+    if not survey:
+        return 0
+
+    survey_scorer = scoring.SurveyScorer(survey.questions)
+    last_survey_result: tuple[datetime, uuid.UUID] | None = None
+    graded_count: int = 0
+
+    while True:
+        survey_results_page = await crud.get_survey_results_page(db, survey_id, last_survey_result, only_not_graded=only_not_graded)
+
+        if not survey_results_page:
+            break
+
+        last_survey_result = (survey_results_page[-1].created_at, survey_results_page[-1].id)
+        survey_result_ids: list[uuid.UUID] = [survey_result.id for survey_result in survey_results_page]
+        answers: list[Row] = await crud.get_answers_by_survey_result_ids(db, survey_result_ids)
+
+        # Колонки строятся прямо из строк ответов, без промежуточных прохождений
+        survey_results_batch: scoring.SurveyResultsBatch = survey_scorer.encode_rows(
+            (answer.survey_result_id, answer.question_result_id, answer.question_id, answer.text) for answer in answers
+        )
+        survey_scores: scoring.SurveyScores = survey_scorer.score(survey_results_batch)
+
+        # Прохождения без результатов вопросов в строки ответов не попадают, их балл 0
+        respondent_scores: dict[uuid.UUID, int] = dict(zip(survey_results_batch.respondent_ids, survey_scores.respondent_scores.tolist()))
+        survey_result_rows: list[dict] = [
+            {"id": survey_result_id, "score": respondent_scores.get(survey_result_id, 0)} for survey_result_id in survey_result_ids
+        ]
+        question_result_rows: list[dict] = [
+            {"id": question_result_id, "is_correct": is_correct, "score": score}
+            for question_result_id, is_correct, score in zip(
+                survey_results_batch.result_ids, survey_scores.result_is_correct.tolist(), survey_scores.result_scores.tolist()
+            )
+        ]
+        answer_result_rows: list[dict] = [
+            {"id": answer.answer_result_id, "is_correct": is_correct}
+            for answer, is_correct in zip((answer for answer in answers if answer.text is not None), survey_scores.answer_is_correct.tolist())
+        ]
+
+        await crud.update_survey_results_grades(db, survey_result_rows, question_result_rows, answer_result_rows)
+
+        graded_count += len(survey_result_ids)
+
+    return graded_count
+
+
+async def backfill_survey_grades(db: AsyncSession) -> int:
+    # Проверяет прохождения, сохраненные до того, как баллы стали записываться при отправке
+    graded_count: int = 0
+
+    for survey_id in await crud.get_survey_ids_with_not_graded_results(db):
+        graded_count += await regrade_survey(db, survey_id, only_not_graded=True)
+
+    return graded_count
+
+
+async def refresh_survey_statistic(db: AsyncSession, survey_id: uuid.UUID):
+    # Пересчитывает агрегаты опроса запросами GROUP BY, эндпоинт статистики
+    # потом отдает готовый результат за O(вопросов)
+    survey: models.Survey | None = await crud.get_survey_by_id(db, survey_id)
+
+    if not survey:
+        return
+
+    response_count: int = await crud.count_survey_results(db, survey_id)
+
+    answer_pick_counts: dict[tuple[uuid.UUID, str], int] = {}
+    question_pick_counts: dict[uuid.UUID, int] = {}
+
+    for answer_count in await crud.count_survey_answers_by_text(db, survey_id):
+        answer_pick_counts[(answer_count.question_id, answer_count.text)] = answer_count.pick_count
+        question_pick_counts[answer_count.question_id] = question_pick_counts.get(answer_count.question_id, 0) + answer_count.pick_count
+
+    question_result_counts: dict[uuid.UUID, tuple[int, int]] = {
+        question_result_count.question_id: (question_result_count.result_count, question_result_count.correct_count)
+        for question_result_count in await crud.count_survey_question_results(db, survey_id)
+    }
+
+    questions_statistic: list[dict] = []
+
+    for question in survey.questions:
+        result_count, correct_count = question_result_counts.get(question.id, (0, 0))
+        question_pick_count: int = question_pick_counts.get(question.id, 0)
+        answers_statistic: list[dict] = []
+        counted_texts: set[str] = set()
+
+        for question_answer in question.answers:
+            # Варианты с одинаковым текстом неразличимы, выборы относятся к первому
+            pick_count: int = 0 if question_answer.text in counted_texts else answer_pick_counts.get((question.id, question_answer.text), 0)
+            counted_texts.add(question_answer.text)
 
-        for question in questions:
-            questions_info[question.id] = {
-                "correct_answers": list(sorted([question_answer.text for question_answer in question.answers if question_answer.is_correct])),
-                "type": question.type,
-                "score": question.score if question.score else 0,
-                "user_answers_info": []
-            }
-        
-        for user_survey_result in survey.user_survey_results:
-            user: models.User | None = user_survey_result.user
-            user_score: int = 0
-
-            user_info = {
-                "email": user.email if user else "",
-                "name": user.name if user else "",
-                "surname": user.surname if user else "",
-            }
+            answers_statistic.append({
+                "answer_id": str(question_answer.id),
+                "text": question_answer.text,
+                "pick_count": pick_count
+            })
+
+        questions_statistic.append({
+            "question_id": str(question.id),
+            "result_count": result_count,
+            "correct_count": correct_count,
+            "correct_rate": correct_count / result_count if result_count else None,
+            "answers": answers_statistic,
+            "other_pick_count": question_pick_count - sum(answer_statistic["pick_count"] for answer_statistic in answers_statistic)
+        })
+
+    score_histogram: list[dict] = [
+        {"score": score_count.score, "count": score_count.count}
+        for score_count in await crud.count_survey_results_by_score(db, survey_id)
+    ]
+
+    await crud.update_survey_statistic_by_survey_id(
+        db, survey_id, response_count, {"questions": questions_statistic, "score_histogram": score_histogram}
+    )
 
-            for user_question_result in user_survey_result.user_questions:
-                curent_question: models.Question = user_question_result.question
-                question_info: dict = questions_info[curent_question.id]
-
-                user_answers: list[str] = list(sorted([user_answer_result.text for user_answer_result in user_question_result.user_answers]))
-                
-                if question_info["type"] in ["text", "choose_one", "dropdown_list"]:
-                    if len(user_answers) == 1 and user_answers[0] in question_info["correct_answers"]:
-                        user_score += question_info["score"]
-                elif question_info["type"] == "choose_many":
-                    if user_answers == question_info["correct_answers"]:
-                        user_score += question_info["score"]
-                
-                user_answers_info = {
-                    "email": user_info["email"],
-                    "answers": user_answers
-                }
-
-                question_info["user_answers_info"].append(user_answers_info)
-
-            user_info["score"] = user_score
-
-            document_main_data.append(user_info)
-            
-        for question_id in questions_info:
-            users_answers = questions_info[question_id]["user_answers_info"]
-            document_data_tasks.append(users_answers)
-        
-        create_excel_with_data(file_name, document_main_data, document_data_tasks)
+
+async def delete_expired_codes(db: AsyncSession) -> int:
+    # Удаляет истекшие коды короткими транзакциями, стоимость зависит от числа истекших кодов,
+    # а не от размера таблицы. Возвращает, сколько кодов удалено
+    if await redis_client.exists(config.CODE_EXPIRY_IDLE_KEY):
+        return 0
+
+    deleted_count: int = 0
+
+    while True:
+        batch_deleted_count: int = await crud.delete_expired_codes(db, config.CODE_EXPIRY_BATCH_SIZE)
+        deleted_count += batch_deleted_count
+
+        if batch_deleted_count < config.CODE_EXPIRY_BATCH_SIZE:
+            break
+
+    # Истекшие коды и так не проходят проверку, поэтому пустая таблица может подождать
+    if deleted_count == 0:
+        await redis_client.set(config.CODE_EXPIRY_IDLE_KEY, 1, ex=config.CODE_EXPIRY_IDLE_BACKOFF_SECONDS)
+
+    return deleted_count
 
 
 async def get_user_from_access_token(authorization: str | None = Header(None), db: AsyncSession = Depends(get_db)) -> models.User:
@@ -227,30 +652,83 @@ async def get_user_from_access_token(authorization: str | None = Header(None), d
     access_token = authorization.split(" ")[1]
 
     try:
-        user_info = decode_access_token(access_token)
-    except jwt.exceptions.DecodeError:
-        raise exceptions.AuthFailedException(detail="Invalid access_token")
+        user_info = decode_access_token_cached(access_token)
     except jwt.exceptions.ExpiredSignatureError:
         raise exceptions.AuthFailedException(detail="Access token expired")
+    except jwt.exceptions.InvalidTokenError:
+        raise exceptions.AuthFailedException(detail="Invalid access_token")
 
     user_id: uuid.UUID = user_info[config.SUB]
 
+    # В кэше хранятся поля, а не сам объект: объект из чужой сессии истекает после ее commit
+    user_fields: dict | None = cache.user_cache.get(user_id)
+
+    if user_fields is not None:
+        return models.User(**user_fields)
+
     user = await crud.get_user_by_id(db, user_id)
 
     if not user:
         raise exceptions.AuthFailedException(detail="Invalid access_token")
 
+    cache.user_cache.set(user_id, {column.key: getattr(user, column.key) for column in inspect(models.User).column_attrs})
+
     return user
 
 
-async def check_survey_is_valid(db: AsyncSession, survey: models.Survey, authorization: str | None = Header(None)):
+async def get_cached_survey(db: AsyncSession, survey_id: uuid.UUID) -> cache.CachedSurvey | None:
+    # Опрос после создания почти не меняется, поэтому SurveyGet сериализуется один раз
+    cached_survey: cache.CachedSurvey | None = await cache.survey_cache.get(survey_id)
+
+    if cached_survey is None:
+        survey: models.Survey | None = await crud.get_survey_by_id(db, survey_id)
+
+        if not survey:
+            return None
+
+        survey_payload: bytes = schemas.SurveyGet.model_validate(survey).model_dump_json().encode("utf-8")
+        cached_survey = await cache.survey_cache.set(survey_id, survey_payload)
+
+    return cached_survey
+
+
+async def get_survey_scorer(db: AsyncSession, survey_id: uuid.UUID) -> scoring.SurveyScorer | None:
+    # Вопросы и правильные ответы читаются из базы один раз на опрос, а не на каждую отправку ответа
+    survey_scorer: scoring.SurveyScorer | None = cache.survey_scorer_cache.get(survey_id)
+
+    if survey_scorer is None:
+        survey: models.Survey | None = await crud.get_survey_by_id(db, survey_id)
+
+        if not survey:
+            return None
+
+        survey_scorer = scoring.SurveyScorer(survey.questions)
+        cache.survey_scorer_cache.set(survey_id, survey_scorer)
+
+    return survey_scorer
+
+
+def is_etag_matched(if_none_match: str | None, etag: str) -> bool:
+    # If-None-Match может содержать несколько тегов, слабые теги сравниваются без префикса W/
+    if not if_none_match:
+        return False
+
+    if if_none_match.strip() == "*":
+        return True
+
+    return etag in (request_etag.strip().removeprefix("W/") for request_etag in if_none_match.split(","))
+
+
+async def check_survey_is_valid(db: AsyncSession, survey: models.Survey | cache.CachedSurvey, authorization: str | None = Header(None)) -> models.User | None:
+    user: models.User | None = None
+
     if survey and not survey.is_anonim:
         if survey.expire_datetime and survey.expire_datetime < datetime.now():
             raise exceptions.NotAllowedException(detail="Survey is finished")
         user: models.User = await get_user_from_access_token(authorization, db)
         
         if not survey.send_multiple_times:
-            user_passed_survey_ids: list[uuid.UUID] = [user_survey_result.user_id for user_survey_result in survey.user_survey_results]
-            if user.id in user_passed_survey_ids:
+            if await crud.has_user_passed_survey(db, survey.id, user.id):
                 raise exceptions.NotAllowedException(detail="You are already passed this survey")
 
+    return user
@@ -0,0 +1,285 @@
+import os
+import json
+import uuid
+from typing import Iterator
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment
+from openpyxl.utils import get_column_letter
+from openpyxl.worksheet._write_only import WriteOnlyWorksheet
+
+
+ROW_HEIGHT = 30
+COLUMN_WIDTH_PADDING = 2 # Небольшой отступ
+COLUMN_WIDTH_SAMPLE_ROWS = 1000 # По скольким первым строкам считается ширина колонок
+PARQUET_BATCH_ROWS = 10000 # Сколько строк ответов копится перед записью в parquet
+PARQUET_PARTS_METADATA_KEY = b"parts" # Из каких частей собран parquet документ
+
+CELL_ALIGNMENT = Alignment(horizontal="center", vertical="center", wrap_text=True)
+
+
+class ExcelSheetWriter:
+    """Лист документа, строки которого сразу уходят в файл.
+
+    В режиме write_only openpyxl записывает ширину колонок перед первой
+    строкой, поэтому первые COLUMN_WIDTH_SAMPLE_ROWS строк буферизуются,
+    пока по ним считается ширина. Дальше строки пишутся без буфера.
+    """
+
+    def __init__(self, worksheet: WriteOnlyWorksheet, header: list[str]):
+        self._worksheet = worksheet
+        self._column_widths: list[int] = []
+        self._pending_rows: list[list] = []
+        self._is_flushed: bool = False
+
+        self._worksheet.sheet_format.defaultRowHeight = ROW_HEIGHT
+        self._worksheet.sheet_format.customHeight = True
+
+        self.append(header)
+
+    def append(self, row: list):
+        if self._is_flushed:
+            self._write_row(row)
+            return
+
+        self._update_column_widths(row)
+        self._pending_rows.append(row)
+
+        if len(self._pending_rows) >= COLUMN_WIDTH_SAMPLE_ROWS:
+            self.flush()
+
+    def flush(self):
+        if self._is_flushed:
+            return
+
+        for column, width in enumerate(self._column_widths, start=1):
+            self._worksheet.column_dimensions[get_column_letter(column)].width = width + COLUMN_WIDTH_PADDING
+
+        for row in self._pending_rows:
+            self._write_row(row)
+
+        self._pending_rows = []
+        self._is_flushed = True
+
+    def _update_column_widths(self, row: list):
+        for column, value in enumerate(row):
+            value_length: int = len(str(value)) if value is not None else 0
+
+            if column < len(self._column_widths):
+                self._column_widths[column] = max(self._column_widths[column], value_length)
+            else:
+                self._column_widths.append(value_length)
+
+    def _write_row(self, row: list):
+        cells: list[WriteOnlyCell] = []
+
+        for value in row:
+            cell = WriteOnlyCell(self._worksheet, value=value)
+            cell.alignment = CELL_ALIGNMENT
+            cells.append(cell)
+
+        self._worksheet.append(cells)
+
+
+class ExcelDocumentWriter:
+    """Xlsx документ, который пишется за один проход без повторной загрузки файла."""
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self._workbook = Workbook(write_only=True)
+        self._sheets: list[ExcelSheetWriter] = []
+
+    def add_sheet(self, title: str, header: list[str]) -> ExcelSheetWriter:
+        worksheet: WriteOnlyWorksheet = self._workbook.create_sheet(title=title)
+        sheet = ExcelSheetWriter(worksheet, header)
+
+        self._sheets.append(sheet)
+
+        return sheet
+
+    def save(self):
+        for sheet in self._sheets:
+            sheet.flush()
+
+        # Пишем во временный файл, чтобы скачивание не получило недописанный документ
+        temporary_file_path: str = f"{self.file_path}.tmp"
+        self._workbook.save(temporary_file_path)
+        os.replace(temporary_file_path, self.file_path)
+
+
+class ParquetDocumentWriter:
+    """Parquet документ, одна строка на ответ.
+
+    id вопросов и вариантов ответа кодируются словарем, строки пишутся
+    пачками по PARQUET_BATCH_ROWS, поэтому память не зависит от числа ответов.
+    """
+
+    schema = pa.schema([
+        ("survey_result_id", pa.string()),
+        ("created_at", pa.timestamp("us")),
+        ("email", pa.string()),
+        ("score", pa.int64()),
+        ("question_id", pa.dictionary(pa.int32(), pa.string())),
+        ("answer_id", pa.dictionary(pa.int32(), pa.string())), # NULL - ответа нет среди вариантов
+        ("text", pa.string()),
+    ])
+
+    def __init__(self, file_path: str, metadata: dict[bytes, bytes] | None = None):
+        self.file_path = file_path
+        # Документ могут собирать одновременно несколько скачиваний, у каждого свой временный файл
+        self._temporary_file_path: str = f"{file_path}.{uuid.uuid4().hex}.tmp"
+        schema: pa.Schema = self.schema.with_metadata(metadata) if metadata else self.schema
+        self._writer = pq.ParquetWriter(self._temporary_file_path, schema, use_dictionary=["question_id", "answer_id", "email"])
+        self._columns: dict[str, list] = {field.name: [] for field in self.schema}
+
+    def append(self, row: dict):
+        for name, column in self._columns.items():
+            column.append(row[name])
+
+        if len(self._columns["survey_result_id"]) >= PARQUET_BATCH_ROWS:
+            self.flush()
+
+    def flush(self):
+        if not self._columns["survey_result_id"]:
+            return
+
+        batch = pa.record_batch(
+            [pa.array(self._columns[field.name], type=field.type) for field in self.schema],
+            schema=self.schema
+        )
+        self._writer.write_batch(batch)
+
+        for column in self._columns.values():
+            column.clear()
+
+    def write_table(self, table: pa.Table):
+        self.flush()
+        self._writer.write_table(table)
+
+    def save(self):
+        self.flush()
+        self._writer.close()
+
+        os.replace(self._temporary_file_path, self.file_path)
+
+
+class ParquetDocumentParts:
+    """Parquet документ, который дописывается частями.
+
+    Каждое обновление документа пишет в отдельный файл только новые строки,
+    имя части - смещение в SurveyRowsFile, с которого начинаются ее строки.
+    Части с тем же или большим смещением остались от упавшего обновления и
+    удаляются перед записью. Один файл для скачивания собирается из частей
+    в merge, только если с прошлой сборки набор частей изменился.
+    """
+
+    def __init__(self, directory_path: str):
+        self.directory_path = directory_path
+
+    @staticmethod
+    def _get_part_name(rows_offset: int) -> str:
+        # Смещение дополнено нулями, поэтому порядок имен совпадает с порядком строк
+        return f"part-{rows_offset:016d}.parquet"
+
+    def get_part_path(self, rows_offset: int) -> str:
+        return os.path.join(self.directory_path, self._get_part_name(rows_offset))
+
+    def get_part_names(self) -> list[str]:
+        if not os.path.exists(self.directory_path):
+            return []
+
+        return sorted(name for name in os.listdir(self.directory_path) if name.startswith("part-") and name.endswith(".parquet"))
+
+    def truncate(self, rows_offset: int, file_path: str):
+        # Удаляет части, начинающиеся с rows_offset и дальше, и собранный из них документ
+        os.makedirs(self.directory_path, exist_ok=True)
+        first_removed_part_name: str = self._get_part_name(rows_offset)
+        removed_part_names: list[str] = [part_name for part_name in self.get_part_names() if part_name >= first_removed_part_name]
+
+        for part_name in removed_part_names:
+            os.remove(os.path.join(self.directory_path, part_name))
+
+        if removed_part_names and os.path.exists(file_path):
+            os.remove(file_path)
+
+    def merge(self, file_path: str) -> bool:
+        # Собирает части в один файл. False - частей нет, документ еще не обновлялся
+        part_names: list[str] = self.get_part_names()
+
+        if not part_names:
+            return False
+
+        parts_metadata: bytes = json.dumps(part_names).encode("utf-8")
+
+        if os.path.exists(file_path) and (pq.read_schema(file_path).metadata or {}).get(PARQUET_PARTS_METADATA_KEY) == parts_metadata:
+            return True
+
+        # Группы строк копируются по одной, в памяти не больше одной группы
+        document_writer = ParquetDocumentWriter(file_path, {PARQUET_PARTS_METADATA_KEY: parts_metadata})
+
+        for part_name in part_names:
+            part_file = pq.ParquetFile(os.path.join(self.directory_path, part_name))
+
+            for row_group_index in range(part_file.num_row_groups):
+                document_writer.write_table(part_file.read_row_group(row_group_index).cast(ParquetDocumentWriter.schema))
+
+        document_writer.save()
+
+        return True
+
+
+class SurveyRowsFile:
+    """Уже посчитанные прохождения опроса в формате JSON Lines.
+
+    При обновлении документа сюда дописываются только новые прохождения,
+    а xlsx собирается из этого файла без обращения к базе. Файл обрезается
+    до размера, сохраненного в SurveyDocument, поэтому строки, дописанные
+    упавшим обновлением, не дублируются.
+    """
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self._file = None
+
+    def has_size(self, size: int) -> bool:
+        return os.path.exists(self.file_path) and os.path.getsize(self.file_path) >= size
+
+    def open(self, size: int = 0):
+        if size == 0 or not os.path.exists(self.file_path):
+            self._file = open(self.file_path, "wb")
+        else:
+            self._file = open(self.file_path, "r+b")
+            self._file.truncate(size)
+            self._file.seek(size)
+
+    def append(self, row: dict):
+        self._file.write(json.dumps(row, ensure_ascii=False, default=str).encode("utf-8") + b"\n")
+
+    def close(self) -> int:
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+        size: int = self._file.tell()
+
+        self._file.close()
+        self._file = None
+
+        return size
+
+    def iterate(self, start: int = 0) -> Iterator[dict]:
+        # start - смещение в байтах, с которого читаются строки
+        with open(self.file_path, "rb") as rows_file:
+            rows_file.seek(start)
+
+            for line in rows_file:
+                yield json.loads(line)
+
+    def __iter__(self) -> Iterator[dict]:
+        return self.iterate()
+
+
+def create_answers_header(max_answers: int) -> list[str]:
+    return ["email"] + [f"Ответ {i + 1}" for i in range(max_answers)]
@@ -1,33 +1,240 @@
+import asyncio
+import json
+import time
+import uuid
+import logging
+from enum import Enum
 from email.message import EmailMessage
 
 import aiosmtplib
 
 import config
+from fastapp.redis_client import redis_client
 
 
-async def send_email(receiver_email: str, title: str, message: str) -> bool:
-    sender_email: str = config.EMAIL_LOGIN
+logger = logging.getLogger(__name__)
 
-    msg = EmailMessage()
-    msg["From"] = sender_email
-    msg["To"] = receiver_email
-    msg["Subject"] = title
-    msg.set_content(message)
+class MailStatusEnum(str, Enum):
+    queued = "queued"
+    sent = "sent"
+    retrying = "retrying"
+    failed = "failed"
+    coalesced = "coalesced" # Вместо него отправлено более новое письмо тому же адресату
 
-    username: str = sender_email
 
-    try:
-        await aiosmtplib.send(
-            msg,
-            sender=sender_email,
-            recipients=receiver_email,
+class SMTPConnectionPool:
+    """Долгоживущие SMTP соединения процесса.
+
+    Соединение открывается при первой отправке и дальше переиспользуется,
+    поэтому TCP, TLS и AUTH проходят один раз на соединение, а не на письмо.
+    Очередь хранит size мест: None - место, соединение для которого еще не
+    открыто или было закрыто после ошибки. Пул привязан к event loop, в
+    котором начал работать, и должен жить в постоянном loop процесса.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self._connections: asyncio.Queue | None = None
+
+    def _get_connections(self) -> asyncio.Queue:
+        if self._connections is None:
+            self._connections = asyncio.Queue()
+
+            for _ in range(self.size):
+                self._connections.put_nowait(None)
+
+        return self._connections
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        smtp = aiosmtplib.SMTP(
             hostname=config.EMAIL_SMTP_HOST,
             port=config.EMAIL_SMTP_PORT,
-            username=username,
+            username=config.EMAIL_LOGIN,
             password=config.EMAIL_PASSWORD,
             use_tls=True
         )
+        await smtp.connect()
+
+        return smtp
+
+    async def send_message(self, msg: EmailMessage):
+        connections: asyncio.Queue = self._get_connections()
+        smtp: aiosmtplib.SMTP | None = await connections.get()
+
+        try:
+            try:
+                if smtp is None or not smtp.is_connected:
+                    smtp = await self._connect()
+
+                await smtp.send_message(msg)
+            except (aiosmtplib.SMTPServerDisconnected, ConnectionError):
+                # Сервер мог закрыть простаивающее соединение, пробуем один раз на новом
+                if smtp is not None:
+                    smtp.close()
+
+                smtp = await self._connect()
+                await smtp.send_message(msg)
+        except (aiosmtplib.SMTPServerDisconnected, aiosmtplib.SMTPConnectError, aiosmtplib.SMTPTimeoutError, ConnectionError):
+            self._discard(connections, smtp)
+            raise
+        except aiosmtplib.SMTPException:
+            # Ошибка письма (например, адрес отклонен), соединение можно переиспользовать
+            connections.put_nowait(smtp)
+            raise
+        except BaseException:
+            # Отмена посреди отправки оставляет соединение в неизвестном состоянии
+            self._discard(connections, smtp)
+            raise
+
+        connections.put_nowait(smtp)
+
+    @staticmethod
+    def _discard(connections: asyncio.Queue, smtp: aiosmtplib.SMTP | None):
+        if smtp is not None:
+            smtp.close()
+
+        connections.put_nowait(None)
+
+    async def close(self):
+        if self._connections is None:
+            return
+
+        while not self._connections.empty():
+            smtp: aiosmtplib.SMTP | None = self._connections.get_nowait()
+
+            if smtp is not None and smtp.is_connected:
+                try:
+                    await smtp.quit()
+                except aiosmtplib.SMTPException:
+                    smtp.close()
+
+        self._connections = None
+
+
+smtp_pool = SMTPConnectionPool(config.EMAIL_SMTP_POOL_SIZE)
+
+
+def _create_message(receiver_email: str, title: str, message: str) -> EmailMessage:
+    msg = EmailMessage()
+    msg["From"] = config.EMAIL_LOGIN
+    msg["To"] = receiver_email
+    msg["Subject"] = title
+    msg.set_content(message)
+
+    return msg
+
+
+async def send_email(receiver_email: str, title: str, message: str) -> bool:
+    try:
+        await smtp_pool.send_message(_create_message(receiver_email, title, message))
         return True
-    except Exception as e:
-        print(e)
-        return False
\ No newline at end of file
+    except Exception:
+        logger.exception("Failed to send email to %s", receiver_email)
+        return False
+
+
+# Mail queue
+
+def _get_mail_status_key(mail_id: str) -> str:
+    return f"{config.EMAIL_STATUS_KEY_PREFIX}{mail_id}"
+
+
+async def enqueue_email(receiver_email: str, title: str, message: str) -> tuple[str, bool]:
+    # Письмо кладется в очередь Redis одной транзакцией. Возвращает id письма и
+    # нужно ли запланировать отправку пачки: флаг ставит первое письмо окна
+    mail_id: str = uuid.uuid4().hex
+    mail: dict = {"id": mail_id, "receiver_email": receiver_email, "title": title, "message": message, "attempts": 0, "created_at": time.time()}
+
+    async with redis_client.pipeline(transaction=True) as pipeline:
+        pipeline.rpush(config.EMAIL_QUEUE_KEY, json.dumps(mail))
+        pipeline.set(_get_mail_status_key(mail_id), MailStatusEnum.queued.value, ex=config.EMAIL_STATUS_EXPIRES_SECONDS)
+        pipeline.set(config.EMAIL_BATCH_SCHEDULED_KEY, 1, nx=True, px=config.EMAIL_BATCH_WINDOW_MS)
+        _, _, is_batch_scheduled = await pipeline.execute()
+
+    return mail_id, bool(is_batch_scheduled)
+
+
+async def get_email_status(mail_id: str) -> str | None:
+    status: bytes | None = await redis_client.get(_get_mail_status_key(mail_id))
+
+    return status.decode("utf-8") if status is not None else None
+
+
+async def _pop_due_retry_emails() -> list[bytes]:
+    # Повторные отправки лежат в sorted set по времени, когда их пора отправить
+    now: float = time.time()
+
+    async with redis_client.pipeline(transaction=True) as pipeline:
+        pipeline.zrangebyscore(config.EMAIL_RETRY_QUEUE_KEY, "-inf", now)
+        pipeline.zremrangebyscore(config.EMAIL_RETRY_QUEUE_KEY, "-inf", now)
+        raw_mails, _ = await pipeline.execute()
+
+    return raw_mails
+
+
+async def send_queued_emails() -> int:
+    # Разбирает очередь пачками по EMAIL_BATCH_SIZE, пока она не опустеет.
+    # Возвращает, сколько писем отложено на повторную отправку
+    # Флаг снимается до чтения очереди: письмо, которое его застало, уже лежит в очереди
+    await redis_client.delete(config.EMAIL_BATCH_SCHEDULED_KEY)
+
+    retry_mails: list[dict] = []
+    # Подошедшие повторы идут в первую пачку, чтобы схлопнуться с новыми письмами тем же адресатам
+    raw_mails: list[bytes] = await _pop_due_retry_emails()
+
+    while True:
+        raw_mails += await redis_client.lpop(config.EMAIL_QUEUE_KEY, config.EMAIL_BATCH_SIZE) or []
+
+        if not raw_mails:
+            break
+
+        # Несколько кодов на один адрес в пределах пачки - отправляем только самый новый
+        mails: dict[tuple[str, str], dict] = {}
+        statuses: dict[str, str] = {}
+
+        for raw_mail in raw_mails:
+            mail: dict = json.loads(raw_mail)
+            mail_key: tuple[str, str] = (mail["receiver_email"], mail["title"])
+            coalesced_mail: dict | None = mails.get(mail_key)
+
+            if coalesced_mail is not None:
+                if coalesced_mail.get("created_at", 0) > mail.get("created_at", 0):
+                    coalesced_mail, mail = mail, coalesced_mail
+
+                statuses[coalesced_mail["id"]] = MailStatusEnum.coalesced.value
+
+            mails[mail_key] = mail
+
+        raw_mails = []
+
+        send_results: list = await asyncio.gather(
+            *(smtp_pool.send_message(_create_message(mail["receiver_email"], mail["title"], mail["message"])) for mail in mails.values()),
+            return_exceptions=True
+        )
+
+        for mail, send_result in zip(mails.values(), send_results):
+            if not isinstance(send_result, Exception):
+                statuses[mail["id"]] = MailStatusEnum.sent.value
+                continue
+
+            logger.error("Failed to send email %s to %s: %s", mail["id"], mail["receiver_email"], send_result)
+            mail["attempts"] += 1
+
+            if mail["attempts"] < config.EMAIL_MAX_ATTEMPTS:
+                statuses[mail["id"]] = MailStatusEnum.retrying.value
+                retry_mails.append(mail)
+            else:
+                statuses[mail["id"]] = MailStatusEnum.failed.value
+
+        async with redis_client.pipeline(transaction=False) as pipeline:
+            for mail_id, status in statuses.items():
+                pipeline.set(_get_mail_status_key(mail_id), status, ex=config.EMAIL_STATUS_EXPIRES_SECONDS)
+
+            await pipeline.execute()
+
+    # Неотправленные откладываются на EMAIL_RETRY_DELAY_SECONDS, очередь новых писем их не подхватит
+    if retry_mails:
+        retry_time: float = time.time() + config.EMAIL_RETRY_DELAY_SECONDS
+        await redis_client.zadd(config.EMAIL_RETRY_QUEUE_KEY, {json.dumps(mail): retry_time for mail in retry_mails})
+
+    return len(retry_mails)
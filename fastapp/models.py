@@ -1,20 +1,24 @@
 import uuid
 from datetime import datetime, timedelta
 
-from sqlalchemy import ForeignKey
-from sqlalchemy.dialects.postgresql import ENUM
+from sqlalchemy import ForeignKey, Index
+from sqlalchemy.dialects.postgresql import ENUM, JSONB
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
 import config
 
 class Base(DeclarativeBase):
-    id: Mapped[uuid.UUID] = mapped_column(primary_key=True, index=True, default=uuid.uuid4)
-    created_at: Mapped[datetime] = mapped_column(default=datetime.now())
-    updated_at: Mapped[datetime] = mapped_column(onupdate=datetime.now(), nullable=True)
+    id: Mapped[uuid.UUID] = mapped_column(primary_key=True, default=uuid.uuid4)
+    created_at: Mapped[datetime] = mapped_column(default=datetime.now)
+    updated_at: Mapped[datetime] = mapped_column(onupdate=datetime.now, nullable=True)
 
 
 class Code(Base):
     __tablename__ = "code_table"
+    __table_args__ = (
+        Index("ix_code_table_email_code_expire_datetime", "email", "code", "expire_datetime"),
+        Index("ix_code_table_expire_datetime", "expire_datetime"),
+    )
 
     email: Mapped[str]
     code: Mapped[str]
@@ -27,7 +31,7 @@ class User(Base):
     name: Mapped[str] # Имя
     surname: Mapped[str] # Фамилия
 
-    email: Mapped[str] = mapped_column(nullable=True)
+    email: Mapped[str] = mapped_column(nullable=True, index=True)
 
     surveys: Mapped[list["Survey"]] = relationship(back_populates="user")
     user_surveys: Mapped[list["UserSurveyResult"]] = relationship(back_populates="user")
@@ -39,7 +43,7 @@ class Survey(Base):
     document: Mapped["SurveyDocument"] = relationship(uselist=False, backref="survey")
 
     user: Mapped["User"] = relationship(back_populates="surveys")
-    user_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("user_table.id", ondelete="SET NULL"))
+    user_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("user_table.id", ondelete="SET NULL"), index=True)
 
     title: Mapped[str]
     description: Mapped[str] = mapped_column(nullable=True)
@@ -61,7 +65,7 @@ class Question(Base):
     __tablename__ = "question_table"
 
     survey: Mapped["Survey"] = relationship(back_populates="questions")
-    survey_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("survey_table.id", ondelete="CASCADE"))
+    survey_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("survey_table.id", ondelete="CASCADE"), index=True)
 
     title: Mapped[str]
     score: Mapped[int] = mapped_column(default=0)
@@ -77,7 +81,7 @@ class QuestionAnswer(Base):
     __tablename__ = "question_answer_table"
 
     question: Mapped["Question"] = relationship(back_populates="answers")
-    question_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("question_table.id", ondelete="CASCADE"))
+    question_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("question_table.id", ondelete="CASCADE"), index=True)
 
     is_correct: Mapped[bool] = mapped_column(default=False) # Правильный ли ответ
 
@@ -86,12 +90,18 @@ class QuestionAnswer(Base):
 
 class UserSurveyResult(Base):
     __tablename__ = "user_survey_result_table"
+    __table_args__ = (
+        Index("ix_user_survey_result_table_survey_id_user_id", "survey_id", "user_id"), # Проверка повторной отправки
+        Index("ix_user_survey_result_table_survey_id_created_at_id", "survey_id", "created_at", "id"), # Новые ответы для документа
+    )
 
     user: Mapped["User"] = relationship(back_populates="user_surveys")
-    user_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("user_table.id", ondelete="SET NULL"), nullable=True)
+    user_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("user_table.id", ondelete="SET NULL"), nullable=True, index=True)
     survey: Mapped["Survey"] = relationship(back_populates="user_survey_results")
     survey_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("survey_table.id", ondelete="CASCADE"))
 
+    score: Mapped[int] = mapped_column(nullable=True) # Баллы, NULL - еще не проверено
+
     user_questions: Mapped[list["UserQuestionResult"]] = relationship(back_populates="user_survey_result")
 
 
@@ -99,10 +109,13 @@ class UserQuestionResult(Base):
     __tablename__ = "user_question_result_table"
 
     user_survey_result: Mapped["UserSurveyResult"] = relationship(back_populates="user_questions")
-    user_survey_result_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("user_survey_result_table.id", ondelete="CASCADE"))
+    user_survey_result_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("user_survey_result_table.id", ondelete="CASCADE"), index=True)
     question: Mapped["Question"] = relationship(back_populates="user_question_results")
     question_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("question_table.id", ondelete="CASCADE"))
 
+    is_correct: Mapped[bool] = mapped_column(default=False) # Правильно ли отвечен вопрос
+    score: Mapped[int] = mapped_column(nullable=True) # Баллы, NULL - еще не проверено
+
     user_answers: Mapped[list["UserAnswerResult"]] = relationship(back_populates="user_question_result")
 
 
@@ -110,7 +123,7 @@ class UserAnswerResult(Base):
     __tablename__ = "user_answer_result_table"
 
     user_question_result: Mapped["UserQuestionResult"] = relationship(back_populates="user_answers")
-    user_question_result_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("user_question_result_table.id", ondelete="CASCADE"))
+    user_question_result_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("user_question_result_table.id", ondelete="CASCADE"), index=True)
 
     is_correct: Mapped[bool] = mapped_column(default=False) # Правильный ли ответ
     
@@ -120,11 +133,27 @@ class UserAnswerResult(Base):
 class SurveyDocument(Base):
     __tablename__ = "survey_document_table"
 
-    survey_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("survey_table.id", ondelete="CASCADE"))
+    survey_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("survey_table.id", ondelete="CASCADE"), index=True)
 
     title: Mapped[str]
     refresh_document_datetime: Mapped[datetime] = mapped_column(
-        default=datetime.now() + timedelta(minutes=config.WAIT_BEFORE_REFRESH_DOCUMENT_MINUTES),
-        onupdate=datetime.now() + timedelta(minutes=config.WAIT_BEFORE_REFRESH_DOCUMENT_MINUTES)
+        default=lambda: datetime.now() + timedelta(minutes=config.WAIT_BEFORE_REFRESH_DOCUMENT_MINUTES)
     )
 
+    # Состояние инкрементального обновления документа
+    last_survey_result_created_at: Mapped[datetime] = mapped_column(nullable=True) # Последний попавший в документ ответ
+    last_survey_result_id: Mapped[uuid.UUID] = mapped_column(nullable=True)
+    rows_file_size: Mapped[int] = mapped_column(default=0) # Размер файла с посчитанными строками
+    survey_definition_hash: Mapped[str] = mapped_column(nullable=True) # При изменении вопросов документ собирается заново
+
+
+class SurveyStatistic(Base):
+    __tablename__ = "survey_statistic_table"
+
+    survey_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("survey_table.id", ondelete="CASCADE"), unique=True)
+
+    response_count: Mapped[int] = mapped_column(default=0) # Количество прохождений
+    statistic: Mapped[dict] = mapped_column(JSONB, nullable=True) # Статистика по вопросам и баллам
+    refresh_statistic_datetime: Mapped[datetime] = mapped_column(
+        default=lambda: datetime.now() + timedelta(seconds=config.SURVEY_STATISTIC_REFRESH_SECONDS)
+    )
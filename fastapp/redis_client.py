@@ -0,0 +1,7 @@
+from redis import asyncio as aioredis
+
+import config
+
+
+# Общий клиент Redis приложения, соединения открываются при первом запросе
+redis_client: aioredis.Redis = aioredis.from_url(config.REDIS_URL)
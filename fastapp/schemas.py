@@ -93,9 +93,11 @@ class Survey(SurveyCreate, BaseCustomModel):
     user_id: uuid.UUID
     is_finished: bool = False # Завершен ли опрос
 
-class SurveyGet(Survey):
+class SurveyOwnerGet(Survey):
+    # Создатель опроса видит все ответы, фильтрация не нужна
     questions: list["QuestionGet"]
 
+class SurveyGet(SurveyOwnerGet):
     @model_validator(mode="after")
     def filter_answers_based_on_type(cls, survey):
         if not survey.show_results:
@@ -105,19 +107,23 @@ class SurveyGet(Survey):
                     if question.type == QuestionTypeEnum.text:
                         question.answers = None
                     else:
-                        if question.answers is not None:
-                            # Убираем поле is_correct
-                            question.answers = [
-                                QuestionAnswerGet(
-                                    **{k: v for k, v in answer.dict().items() if k != "is_correct"}
-                                ) for answer in question.answers
-                            ]
+                        # Скрываем is_correct на месте, без повторной валидации ответов
+                        for answer in question.answers:
+                            answer.is_correct = False
         
         return survey
 
 class SurveyId(BaseConfigModel):
     survey_id: uuid.UUID
 
+class SurveyResultsExportFormatEnum(str, Enum):
+    ndjson = "ndjson"
+    csv = "csv"
+
+class SurveyDocumentFormatEnum(str, Enum):
+    xlsx = "xlsx"
+    parquet = "parquet"
+
 # Question Models
 class QuestionTypeEnum(str, Enum):
     text = "text"
@@ -167,27 +173,43 @@ class UserSurveyResultBase(BaseConfigModel):
 class UserSurveyResultCreate(UserSurveyResultBase):
     user_questions: list["UserQuestionsResultCreate"]
 
-class UserSurveyResultGet(UserSurveyResultBase, BaseCustomModel):
+class UserSurveyResultOwnerGet(UserSurveyResultBase, BaseCustomModel):
+    # Создатель опроса видит баллы и правильность всех ответов
     survey: "SurveyBase"
     user_id: uuid.UUID | None = None
+    score: int | None = None # Баллы
     user_questions: list["UserQuestionsResultGet"]
 
+class UserSurveyResultGet(UserSurveyResultOwnerGet):
     @model_validator(mode="after")
     def filter_answers_based_on_type(cls, survey):
+        if not survey.survey.show_score:
+            survey.score = None
+            for user_question in survey.user_questions:
+                user_question.score = None
+
         if not survey.survey.show_results:
             for user_question in survey.user_questions:
                 if not user_question.question.show_answers:
+                    # Скрываем правильность ответов пользователя, баллы за вопрос ее выдают
+                    user_question.is_correct = False
+                    user_question.score = None
+                    for user_answer in user_question.user_answers:
+                        user_answer.is_correct = False
+
                     if user_question.question.type == QuestionTypeEnum.text:
                         user_question.question.answers = None
                     else:
-                        if user_question.question.answers is not None:
-                            user_question.question.answers = [
-                                QuestionAnswerGet(
-                                    **{k: v for k, v in answer.dict().items() if k != "is_correct"}
-                                ) for answer in user_question.question.answers
-                            ]
+                        for answer in user_question.question.answers:
+                            answer.is_correct = False
         return survey
 
+class UserSurveyResultCompactGet(UserSurveyResultBase, BaseCustomModel):
+    # Вопросы не встраиваются в каждый ответ, а указываются через question_id
+    user_id: uuid.UUID | None = None
+    score: int | None = None
+    user_questions: list["UserQuestionsResultCompactGet"]
+
 class UserSurveyResultId(BaseConfigModel):
     survey_result_id: uuid.UUID
 
@@ -203,9 +225,16 @@ class UserQuestionsResult(UserQuestionsResultBase, BaseCustomModel):
     user_survey_result_id: uuid.UUID
 
 class UserQuestionsResultGet(UserQuestionsResult):
+    is_correct: bool = False # Правильно ли отвечен вопрос
+    score: int | None = None # Баллы
     question: "QuestionGet"
     user_answers: list["UserAnswerResultGet"]
 
+class UserQuestionsResultCompactGet(UserQuestionsResult):
+    is_correct: bool = False
+    score: int | None = None
+    user_answers: list["UserAnswerResultGet"]
+
 # UserAnswerResult Models
 class UserAnswerResultBase(BaseConfigModel):
     text: str
@@ -217,4 +246,33 @@ class UserAnswerResult(UserAnswerResultCreate, BaseCustomModel):
     user_question_result_id: uuid.UUID
 
 class UserAnswerResultGet(UserAnswerResult):
-    is_correct: bool
\ No newline at end of file
+    is_correct: bool
+
+
+# SurveyStatistic Models
+class AnswerStatisticGet(BaseConfigModel):
+    answer_id: uuid.UUID
+    text: str
+    pick_count: int = 0 # Сколько раз выбран
+
+
+class QuestionStatisticGet(BaseConfigModel):
+    question_id: uuid.UUID
+    result_count: int = 0 # Сколько раз отвечен
+    correct_count: int = 0 # Сколько раз отвечен правильно
+    correct_rate: float | None = None
+    answers: list["AnswerStatisticGet"]
+    other_pick_count: int = 0 # Ответы, которых нет среди вариантов (текстовые)
+
+
+class ScoreStatisticGet(BaseConfigModel):
+    score: int
+    count: int
+
+
+class SurveyStatisticGet(BaseConfigModel):
+    survey_id: uuid.UUID
+    response_count: int = 0
+    questions: list["QuestionStatisticGet"]
+    score_histogram: list["ScoreStatisticGet"]
+    updated_at: datetime | None = None # Когда статистика пересчитывалась
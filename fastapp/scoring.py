@@ -0,0 +1,292 @@
+import uuid
+from typing import Iterable
+
+import numpy as np
+
+from fastapp import models
+from fastapp.schemas import QuestionTypeEnum
+
+
+SINGLE_ANSWER_QUESTION_TYPES = (QuestionTypeEnum.text, QuestionTypeEnum.choose_one, QuestionTypeEnum.dropdown_list)
+UNKNOWN_CODE = -1 # Ответ, которого нет среди вариантов вопроса
+
+
+class SurveyResultsBatch:
+    """Прохождения опроса в колоночном виде.
+
+    Результат вопроса (UserQuestionResult) - это пара (респондент, вопрос),
+    каждый ответ ссылается на свой результат вопроса и хранит код варианта.
+    respondent_ids и result_ids - id прохождений и результатов вопросов в
+    порядке индексов, по ним оценки записываются обратно в базу.
+    """
+
+    def __init__(
+        self,
+        respondent_ids: list[uuid.UUID],
+        result_ids: list[uuid.UUID],
+        result_respondents: np.ndarray,
+        result_questions: np.ndarray,
+        answer_results: np.ndarray,
+        answer_codes: np.ndarray
+    ):
+        self.respondent_ids = respondent_ids
+        self.result_ids = result_ids
+        self.result_respondents = result_respondents
+        self.result_questions = result_questions
+        self.answer_results = answer_results
+        self.answer_codes = answer_codes
+
+
+class SurveyScores:
+    def __init__(
+        self,
+        respondent_scores: np.ndarray,
+        result_is_correct: np.ndarray,
+        result_scores: np.ndarray,
+        answer_is_correct: np.ndarray,
+        question_correct_counts: np.ndarray,
+        question_result_counts: np.ndarray
+    ):
+        self.respondent_scores = respondent_scores # Баллы каждого респондента
+        self.result_is_correct = result_is_correct # Правильно ли отвечен каждый результат вопроса
+        self.result_scores = result_scores # Баллы за каждый результат вопроса
+        self.answer_is_correct = answer_is_correct # Правильный ли каждый ответ
+        self.question_correct_counts = question_correct_counts # Сколько раз вопрос отвечен правильно
+        self.question_result_counts = question_result_counts # Сколько раз вопрос отвечен
+
+
+class QuestionGrade:
+    # Объект создается на каждый результат вопроса, __slots__ ускоряет создание
+    __slots__ = ("is_correct", "score", "answer_is_correct")
+
+    def __init__(self, is_correct: bool, score: int, answer_is_correct: list[bool]):
+        self.is_correct = is_correct
+        self.score = score
+        self.answer_is_correct = answer_is_correct
+
+
+class RespondentGrade:
+    __slots__ = ("score", "question_grades")
+
+    def __init__(self, score: int, question_grades: list[QuestionGrade]):
+        self.score = score
+        self.question_grades = question_grades
+
+
+class SurveyScorer:
+    """Проверка ответов на опрос.
+
+    Одно прохождение (отправка ответа, непроверенные строки документа)
+    проверяется в grade_respondent сравнением с готовыми множествами
+    правильных ответов. Пачка прохождений (перепроверка опроса) кодируется
+    в колонки прямо из строк базы в encode_rows, и score проверяет все
+    результаты пачки за несколько проходов bincount/unique.
+    """
+
+    def __init__(self, questions: list[models.Question]):
+        self.question_ids: list[uuid.UUID] = [question.id for question in questions]
+        self.question_indexes: dict[uuid.UUID, int] = {question.id: index for index, question in enumerate(questions)}
+        self.required_question_ids: frozenset[uuid.UUID] = frozenset(question.id for question in questions if question.is_required)
+
+        # question_id -> (один ответ, choose_many, правильные тексты, отсортированный список правильных текстов, баллы)
+        self._question_keys: dict[uuid.UUID, tuple[bool, bool, frozenset[str], list[str], int]] = {}
+
+        for question in questions:
+            correct_texts: list[str] = [question_answer.text for question_answer in question.answers if question_answer.is_correct]
+            self._question_keys[question.id] = (
+                question.type in SINGLE_ANSWER_QUESTION_TYPES,
+                question.type == QuestionTypeEnum.choose_many,
+                frozenset(correct_texts),
+                sorted(correct_texts),
+                question.score or 0
+            )
+
+        # Вопросы не из опроса получают индекс после последнего вопроса: он не бывает отвечен правильно
+        self.unknown_question_index: int = len(questions)
+
+        # Колонки для пачки строятся при первом encode_rows: одному прохождению они не нужны.
+        # Варианты копируются сразу: объекты опроса истекают после commit, а SurveyScorer живет в кэше дольше сессии
+        self._question_answers: list[tuple[uuid.UUID, list[tuple[str, bool]]]] = [
+            (question.id, [(question_answer.text, question_answer.is_correct) for question_answer in question.answers])
+            for question in questions
+        ]
+        self._answer_codes: list[dict[str, int]] | None = None
+
+    def _build_columns(self):
+        question_scores: list[int] = []
+        question_is_single_answer: list[bool] = []
+        question_is_choose_many: list[bool] = []
+        question_correct_answer_counts: list[int] = [] # Разных правильных текстов у вопроса
+
+        # Для каждого вопроса: текст варианта -> код
+        answer_codes: list[dict[str, int]] = [{} for _ in range(len(self._question_answers) + 1)]
+        answer_is_correct: list[bool] = []
+        answer_correct_counts: list[int] = []
+
+        for question_index, (question_id, question_answers) in enumerate(self._question_answers):
+            question_answer_codes: dict[str, int] = answer_codes[question_index]
+            is_single_answer, is_choose_many, correct_texts, _, score = self._question_keys[question_id]
+
+            question_scores.append(score)
+            question_is_single_answer.append(is_single_answer)
+            question_is_choose_many.append(is_choose_many)
+            question_correct_answer_counts.append(len(correct_texts))
+
+            for answer_text, is_correct in question_answers:
+                answer_code: int | None = question_answer_codes.get(answer_text)
+
+                if answer_code is None:
+                    answer_code = len(answer_is_correct)
+                    question_answer_codes[answer_text] = answer_code
+                    answer_is_correct.append(False)
+                    answer_correct_counts.append(0)
+
+                # Одинаковые тексты вариантов получают один код, но для choose_many
+                # правильный текст нужно выбрать столько раз, сколько он правильный
+                if is_correct:
+                    answer_is_correct[answer_code] = True
+                    answer_correct_counts[answer_code] += 1
+
+        self.question_scores = np.array(question_scores + [0], dtype=np.int64)
+        self.question_is_single_answer = np.array(question_is_single_answer + [False], dtype=bool)
+        self.question_is_choose_many = np.array(question_is_choose_many + [False], dtype=bool)
+        self.question_correct_answer_counts = np.array(question_correct_answer_counts + [0], dtype=np.int64)
+
+        self.answer_is_correct = np.array(answer_is_correct, dtype=bool)
+        self.answer_correct_counts = np.array(answer_correct_counts, dtype=np.int64)
+        self._answer_codes = answer_codes
+
+    def grade_respondent(self, user_questions: Iterable[tuple[uuid.UUID, list[str]]]) -> RespondentGrade:
+        # Одно прохождение: пары (question_id, тексты ответов). Колонки numpy для
+        # одного прохождения стоят дороже самой проверки, поэтому здесь обычный Python
+        question_grades: list[QuestionGrade] = []
+        user_score: int = 0
+
+        for question_id, user_answers in user_questions:
+            question_key: tuple | None = self._question_keys.get(question_id)
+
+            if question_key is None:
+                question_grades.append(QuestionGrade(False, 0, [False] * len(user_answers)))
+                continue
+
+            is_single_answer, is_choose_many, correct_texts, sorted_correct_texts, score = question_key
+
+            if is_single_answer:
+                is_correct: bool = len(user_answers) == 1 and user_answers[0] in correct_texts
+            elif is_choose_many:
+                # Сравнение отсортированных списков учитывает повторы, как и проверка пачки
+                is_correct = len(user_answers) == len(sorted_correct_texts) and sorted(user_answers) == sorted_correct_texts
+            else:
+                is_correct = False
+
+            question_score: int = score if is_correct else 0
+            user_score += question_score
+            question_grades.append(QuestionGrade(is_correct, question_score, [user_answer in correct_texts for user_answer in user_answers]))
+
+        return RespondentGrade(user_score, question_grades)
+
+    def encode_rows(self, rows: Iterable[tuple[uuid.UUID, uuid.UUID | None, uuid.UUID | None, str | None]]) -> SurveyResultsBatch:
+        # rows - строки ответов из базы (survey_result_id, question_result_id, question_id, text),
+        # строки одного прохождения и одного результата вопроса идут подряд.
+        # question_result_id None - прохождение без результатов, text None - результат без ответов.
+        # Колонки собираются за один проход, без промежуточных прохождений и списков ответов
+        if self._answer_codes is None:
+            self._build_columns()
+
+        respondent_ids: list[uuid.UUID] = []
+        result_ids: list[uuid.UUID] = []
+        result_respondents: list[int] = []
+        result_questions: list[int] = []
+        answer_results: list[int] = []
+        answer_codes: list[int] = []
+
+        last_survey_result_id: uuid.UUID | None = None
+        last_question_result_id: uuid.UUID | None = None
+        question_answer_codes: dict[str, int] = {}
+        respondent_index: int = -1
+        result_index: int = -1
+
+        for survey_result_id, question_result_id, question_id, text in rows:
+            if survey_result_id != last_survey_result_id:
+                last_survey_result_id = survey_result_id
+                last_question_result_id = None
+                respondent_index += 1
+                respondent_ids.append(survey_result_id)
+
+            if question_result_id is None:
+                continue
+
+            if question_result_id != last_question_result_id:
+                last_question_result_id = question_result_id
+                question_index: int = self.question_indexes.get(question_id, self.unknown_question_index)
+                question_answer_codes = self._answer_codes[question_index]
+                result_index += 1
+                result_ids.append(question_result_id)
+                result_respondents.append(respondent_index)
+                result_questions.append(question_index)
+
+            if text is not None:
+                answer_results.append(result_index)
+                answer_codes.append(question_answer_codes.get(text, UNKNOWN_CODE))
+
+        return SurveyResultsBatch(
+            respondent_ids=respondent_ids,
+            result_ids=result_ids,
+            result_respondents=np.array(result_respondents, dtype=np.int64),
+            result_questions=np.array(result_questions, dtype=np.int64),
+            answer_results=np.array(answer_results, dtype=np.int64),
+            answer_codes=np.array(answer_codes, dtype=np.int64)
+        )
+
+    def score(self, batch: SurveyResultsBatch) -> SurveyScores:
+        if self._answer_codes is None:
+            self._build_columns()
+
+        result_count: int = len(batch.result_questions)
+        code_count: int = max(len(self.answer_is_correct), 1)
+
+        answer_is_known: np.ndarray = batch.answer_codes != UNKNOWN_CODE
+        answer_is_correct = np.zeros(len(batch.answer_codes), dtype=bool)
+        answer_is_correct[answer_is_known] = self.answer_is_correct[batch.answer_codes[answer_is_known]]
+
+        answer_counts: np.ndarray = np.bincount(batch.answer_results, minlength=result_count)
+        correct_answer_counts: np.ndarray = np.bincount(batch.answer_results, weights=answer_is_correct, minlength=result_count)
+
+        # Сколько раз каждый правильный код выбран в каждом результате вопроса
+        correct_answer_keys, correct_key_counts = np.unique(
+            batch.answer_results[answer_is_correct] * code_count + batch.answer_codes[answer_is_correct],
+            return_counts=True
+        )
+        correct_key_results: np.ndarray = correct_answer_keys // code_count
+        correct_key_matches: np.ndarray = correct_key_counts == self.answer_correct_counts[correct_answer_keys % code_count]
+
+        distinct_correct_counts: np.ndarray = np.bincount(correct_key_results, minlength=result_count)
+        matched_correct_counts: np.ndarray = np.bincount(correct_key_results, weights=correct_key_matches, minlength=result_count)
+
+        result_questions: np.ndarray = batch.result_questions
+        expected_correct_counts: np.ndarray = self.question_correct_answer_counts[result_questions]
+
+        # text, choose_one, dropdown_list - ровно один ответ и он правильный.
+        # choose_many - отсортированный список ответов совпадает со списком правильных:
+        # лишних ответов нет, и каждый правильный текст выбран столько раз, сколько он правильный
+        result_is_correct: np.ndarray = (
+            self.question_is_single_answer[result_questions]
+            & (answer_counts == 1)
+            & (distinct_correct_counts == 1)
+        ) | (
+            self.question_is_choose_many[result_questions]
+            & (answer_counts == correct_answer_counts)
+            & (matched_correct_counts == expected_correct_counts)
+        )
+
+        result_scores: np.ndarray = np.where(result_is_correct, self.question_scores[result_questions], 0)
+        question_count: int = len(self.question_ids)
+
+        return SurveyScores(
+            respondent_scores=np.bincount(batch.result_respondents, weights=result_scores, minlength=len(batch.respondent_ids)).astype(np.int64),
+            result_is_correct=result_is_correct,
+            result_scores=result_scores,
+            answer_is_correct=answer_is_correct,
+            question_correct_counts=np.bincount(result_questions, weights=result_is_correct, minlength=question_count + 1)[:question_count].astype(np.int64),
+            question_result_counts=np.bincount(result_questions, minlength=question_count + 1)[:question_count]
+        )
@@ -0,0 +1,207 @@
+"""Асинхронный воркер для I/O задач celery.
+
+Забирает сообщения celery из очереди CELERY_IO_QUEUE в брокере Redis и
+выполняет корутины задач в одном event loop, до ASYNC_WORKER_CONCURRENCY
+одновременно. Задачи с тяжелыми вычислениями (документы, статистика)
+остаются в очереди по умолчанию и выполняются prefork воркерами celery.
+
+Запуск (при ASYNC_WORKER_ENABLED=True):
+
+    python -m fastapp.tasks.async_worker
+
+Сообщение перекладывается BLMOVE в список выполняемых сообщений воркера
+(CELERY_IO_PROCESSING_QUEUE_PREFIX + ASYNC_WORKER_NAME) и удаляется из него
+после выполнения задачи. При запуске воркер возвращает в очередь сообщения,
+оставшиеся в его списке после падения, поэтому задача может выполниться
+повторно (at-least-once). Сообщения с eta в будущем не ждут в воркере, а
+уходят в CELERY_IO_SCHEDULED_QUEUE и возвращаются в очередь, когда пора.
+Результаты задач в backend не записываются: I/O задачи вызываются без
+ожидания результата. Сообщения, которые не удалось разобрать или с
+неизвестной задачей, перекладываются в CELERY_IO_DEAD_LETTER_QUEUE.
+"""
+import asyncio
+import base64
+import logging
+import signal
+import time
+from datetime import datetime, timezone
+
+from kombu.utils.json import loads as kombu_loads
+from redis import asyncio as aioredis
+
+import config
+from fastapp import emails
+from fastapp.database import sessionmanager
+from fastapp.tasks import celery_tasks
+
+
+logger = logging.getLogger(__name__)
+
+BROKER_POLL_TIMEOUT_SECONDS = 1 # Как часто проверяется сигнал остановки и отложенные сообщения, пока очередь пуста
+SCHEDULED_BATCH_SIZE = 100 # Сколько отложенных сообщений возвращается в очередь за раз
+
+# Отложенные сообщения, время которых пришло, переносятся в очередь атомарно:
+# два воркера не вернут одно сообщение дважды, и падение не потеряет его между командами.
+# RPUSH кладет их к концу, с которого забирает BLMOVE, поэтому они выполняются первыми
+REQUEUE_DUE_MESSAGES_SCRIPT = """
+local messages = redis.call("ZRANGEBYSCORE", KEYS[1], "-inf", ARGV[1], "LIMIT", 0, ARGV[2])
+for _, message in ipairs(messages) do
+    redis.call("ZREM", KEYS[1], message)
+    redis.call("RPUSH", KEYS[2], message)
+end
+return #messages
+"""
+
+# Имя задачи celery -> корутина _<задача> из celery_tasks с той же сигнатурой.
+# Тот же список задач направляет их в CELERY_IO_QUEUE, поэтому в очереди нет задач, которых нет здесь
+ASYNC_TASKS = {
+    getattr(celery_tasks, task_name).name: getattr(celery_tasks, f"_{task_name}")
+    for task_name in config.CELERY_IO_TASKS
+}
+
+
+def _decode_message(raw_message: bytes) -> tuple[str, list, dict, datetime | None]:
+    # Конверт kombu, протокол сообщений celery 2: тело - [args, kwargs, embed]
+    message: dict = kombu_loads(raw_message)
+    body: str | bytes = message["body"]
+
+    if message["properties"].get("body_encoding") == "base64":
+        body = base64.b64decode(body)
+
+    args, kwargs, _ = kombu_loads(body)
+    headers: dict = message["headers"]
+    eta: datetime | None = datetime.fromisoformat(headers["eta"]) if headers.get("eta") else None
+
+    return headers["task"], args, kwargs, eta
+
+
+class Broker:
+    """Очереди асинхронного воркера в Redis брокера celery."""
+
+    def __init__(self, redis: aioredis.Redis, worker_name: str):
+        self._redis = redis
+        self.processing_queue: str = f"{config.CELERY_IO_PROCESSING_QUEUE_PREFIX}{worker_name}"
+        self._requeue_due_messages_script = redis.register_script(REQUEUE_DUE_MESSAGES_SCRIPT)
+
+    async def restore_processing_messages(self) -> int:
+        # Сообщения, которые воркер с этим именем не успел выполнить до падения, возвращаются в очередь
+        restored_count: int = 0
+
+        while await self._redis.lmove(self.processing_queue, config.CELERY_IO_QUEUE, "RIGHT", "RIGHT") is not None:
+            restored_count += 1
+
+        return restored_count
+
+    async def receive(self) -> bytes | None:
+        # kombu кладет сообщения через LPUSH и забирает справа, сообщение остается в списке воркера до ack
+        return await self._redis.blmove(config.CELERY_IO_QUEUE, self.processing_queue, BROKER_POLL_TIMEOUT_SECONDS, "RIGHT", "LEFT")
+
+    async def ack(self, raw_message: bytes):
+        await self._redis.lrem(self.processing_queue, 1, raw_message)
+
+    async def dead_letter(self, raw_message: bytes):
+        # Сообщение сохраняется как есть, его можно разобрать и вернуть в CELERY_IO_QUEUE вручную
+        async with self._redis.pipeline(transaction=True) as pipeline:
+            pipeline.lpush(config.CELERY_IO_DEAD_LETTER_QUEUE, raw_message)
+            pipeline.lrem(self.processing_queue, 1, raw_message)
+            await pipeline.execute()
+
+    async def schedule(self, raw_message: bytes, eta: datetime):
+        async with self._redis.pipeline(transaction=True) as pipeline:
+            pipeline.zadd(config.CELERY_IO_SCHEDULED_QUEUE, {raw_message: eta.timestamp()})
+            pipeline.lrem(self.processing_queue, 1, raw_message)
+            await pipeline.execute()
+
+    async def requeue_due_messages(self) -> int:
+        return await self._requeue_due_messages_script(
+            keys=[config.CELERY_IO_SCHEDULED_QUEUE, config.CELERY_IO_QUEUE],
+            args=[time.time(), SCHEDULED_BATCH_SIZE]
+        )
+
+
+async def _run_task(broker: Broker, raw_message: bytes, semaphore: asyncio.Semaphore):
+    try:
+        try:
+            task_name, args, kwargs, eta = _decode_message(raw_message)
+        except Exception:
+            logger.exception("Failed to decode message, moved to %s", config.CELERY_IO_DEAD_LETTER_QUEUE)
+            await broker.dead_letter(raw_message)
+            return
+
+        task = ASYNC_TASKS.get(task_name)
+
+        if task is None:
+            logger.error("Unknown task %s, moved to %s", task_name, config.CELERY_IO_DEAD_LETTER_QUEUE)
+            await broker.dead_letter(raw_message)
+            return
+
+        # apply_async(countdown=...) кладет сообщение сразу, время запуска лежит в eta.
+        # Такое сообщение возвращается в брокер, а не держит место и остановку воркера
+        if eta is not None and eta > datetime.now(eta.tzinfo or timezone.utc):
+            await broker.schedule(raw_message, eta if eta.tzinfo else eta.replace(tzinfo=timezone.utc))
+            return
+
+        try:
+            await task(*args, **kwargs)
+        except Exception:
+            logger.exception("Task %s failed", task_name)
+
+        await broker.ack(raw_message)
+    except Exception:
+        # Брокер недоступен: сообщение остается в списке воркера и вернется в очередь при перезапуске
+        logger.exception("Failed to acknowledge message")
+    finally:
+        semaphore.release()
+
+
+async def run_worker():
+    redis = aioredis.from_url(config.CELERY_BROKER_URL)
+    broker = Broker(redis, config.ASYNC_WORKER_NAME)
+    semaphore = asyncio.Semaphore(config.ASYNC_WORKER_CONCURRENCY)
+    running_tasks: set[asyncio.Task] = set()
+    stop_event = asyncio.Event()
+
+    loop = asyncio.get_running_loop()
+    for stop_signal in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(stop_signal, stop_event.set)
+
+    sessionmanager.init_db(pool_size=config.ASYNC_WORKER_DATABASE_POOL_SIZE)
+
+    try:
+        restored_count: int = await broker.restore_processing_messages()
+
+        if restored_count:
+            logger.warning("Restored %d messages left by a previous run of %s", restored_count, config.ASYNC_WORKER_NAME)
+
+        requeue_time: float = 0
+
+        while not stop_event.is_set():
+            # Отложенные сообщения проверяются не чаще раза за BROKER_POLL_TIMEOUT_SECONDS, а не на каждое сообщение
+            if time.monotonic() >= requeue_time:
+                await broker.requeue_due_messages()
+                requeue_time = time.monotonic() + BROKER_POLL_TIMEOUT_SECONDS
+
+            await semaphore.acquire()
+
+            raw_message: bytes | None = await broker.receive()
+
+            if raw_message is None:
+                semaphore.release()
+                continue
+
+            running_task: asyncio.Task = asyncio.create_task(_run_task(broker, raw_message, semaphore))
+            running_tasks.add(running_task)
+            running_task.add_done_callback(running_tasks.discard)
+
+        # Дожидаемся уже взятых задач, новые не берем
+        if running_tasks:
+            await asyncio.gather(*running_tasks, return_exceptions=True)
+    finally:
+        await redis.aclose()
+        await emails.smtp_pool.close()
+        await sessionmanager.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(run_worker())
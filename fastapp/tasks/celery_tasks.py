@@ -1,42 +1,128 @@
 import asyncio
 import uuid
 
-from sqlalchemy.ext.asyncio import AsyncSession
+from celery.signals import worker_process_init, worker_process_shutdown
+from celery.utils.log import get_task_logger
 
+import config
 from fastapp import emails, crud, dependencies
 from fastapp.database import sessionmanager
 from fastapp.tasks.celeryconfig import celery_app
 
-async def _delete_expired_codes():
-    db: AsyncSession = sessionmanager.session_maker()
-    await crud.delete_expired_codes(db)
-    await sessionmanager.close()
+logger = get_task_logger(__name__)
+
+_worker_loop: asyncio.AbstractEventLoop | None = None
+
+
+@worker_process_init.connect
+def init_worker_process(**kwargs):
+    # Один loop и один движок на процесс воркера, задачи переиспользуют их соединения.
+    # Пул, созданный в родительском процессе до fork, дочернему не подходит
+    global _worker_loop
+
+    _worker_loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(_worker_loop)
+
+    sessionmanager.init_db(pool_size=config.CELERY_DATABASE_POOL_SIZE)
+
+
+@worker_process_shutdown.connect
+def shutdown_worker_process(**kwargs):
+    if _worker_loop is None:
+        return
+
+    _worker_loop.run_until_complete(emails.smtp_pool.close())
+    _worker_loop.run_until_complete(sessionmanager.close())
+    _worker_loop.close()
+
+
+def _run_in_worker_loop(coroutine):
+    # Постоянный loop процесса воркера: соединения с базой и SMTP привязаны к нему
+    # и переживают задачу, в отличие от нового loop в каждом asyncio.run.
+    # Без prefork (solo, eager) worker_process_init не вызывается, loop создается здесь
+    global _worker_loop
+
+    if _worker_loop is None:
+        _worker_loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_worker_loop)
+
+    return _worker_loop.run_until_complete(coroutine)
+
+
+async def _delete_expired_codes() -> int:
+    async with sessionmanager.session_maker() as db:
+        deleted_count: int = await dependencies.delete_expired_codes(db)
+
+    if deleted_count:
+        logger.info("Deleted %d expired codes", deleted_count)
+
+    return deleted_count
+
+async def _send_mail(receiver_email: str, title: str, message: str):
+    await emails.send_email(receiver_email, title, message)
 
 async def _delete_codes_by_email(email: str):
-    db: AsyncSession = sessionmanager.session_maker()
-    await crud.delete_codes_by_email(db, email)
-    await sessionmanager.close()
+    async with sessionmanager.session_maker() as db:
+        await crud.delete_codes_by_email(db, email)
 
 async def _refresh_survey_document(survey_document_id: uuid.UUID, survey_document_title: str):
-    db: AsyncSession = sessionmanager.session_maker()
-    await dependencies.refresh_survey_document(db, survey_document_id, survey_document_title)
-    await sessionmanager.close()
+    async with sessionmanager.session_maker() as db:
+        await dependencies.refresh_survey_document(db, survey_document_id, survey_document_title)
+
+async def _regrade_survey(survey_id: uuid.UUID):
+    async with sessionmanager.session_maker() as db:
+        await dependencies.regrade_survey(db, survey_id)
+
+async def _backfill_survey_grades():
+    async with sessionmanager.session_maker() as db:
+        await dependencies.backfill_survey_grades(db)
+
+async def _refresh_survey_statistic(survey_id: uuid.UUID):
+    async with sessionmanager.session_maker() as db:
+        await dependencies.refresh_survey_statistic(db, survey_id)
+
+async def _send_queued_emails():
+    retry_count: int = await emails.send_queued_emails()
+
+    if retry_count:
+        send_queued_emails.apply_async(countdown=config.EMAIL_RETRY_DELAY_SECONDS)
+
 
 @celery_app.task()
 def send_mail(receiver_email: str, title: str, message: str):
-    asyncio.run(emails.send_email(receiver_email, title, message))
+    _run_in_worker_loop(_send_mail(receiver_email, title, message))
+
+
+@celery_app.task()
+def send_queued_emails():
+    _run_in_worker_loop(_send_queued_emails())
 
 
 @celery_app.task()
 def delete_codes_by_email(email: str):
-    asyncio.run(_delete_codes_by_email(email))
+    _run_in_worker_loop(_delete_codes_by_email(email))
 
 
 @celery_app.task()
-def delete_expired_codes():
-    asyncio.run(_delete_expired_codes())
+def delete_expired_codes() -> int:
+    return _run_in_worker_loop(_delete_expired_codes())
 
 
 @celery_app.task()
 def refresh_survey_document(survey_document_id: uuid.UUID, survey_document_title: str):
-    asyncio.run(_refresh_survey_document(survey_document_id, survey_document_title))
\ No newline at end of file
+    _run_in_worker_loop(_refresh_survey_document(survey_document_id, survey_document_title))
+
+
+@celery_app.task()
+def regrade_survey(survey_id: uuid.UUID):
+    _run_in_worker_loop(_regrade_survey(survey_id))
+
+
+@celery_app.task()
+def backfill_survey_grades():
+    _run_in_worker_loop(_backfill_survey_grades())
+
+
+@celery_app.task()
+def refresh_survey_statistic(survey_id: uuid.UUID):
+    _run_in_worker_loop(_refresh_survey_statistic(survey_id))
\ No newline at end of file
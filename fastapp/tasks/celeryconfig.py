@@ -15,9 +15,19 @@ celery_app.conf.update(
     task_track_started=True
 )
 
-celery_app.conf.beat_schedule = {
-    'delete_expired_codes_every_minute': {
+# I/O задачи выполняет асинхронный воркер (fastapp/tasks/async_worker.py),
+# prefork воркеры при этом слушают только очередь по умолчанию
+if config.ASYNC_WORKER_ENABLED:
+    celery_app.conf.task_routes = {
+        f'fastapp.tasks.celery_tasks.{task_name}': {'queue': config.CELERY_IO_QUEUE}
+        for task_name in config.CELERY_IO_TASKS
+    }
+
+celery_app.conf.beat_schedule = {}
+
+# В Redis коды истекают по TTL, чистить таблицу нужно только для хранилища в базе
+if config.CODE_STORE_BACKEND == "database":
+    celery_app.conf.beat_schedule['delete_expired_codes_every_minute'] = {
         'task': 'fastapp.tasks.celery_tasks.delete_expired_codes',
         'schedule': crontab(),  # Every minute
-    },
-}
\ No newline at end of file
+    }
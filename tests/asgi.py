@@ -0,0 +1,81 @@
+import asyncio
+import json
+import time
+from typing import Awaitable, Callable
+
+from fastapi import FastAPI
+
+from fastapp.api.routes import router as api_router
+
+
+def create_app(*routers) -> FastAPI:
+    # Приложение с роутерами API без fastapp.fast: тот при импорте создает таблицы в рабочей базе
+    app = FastAPI()
+    app.include_router(api_router, prefix="/api")
+
+    for router in routers:
+        app.include_router(router, prefix="/api")
+
+    return app
+
+
+async def request(app: FastAPI, method: str, path: str, headers: dict[str, str] | None = None, body: dict | None = None) -> tuple[int, dict[str, str], bytes]:
+    # Один HTTP запрос напрямую в ASGI приложение, без сокетов: (статус, заголовки, тело)
+    body_bytes: bytes = json.dumps(body).encode() if body is not None else b""
+    request_headers: dict[str, str] = dict(headers or {})
+
+    if body is not None:
+        request_headers["content-type"] = "application/json"
+
+    scope: dict = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(name.lower().encode(), value.encode()) for name, value in request_headers.items()],
+        "client": ("127.0.0.1", 0),
+        "server": ("testserver", 80),
+    }
+    messages: list[dict] = [{"type": "http.request", "body": body_bytes, "more_body": False}]
+    status: int = 0
+    response_headers: dict[str, str] = {}
+    response_body: list[bytes] = []
+
+    async def receive() -> dict:
+        return messages.pop() if messages else {"type": "http.disconnect"}
+
+    async def send(message: dict):
+        nonlocal status
+
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            response_headers.update((name.decode(), value.decode()) for name, value in message["headers"])
+        elif message["type"] == "http.response.body":
+            response_body.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+
+    return status, response_headers, b"".join(response_body)
+
+
+async def measure_requests_per_second(send_request: Callable[[], Awaitable], client_count: int, duration_seconds: float) -> float:
+    # client_count клиентов отправляют запросы друг за другом в течение duration_seconds
+    request_count: int = 0
+    deadline: float = time.perf_counter() + duration_seconds
+
+    async def run_client():
+        nonlocal request_count
+
+        while time.perf_counter() < deadline:
+            await send_request()
+            request_count += 1
+
+    start: float = time.perf_counter()
+    await asyncio.gather(*(run_client() for _ in range(client_count)))
+
+    return request_count / (time.perf_counter() - start)
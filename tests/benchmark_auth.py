@@ -0,0 +1,72 @@
+"""Стоимость зависимости get_user_from_access_token: проверка подписи JWT и чтение пользователя.
+
+Запуск: python -m tests.benchmark_auth
+Нужна тестовая база TEST_DATABASE_NAME, схема пересоздается, и JWT_SECRET.
+"""
+import asyncio
+import hashlib
+import time
+
+from fastapp import cache, dependencies
+from tests.database import reset_database, create_session_maker, create_user
+
+
+CALL_COUNT = 2000
+
+
+async def measure_calls(session_maker, authorization: str, clear_cache) -> float:
+    # Среднее время вызова зависимости в новой сессии, как при запросе, в секундах
+    timings: list[float] = []
+
+    for _ in range(CALL_COUNT):
+        clear_cache()
+
+        async with session_maker() as db:
+            start: float = time.perf_counter()
+            await dependencies.get_user_from_access_token(authorization, db)
+            timings.append(time.perf_counter() - start)
+
+    return sum(timings) / len(timings)
+
+
+async def run():
+    engine, session_maker = create_session_maker()
+
+    try:
+        async with session_maker() as db:
+            user = await create_user(db)
+
+        access_token: str = dependencies.create_token_pair(user.id).access.token
+        access_token_hash: bytes = hashlib.sha256(access_token.encode("utf-8")).digest()
+        authorization: str = f"Bearer {access_token}"
+
+        def clear_caches():
+            cache.verified_token_cache.delete(access_token_hash)
+            dependencies.invalidate_cached_user(user.id)
+
+        def clear_user_cache():
+            dependencies.invalidate_cached_user(user.id)
+
+        # Прогрев пула соединений
+        await measure_calls(session_maker, authorization, clear_caches)
+
+        uncached_seconds: float = await measure_calls(session_maker, authorization, clear_caches)
+        token_cached_seconds: float = await measure_calls(session_maker, authorization, clear_user_cache)
+        cached_seconds: float = await measure_calls(session_maker, authorization, lambda: None)
+
+        print(
+            f"jwt.decode + user from database {uncached_seconds * 1e6:.0f} us, "
+            f"verified token cached {token_cached_seconds * 1e6:.0f} us, "
+            f"token and user cached {cached_seconds * 1e6:.0f} us (x{uncached_seconds / cached_seconds:.0f})"
+        )
+    finally:
+        await engine.dispose()
+
+
+def main():
+    reset_database()
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
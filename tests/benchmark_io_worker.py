@@ -0,0 +1,218 @@
+"""Задач в секунду на send_mail и delete_codes_by_email: prefork воркер celery,
+где процесс выполняет одну задачу за раз, против асинхронного воркера
+(fastapp/tasks/async_worker.py) с до ASYNC_WORKER_CONCURRENCY задач в одном loop.
+
+Запуск: python -m tests.benchmark_io_worker
+Нужны тестовая база TEST_DATABASE_NAME (схема пересоздается), Redis и aiosmtpd.
+Каждый воркер работает в отдельном процессе со своей очередью брокера. Сообщения
+копятся в отдельном списке и передаются воркеру одним RENAME, время идет от
+передачи до выполнения последней задачи.
+"""
+import asyncio
+import logging
+import multiprocessing
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable
+
+from celery.result import AsyncResult
+from redis import asyncio as aioredis
+from sqlalchemy import func, insert, select
+
+import config
+from fastapp import database, models
+from fastapp.tasks import async_worker, celery_tasks
+from fastapp.tasks.celeryconfig import celery_app
+from tests.database import TEST_DATABASE_URL, reset_database, create_session_maker
+from tests.smtp_server import SMTP_HOST, run_smtp_server
+
+
+SMTP_PORT = 8465
+TASK_COUNT = 2000
+PREFORK_CONCURRENCIES: list[int] = [1, 4] # 1 - `celery worker` по умолчанию на машине с одним CPU
+POLL_INTERVAL_SECONDS = 0.05
+TIMEOUT_SECONDS = 300
+
+
+def _configure_worker(prefix: str):
+    # Процесс воркера: локальный SMTP, тестовая база и свои очереди брокера
+    config.EMAIL_SMTP_HOST = SMTP_HOST
+    config.EMAIL_SMTP_PORT = SMTP_PORT
+    config.EMAIL_LOGIN = "sender@example.com"
+    config.EMAIL_PASSWORD = "password"
+    config.CELERY_IO_QUEUE = f"{prefix}.io"
+    config.CELERY_IO_DEAD_LETTER_QUEUE = f"{prefix}.dead_letter"
+    config.CELERY_IO_PROCESSING_QUEUE_PREFIX = f"{prefix}.processing:"
+    config.CELERY_IO_SCHEDULED_QUEUE = f"{prefix}.scheduled"
+    database.SQLALCHEMY_ASYNC_DATABASE_URL = TEST_DATABASE_URL
+
+
+def _run_prefork_worker(prefix: str, queue: str, concurrency: int):
+    _configure_worker(prefix)
+    celery_app.start([
+        "--quiet", "worker", "-P", "prefork", "-c", str(concurrency), "-Q", queue, "-l", "warning",
+        "--without-heartbeat", "--without-gossip", "--without-mingle"
+    ])
+
+
+def _run_async_worker(prefix: str):
+    _configure_worker(prefix)
+    logging.basicConfig(level=logging.WARNING)
+    asyncio.run(async_worker.run_worker())
+
+
+async def _wait_until(process, is_done: Callable[[], Awaitable[bool]]) -> float:
+    deadline: float = time.perf_counter() + TIMEOUT_SECONDS
+
+    while not await is_done():
+        if not process.is_alive():
+            raise RuntimeError(f"Worker exited with code {process.exitcode}")
+
+        if time.perf_counter() > deadline:
+            raise RuntimeError("Worker did not finish the tasks")
+
+        await asyncio.sleep(POLL_INTERVAL_SECONDS)
+
+    return time.perf_counter()
+
+
+class TaskRunner:
+    """Публикует задачи в очередь воркера и ждет их выполнения."""
+
+    def __init__(self, process, redis: aioredis.Redis, session_maker, message_count, queue: str):
+        self._process = process
+        self._redis = redis
+        self._session_maker = session_maker
+        self._message_count = message_count
+        self._queue: str = queue
+        self._task_ids: list[str] = []
+        self._batch_index: int = 0
+
+    async def _create_codes(self, count: int) -> str:
+        # Коды на отдельные адреса: каждая задача удаляет свою строку
+        self._batch_index += 1
+        email_prefix: str = f"{self._queue}.{self._batch_index}."
+
+        async with self._session_maker() as db:
+            await db.execute(insert(models.Code), [
+                dict(email=f"{email_prefix}{index}@example.com", code="000000", expire_datetime=datetime.now() + timedelta(minutes=15))
+                for index in range(count)
+            ])
+            await db.commit()
+
+        return email_prefix
+
+    async def _get_code_count(self, email_prefix: str) -> int:
+        async with self._session_maker() as db:
+            return await db.scalar(select(func.count()).select_from(models.Code).where(models.Code.email.startswith(email_prefix)))
+
+    async def _publish(self, task, args_list: list[tuple], is_staged: bool) -> float:
+        queue: str = f"{self._queue}.staging" if is_staged else self._queue
+
+        for args in args_list:
+            self._task_ids.append(task.apply_async(args=args, queue=queue).id)
+
+        start: float = time.perf_counter()
+
+        if is_staged:
+            await self._redis.rename(queue, self._queue)
+
+        return start
+
+    async def send_mail(self, count: int, is_staged: bool = True) -> float:
+        sent_count: int = self._message_count.value
+        start: float = await self._publish(
+            celery_tasks.send_mail, [(f"user{index}@example.com", "Code", "123456") for index in range(count)], is_staged
+        )
+
+        async def is_done() -> bool:
+            return self._message_count.value >= sent_count + count
+
+        return count / (await _wait_until(self._process, is_done) - start)
+
+    async def delete_codes_by_email(self, count: int, is_staged: bool = True) -> float:
+        email_prefix: str = await self._create_codes(count)
+        start: float = await self._publish(
+            celery_tasks.delete_codes_by_email, [(f"{email_prefix}{index}@example.com",) for index in range(count)], is_staged
+        )
+
+        async def is_done() -> bool:
+            return await self._get_code_count(email_prefix) == 0
+
+        return count / (await _wait_until(self._process, is_done) - start)
+
+    def forget_results(self):
+        # prefork воркер пишет состояния задач в backend, асинхронный - нет
+        for task_id in self._task_ids:
+            AsyncResult(task_id, app=celery_app).forget()
+
+
+async def measure_worker(process, message_count, queue: str, warmup_count: int) -> tuple[float, float]:
+    # (send_mail в секунду, delete_codes_by_email в секунду)
+    redis = aioredis.from_url(config.CELERY_BROKER_URL)
+    engine, session_maker = create_session_maker()
+    runner = TaskRunner(process, redis, session_maker, message_count, queue)
+
+    process.start()
+
+    try:
+        # Разогрев: воркер запущен, соединения с SMTP и базой открыты
+        await runner.send_mail(warmup_count, is_staged=False)
+        await runner.delete_codes_by_email(warmup_count, is_staged=False)
+
+        return await runner.send_mail(TASK_COUNT), await runner.delete_codes_by_email(TASK_COUNT)
+    finally:
+        process.terminate()
+        process.join(30)
+
+        if process.is_alive():
+            process.kill()
+            process.join()
+
+        runner.forget_results()
+        await engine.dispose()
+        await redis.aclose()
+
+
+async def _delete_keys(prefix: str):
+    redis = aioredis.from_url(config.CELERY_BROKER_URL)
+
+    try:
+        # Вместе с привязками очередей, которые kombu создает под _kombu.binding
+        keys: list[bytes] = [key async for key in redis.scan_iter(f"*{prefix}*")]
+
+        for batch_start in range(0, len(keys), 1000):
+            await redis.delete(*keys[batch_start:batch_start + 1000])
+    finally:
+        await redis.aclose()
+
+
+def main():
+    reset_database()
+
+    context = multiprocessing.get_context("spawn")
+    prefix: str = f"benchmark.{uuid.uuid4().hex}"
+
+    try:
+        with run_smtp_server(SMTP_PORT) as message_count:
+            for concurrency in PREFORK_CONCURRENCIES:
+                queue: str = f"{prefix}.prefork{concurrency}"
+                process = context.Process(target=_run_prefork_worker, args=(prefix, queue, concurrency))
+                send_rate, delete_rate = asyncio.run(measure_worker(process, message_count, queue, concurrency))
+
+                print(f"prefork x{concurrency}: send_mail {send_rate:.0f} tasks/s, delete_codes_by_email {delete_rate:.0f} tasks/s")
+
+            process = context.Process(target=_run_async_worker, args=(prefix,))
+            send_rate, delete_rate = asyncio.run(measure_worker(process, message_count, f"{prefix}.io", 1))
+
+            print(
+                f"async worker, concurrency {config.ASYNC_WORKER_CONCURRENCY}: "
+                f"send_mail {send_rate:.0f} tasks/s, delete_codes_by_email {delete_rate:.0f} tasks/s"
+            )
+    finally:
+        asyncio.run(_delete_keys(prefix))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""Всплеск из 10k запросов кода: задача send_mail на каждое письмо против очереди писем,
+которая разбирается пачками с одной SMTP сессией и схлопыванием повторных кодов.
+
+Запуск: python -m tests.benchmark_mail_burst
+Нужны Redis и aiosmtpd (локальный SMTP сервер запускается в отдельном процессе).
+Задачи выполняются через apply() в этом процессе, как их выполнил бы воркер, без опроса брокера.
+"""
+import asyncio
+import time
+import uuid
+from collections import Counter
+
+import config
+from fastapp import emails
+from fastapp.redis_client import redis_client
+from fastapp.tasks import celery_tasks
+from tests.smtp_server import SMTP_HOST, run_smtp_server
+
+
+SMTP_PORT = 8465
+SIGNUP_COUNT = 10000
+REPEAT_RATE = 0.1 # Доля пользователей, которые сразу запросили код повторно
+ENQUEUE_CONCURRENCY = 100 # Одновременных запросов /send_code
+
+
+def create_receiver_emails() -> list[str]:
+    # Повторный запрос идет сразу за первым, как при нажатии "отправить еще раз"
+    receiver_emails: list[str] = []
+    user_count: int = round(SIGNUP_COUNT / (1 + REPEAT_RATE))
+
+    for index in range(user_count):
+        receiver_email: str = f"user{index}@example.com"
+        receiver_emails.append(receiver_email)
+
+        if len(receiver_emails) < SIGNUP_COUNT and index < SIGNUP_COUNT - user_count:
+            receiver_emails.append(receiver_email)
+
+    return receiver_emails
+
+
+def measure_task_per_message(receiver_emails: list[str], queue: str) -> tuple[float, float]:
+    # (запросов в секунду на публикацию задач, писем в секунду на их выполнение)
+    start: float = time.perf_counter()
+
+    for receiver_email in receiver_emails:
+        celery_tasks.send_mail.apply_async(args=(receiver_email, "Code", "123456"), queue=queue)
+
+    enqueue_rate: float = len(receiver_emails) / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+
+    for receiver_email in receiver_emails:
+        celery_tasks.send_mail.apply(args=(receiver_email, "Code", "123456"))
+
+    return enqueue_rate, len(receiver_emails) / (time.perf_counter() - start)
+
+
+async def _enqueue_emails(receiver_emails: list[str], queue: str) -> tuple[list[str], int]:
+    # Как роут /send_code: письмо в очередь Redis, задача пачки - только первому письму окна
+    semaphore = asyncio.Semaphore(ENQUEUE_CONCURRENCY)
+    scheduled_count: int = 0
+
+    async def enqueue(receiver_email: str) -> str:
+        nonlocal scheduled_count
+
+        async with semaphore:
+            mail_id, is_batch_scheduled = await emails.enqueue_email(receiver_email, "Code", "123456")
+
+            if is_batch_scheduled:
+                scheduled_count += 1
+                celery_tasks.send_queued_emails.apply_async(countdown=config.EMAIL_BATCH_WINDOW_MS / 1000, queue=queue)
+
+            return mail_id
+
+    mail_ids: list[str] = await asyncio.gather(*(enqueue(receiver_email) for receiver_email in receiver_emails))
+
+    return mail_ids, scheduled_count
+
+
+async def _count_statuses(mail_ids: list[str]) -> Counter:
+    statuses: list[bytes | None] = await redis_client.mget([emails._get_mail_status_key(mail_id) for mail_id in mail_ids])
+
+    return Counter(status.decode("utf-8") if status is not None else None for status in statuses)
+
+
+def measure_batches(receiver_emails: list[str], queue: str) -> tuple[float, float, int, Counter]:
+    # (запросов в секунду на постановку в очередь, запросов в секунду на разбор очереди,
+    # сколько задач пачек запланировано, статусы писем)
+    start: float = time.perf_counter()
+    mail_ids, scheduled_count = celery_tasks._run_in_worker_loop(_enqueue_emails(receiver_emails, queue))
+    enqueue_rate: float = len(receiver_emails) / (time.perf_counter() - start)
+
+    # Задачи пачек еще ждут countdown, очередь целиком разбирает первая из них
+    start = time.perf_counter()
+    celery_tasks.send_queued_emails.apply()
+    send_rate: float = len(receiver_emails) / (time.perf_counter() - start)
+
+    return enqueue_rate, send_rate, scheduled_count, celery_tasks._run_in_worker_loop(_count_statuses(mail_ids))
+
+
+async def _delete_keys(prefix: str):
+    # Вместе с привязкой очереди, которую kombu создает под _kombu.binding
+    keys: list[bytes] = [key async for key in redis_client.scan_iter(f"*{prefix}*")]
+
+    for batch_start in range(0, len(keys), 1000):
+        await redis_client.delete(*keys[batch_start:batch_start + 1000])
+
+
+def main():
+    config.EMAIL_SMTP_HOST = SMTP_HOST
+    config.EMAIL_SMTP_PORT = SMTP_PORT
+    config.EMAIL_LOGIN = "sender@example.com"
+    config.EMAIL_PASSWORD = "password"
+
+    # Свои ключи Redis и очередь брокера, рабочие очереди не трогаются
+    prefix: str = f"benchmark.{uuid.uuid4().hex}"
+    config.EMAIL_QUEUE_KEY = f"{prefix}.email_queue"
+    config.EMAIL_RETRY_QUEUE_KEY = f"{prefix}.email_retry_queue"
+    config.EMAIL_BATCH_SCHEDULED_KEY = f"{prefix}.email_batch_scheduled"
+    config.EMAIL_STATUS_KEY_PREFIX = f"{prefix}.email_status:"
+    queue: str = f"{prefix}.celery"
+
+    receiver_emails: list[str] = create_receiver_emails()
+
+    try:
+        with run_smtp_server(SMTP_PORT) as message_count:
+            task_enqueue_rate, task_send_rate = measure_task_per_message(receiver_emails, queue)
+            task_message_count: int = message_count.value
+
+            batch_enqueue_rate, batch_send_rate, scheduled_count, statuses = measure_batches(receiver_emails, queue)
+            batch_message_count: int = message_count.value - task_message_count
+
+            celery_tasks._run_in_worker_loop(emails.smtp_pool.close())
+    finally:
+        celery_tasks._run_in_worker_loop(_delete_keys(prefix))
+        celery_tasks._run_in_worker_loop(redis_client.aclose())
+
+    print(f"{len(receiver_emails)} code requests from {len(set(receiver_emails))} addresses")
+    print(f"task per message: enqueue {task_enqueue_rate:.0f} req/s, send {task_send_rate:.0f} req/s, {task_message_count} messages sent")
+    print(
+        f"mail queue: enqueue {batch_enqueue_rate:.0f} req/s, send {batch_send_rate:.0f} req/s "
+        f"(x{batch_send_rate / task_send_rate:.1f}), {batch_message_count} messages sent, "
+        f"{scheduled_count} batch tasks scheduled, statuses {dict(statuses)}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Стоимость открытия опроса и проверки повторной отправки в зависимости от числа ответов.
+
+Запуск: python -m tests.benchmark_repeat_submission_check
+Нужна тестовая база TEST_DATABASE_NAME, схема пересоздается.
+"""
+import asyncio
+import random
+import time
+
+from fastapp import crud, dependencies
+from fastapp.api.v1 import routes
+from fastapp.redis_client import redis_client
+from tests import legacy_crud
+from tests.database import reset_database, create_session_maker, create_user, create_survey, create_survey_results
+
+
+QUESTION_COUNT = 10
+RESPONSE_COUNTS: list[int] = [100, 1000, 10000, 50000]
+
+
+async def measure(session_maker, function, repeat: int) -> float:
+    # Среднее время вызова function(db) в новой сессии, в секундах
+    timings: list[float] = []
+
+    for _ in range(repeat):
+        async with session_maker() as db:
+            start: float = time.perf_counter()
+            await function(db)
+            timings.append(time.perf_counter() - start)
+
+    return sum(timings) / len(timings)
+
+
+async def run():
+    rng = random.Random(0)
+    engine, session_maker = create_session_maker()
+
+    try:
+        async with session_maker() as db:
+            user = await create_user(db)
+            survey = await create_survey(db, user.id, QUESTION_COUNT)
+
+        authorization: str = f"Bearer {dependencies.create_token_pair(user.id).access.token}"
+        response_count: int = 0
+
+        for next_response_count in RESPONSE_COUNTS:
+            async with session_maker() as db:
+                await create_survey_results(db, rng, survey, next_response_count - response_count)
+
+            response_count = next_response_count
+
+            async def check_legacy(db):
+                await legacy_crud.has_user_passed_survey(db, survey.id, user.id)
+
+            async def check(db):
+                await crud.get_survey_by_id(db, survey.id)
+                await crud.has_user_passed_survey(db, survey.id, user.id)
+
+            async def get_survey(db):
+                await routes.get_survey_by_id(survey.id, authorization=authorization, if_none_match=None, db=db)
+
+            await measure(session_maker, get_survey, 1)
+
+            legacy_seconds: float = await measure(session_maker, check_legacy, 1 if response_count >= 10000 else 5)
+            check_seconds: float = await measure(session_maker, check, 50)
+            route_seconds: float = await measure(session_maker, get_survey, 50)
+
+            print(
+                f"{response_count} responses: "
+                f"load all answers {legacy_seconds * 1000:.1f} ms, "
+                f"survey + EXISTS {check_seconds * 1000:.2f} ms, "
+                f"GET /survey/{{survey_id}}/ {route_seconds * 1000:.2f} ms"
+            )
+    finally:
+        await engine.dispose()
+        await redis_client.aclose()
+
+
+def main():
+    reset_database()
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Сериализация опроса и прохождений со скрытыми ответами: пересоздание ответов
+через .dict() до разделения на представления и скрытие на месте.
+
+Запуск: python -m tests.benchmark_schemas
+"""
+import time
+import uuid
+import warnings
+from datetime import datetime
+
+from fastapp import schemas
+from tests import legacy_schemas
+
+
+QUESTION_COUNT = 1000
+ANSWER_COUNT = 4
+SURVEY_RESULT_COUNT = 10 # Прохождений в ответе /survey/passed
+
+
+def measure(function, repeat: int = 5) -> float:
+    # Лучшее время из repeat запусков, в секундах
+    timings: list[float] = []
+
+    for _ in range(repeat):
+        start: float = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+
+    return min(timings)
+
+
+def create_question(index: int, now: datetime) -> dict:
+    question_type: schemas.QuestionTypeEnum = list(schemas.QuestionTypeEnum)[index % len(schemas.QuestionTypeEnum)]
+
+    return {
+        "id": uuid.uuid4(),
+        "created_at": now,
+        "title": f"Question {index}",
+        "score": 1,
+        "type": question_type,
+        "show_answers": False,
+        "answers": [
+            {"id": uuid.uuid4(), "created_at": now, "text": f"Answer {answer_index}", "is_correct": answer_index == 0}
+            for answer_index in range(ANSWER_COUNT)
+        ],
+    }
+
+
+def create_survey(now: datetime) -> dict:
+    user_id: uuid.UUID = uuid.uuid4()
+
+    return {
+        "id": uuid.uuid4(),
+        "created_at": now,
+        "title": "Survey",
+        "user_id": user_id,
+        "user": {"name": "Test", "surname": "User"},
+        "questions": [create_question(index, now) for index in range(QUESTION_COUNT)],
+    }
+
+
+def create_survey_result(survey: dict, now: datetime) -> dict:
+    user_questions: list[dict] = []
+
+    for question in survey["questions"]:
+        question_result_id: uuid.UUID = uuid.uuid4()
+        user_questions.append({
+            "id": question_result_id,
+            "created_at": now,
+            "question_id": question["id"],
+            "user_survey_result_id": uuid.uuid4(),
+            "is_correct": True,
+            "score": 1,
+            "question": question,
+            "user_answers": [{"id": uuid.uuid4(), "created_at": now, "text": "Answer 0", "is_correct": True, "user_question_result_id": question_result_id}],
+        })
+
+    return {
+        "id": uuid.uuid4(),
+        "created_at": now,
+        "survey_id": survey["id"],
+        "survey": {"title": survey["title"]},
+        "score": QUESTION_COUNT,
+        "user_questions": user_questions,
+    }
+
+
+def main():
+    # .dict() в старом фильтре выдает предупреждение на каждый ответ
+    warnings.simplefilter("ignore", DeprecationWarning)
+
+    now: datetime = datetime.now()
+    survey: dict = create_survey(now)
+    survey_results: list[dict] = [create_survey_result(survey, now) for _ in range(SURVEY_RESULT_COUNT)]
+
+    cases: list[tuple[str, type, type, list[dict]]] = [
+        (f"SurveyGet, {QUESTION_COUNT} hidden questions", legacy_schemas.SurveyGet, schemas.SurveyGet, [survey]),
+        (
+            f"UserSurveyResultGet, {SURVEY_RESULT_COUNT} results x {QUESTION_COUNT} hidden questions",
+            legacy_schemas.UserSurveyResultGet, schemas.UserSurveyResultGet, survey_results
+        ),
+    ]
+
+    for name, legacy_schema, schema, items in cases:
+        # Как в ответе FastAPI: валидация модели ответа и сериализация в JSON
+        legacy_seconds: float = measure(lambda: [legacy_schema.model_validate(item).model_dump_json() for item in items])
+        seconds: float = measure(lambda: [schema.model_validate(item).model_dump_json() for item in items])
+
+        legacy_body: list[str] = [legacy_schema.model_validate(item).model_dump_json() for item in items]
+        body: list[str] = [schema.model_validate(item).model_dump_json() for item in items]
+        assert legacy_body == body
+
+        print(f"{name}: rebuild through .dict() {legacy_seconds * 1000:.1f} ms, in place {seconds * 1000:.1f} ms (x{legacy_seconds / seconds:.2f})")
+
+
+if __name__ == "__main__":
+    main()
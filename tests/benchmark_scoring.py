@@ -0,0 +1,77 @@
+"""Сравнение SurveyScorer с циклом проверки до fastapp.scoring.
+
+Запуск: python -m tests.benchmark_scoring
+"""
+import random
+import time
+import uuid
+
+from asyncpg.pgproto.pgproto import UUID as AsyncpgUUID
+
+from fastapp.scoring import SurveyScorer
+from tests.legacy_scoring import grade_respondents, group_rows
+from tests.test_scoring import create_questions, create_respondents, create_rows
+
+
+def measure(function, repeat: int = 5) -> float:
+    # Лучшее время из repeat запусков, в секундах
+    timings: list[float] = []
+
+    for _ in range(repeat):
+        start: float = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+
+    return min(timings)
+
+
+def create_asyncpg_id() -> AsyncpgUUID:
+    # asyncpg отдает id своим типом UUID, у него хэш и сравнение дешевле, чем у uuid.UUID
+    return AsyncpgUUID(str(uuid.uuid4()))
+
+
+def main():
+    rng = random.Random(0)
+
+    # Перепроверка опроса: строки базы -> баллы и правильность каждого результата вопроса
+    for question_count, respondent_count in [(10, 1000), (50, 10000), (1000, 1000)]:
+        questions = create_questions(rng, question_count)
+        for question in questions:
+            question.id = create_asyncpg_id()
+
+        rows: list[tuple] = create_rows(create_respondents(rng, questions, respondent_count), create_asyncpg_id)
+        survey_scorer = SurveyScorer(questions)
+
+        legacy_seconds: float = measure(lambda: grade_respondents(questions, group_rows(rows)))
+        score_seconds: float = measure(lambda: survey_scorer.score(survey_scorer.encode_rows(rows)))
+
+        print(
+            f"regrade {question_count} questions x {respondent_count} respondents ({len(rows)} rows): "
+            f"legacy {legacy_seconds * 1000:.1f} ms, "
+            f"encode_rows + score {score_seconds * 1000:.1f} ms (x{legacy_seconds / score_seconds:.2f})"
+        )
+
+    # Отправка одного ответа: проверяются только вопросы одного прохождения
+    for question_count in [10, 200]:
+        questions = create_questions(rng, question_count)
+        for question in questions:
+            question.id = create_asyncpg_id()
+
+        user_questions = create_respondents(rng, questions, 1)[0]
+        survey_scorer = SurveyScorer(questions)
+        number: int = 1000
+
+        legacy_seconds = measure(lambda: [grade_respondents(questions, [user_questions]) for _ in range(number)]) / number
+        uncached_seconds: float = measure(lambda: [SurveyScorer(questions).grade_respondent(user_questions) for _ in range(number)]) / number
+        cached_seconds: float = measure(lambda: [survey_scorer.grade_respondent(user_questions) for _ in range(number)]) / number
+
+        print(
+            f"submission {question_count} questions: "
+            f"legacy {legacy_seconds * 1e6:.0f} us, "
+            f"new scorer + grade_respondent {uncached_seconds * 1e6:.0f} us, "
+            f"cached scorer grade_respondent {cached_seconds * 1e6:.0f} us (x{legacy_seconds / cached_seconds:.2f})"
+        )
+
+
+if __name__ == "__main__":
+    main()
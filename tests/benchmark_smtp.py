@@ -0,0 +1,72 @@
+"""Писем в секунду: соединение на каждое письмо против пула SMTP соединений.
+
+Запуск: python -m tests.benchmark_smtp
+Нужен aiosmtpd: локальный SMTP сервер с TLS и AUTH запускается в отдельном процессе.
+"""
+import asyncio
+import time
+
+import config
+from fastapp import emails
+from tests import legacy_emails
+from tests.smtp_server import SMTP_HOST, run_smtp_server
+
+
+SMTP_PORT = 8465
+LEGACY_MESSAGE_COUNT = 200
+MESSAGE_COUNT = 2000
+
+
+async def _send_pooled(message_count: int, concurrency: int):
+    smtp_pool = emails.SMTPConnectionPool(config.EMAIL_SMTP_POOL_SIZE)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send(index: int):
+        async with semaphore:
+            await smtp_pool.send_message(emails._create_message(f"user{index}@example.com", "Code", "123456"))
+
+    try:
+        await asyncio.gather(*(send(index) for index in range(message_count)))
+    finally:
+        await smtp_pool.close()
+
+
+def measure_legacy(message_count: int) -> float:
+    # Как задача send_mail до пула: свой asyncio.run и свое соединение на каждое письмо
+    start: float = time.perf_counter()
+
+    for index in range(message_count):
+        assert asyncio.run(legacy_emails.send_email(f"user{index}@example.com", "Code", "123456"))
+
+    return message_count / (time.perf_counter() - start)
+
+
+def measure_pooled(message_count: int, concurrency: int) -> float:
+    start: float = time.perf_counter()
+    asyncio.run(_send_pooled(message_count, concurrency))
+
+    return message_count / (time.perf_counter() - start)
+
+
+def main():
+    config.EMAIL_SMTP_HOST = SMTP_HOST
+    config.EMAIL_SMTP_PORT = SMTP_PORT
+    config.EMAIL_LOGIN = "sender@example.com"
+    config.EMAIL_PASSWORD = "password"
+
+    with run_smtp_server(SMTP_PORT) as message_count:
+        legacy_rate: float = measure_legacy(LEGACY_MESSAGE_COUNT)
+        sequential_rate: float = measure_pooled(MESSAGE_COUNT, 1)
+        concurrent_rate: float = measure_pooled(MESSAGE_COUNT, config.EMAIL_SMTP_POOL_SIZE)
+
+        assert message_count.value == LEGACY_MESSAGE_COUNT + 2 * MESSAGE_COUNT
+
+    print(
+        f"connection per message {legacy_rate:.0f} msg/s, "
+        f"pool one at a time {sequential_rate:.0f} msg/s (x{sequential_rate / legacy_rate:.1f}), "
+        f"pool of {config.EMAIL_SMTP_POOL_SIZE} {concurrent_rate:.0f} msg/s (x{concurrent_rate / legacy_rate:.1f})"
+    )
+
+
+if __name__ == "__main__":
+    main()
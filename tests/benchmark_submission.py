@@ -0,0 +1,72 @@
+"""Время отправки одного ответа на опрос (POST /survey/{survey_id}/answer).
+
+Запуск: python -m tests.benchmark_submission
+Нужна тестовая база TEST_DATABASE_NAME, схема пересоздается.
+"""
+import asyncio
+import random
+import time
+
+from fastapp import cache, schemas
+from fastapp.api.v1 import routes
+from fastapp.redis_client import redis_client
+from tests.database import reset_database, create_session_maker, create_user, create_survey, create_user_questions
+
+
+SUBMISSION_COUNT = 300
+
+
+async def measure_submissions(session_maker, survey_id, submissions: list[list[schemas.UserQuestionsResultCreate]], clear_cache: bool) -> float:
+    # Среднее время отправки, в секундах. clear_cache=True - каждая отправка
+    # заново читает вопросы из базы и собирает SurveyScorer, как до кэша
+    timings: list[float] = []
+
+    for user_questions in submissions:
+        if clear_cache:
+            cache.survey_scorer_cache.delete(survey_id)
+
+        survey_result_create_schema = schemas.UserSurveyResultCreate(survey_id=survey_id, user_questions=user_questions)
+
+        async with session_maker() as db:
+            start: float = time.perf_counter()
+            await routes.send_answer_for_survey(survey_id, survey_result_create_schema, authorization=None, db=db)
+            timings.append(time.perf_counter() - start)
+
+    return sum(timings) / len(timings)
+
+
+async def run():
+    rng = random.Random(0)
+    engine, session_maker = create_session_maker()
+
+    try:
+        for question_count in [10, 200]:
+            async with session_maker() as db:
+                user = await create_user(db)
+                survey = await create_survey(db, user.id, question_count, is_anonim=True, send_multiple_times=True)
+
+            submissions = [create_user_questions(rng, survey) for _ in range(SUBMISSION_COUNT)]
+
+            # Первая отправка прогревает кэш опроса и соединения пула
+            await measure_submissions(session_maker, survey.id, submissions[:10], clear_cache=False)
+
+            uncached_seconds: float = await measure_submissions(session_maker, survey.id, submissions, clear_cache=True)
+            cached_seconds: float = await measure_submissions(session_maker, survey.id, submissions, clear_cache=False)
+
+            print(
+                f"{question_count} questions: "
+                f"scorer from database {uncached_seconds * 1000:.2f} ms, "
+                f"cached scorer {cached_seconds * 1000:.2f} ms (x{uncached_seconds / cached_seconds:.2f})"
+            )
+    finally:
+        await engine.dispose()
+        await redis_client.aclose()
+
+
+def main():
+    reset_database()
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
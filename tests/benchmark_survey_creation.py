@@ -0,0 +1,71 @@
+"""Создание опроса (crud.create_survey) в сравнении с вставкой по одной строке.
+
+Запуск: python -m tests.benchmark_survey_creation
+Нужна тестовая база TEST_DATABASE_NAME, схема пересоздается.
+"""
+import asyncio
+import time
+
+from sqlalchemy import event
+
+from fastapp import crud, schemas
+from tests import legacy_crud
+from tests.database import reset_database, create_session_maker, create_user, create_survey_schema
+
+
+async def measure_creation(engine, session_maker, user_id, create_survey, survey_schema: schemas.SurveyCreate, repeat: int) -> tuple[float, int]:
+    # Среднее время создания в секундах и число запросов к базе на одно создание
+    statement_count: int = 0
+
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        nonlocal statement_count
+        statement_count += 1
+
+    timings: list[float] = []
+    event.listen(engine.sync_engine, "before_cursor_execute", count_statement)
+
+    try:
+        for _ in range(repeat):
+            async with session_maker() as db:
+                start: float = time.perf_counter()
+                await create_survey(db, user_id, survey_schema)
+                timings.append(time.perf_counter() - start)
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", count_statement)
+
+    return sum(timings) / len(timings), statement_count // repeat
+
+
+async def run():
+    engine, session_maker = create_session_maker()
+
+    try:
+        async with session_maker() as db:
+            user = await create_user(db)
+
+        for question_count, repeat in [(10, 50), (100, 20), (1000, 5)]:
+            survey_schema: schemas.SurveyCreate = create_survey_schema(question_count)
+
+            # Прогрев пула соединений и кэша скомпилированных запросов
+            await measure_creation(engine, session_maker, user.id, legacy_crud.create_survey, survey_schema, 1)
+            await measure_creation(engine, session_maker, user.id, crud.create_survey, survey_schema, 1)
+
+            legacy_seconds, legacy_statement_count = await measure_creation(engine, session_maker, user.id, legacy_crud.create_survey, survey_schema, repeat)
+            bulk_seconds, bulk_statement_count = await measure_creation(engine, session_maker, user.id, crud.create_survey, survey_schema, repeat)
+
+            print(
+                f"{question_count} questions: "
+                f"row by row {legacy_statement_count} statements {legacy_seconds * 1000:.1f} ms, "
+                f"bulk {bulk_statement_count} statements {bulk_seconds * 1000:.1f} ms (x{legacy_seconds / bulk_seconds:.2f})"
+            )
+    finally:
+        await engine.dispose()
+
+
+def main():
+    reset_database()
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Время и пиковая память сборки документа опроса (refresh_survey_document).
+
+Запуск: python -m tests.benchmark_survey_document
+Нужна тестовая база TEST_DATABASE_NAME, схема пересоздается. Каждая сборка идет
+в отдельном процессе: ru_maxrss - максимум за всю жизнь процесса.
+"""
+import asyncio
+import multiprocessing
+import random
+import resource
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+import config
+from fastapp import crud, dependencies
+from tests.database import reset_database, create_session_maker, create_user, create_survey, create_survey_results
+
+
+QUESTION_COUNT = 10
+RESPONSE_COUNTS: list[int] = [1000, 10000, 100000]
+INCREMENT_RATE = 0.01 # Доля новых ответов перед повторной сборкой
+
+
+async def _refresh(survey_document_id: uuid.UUID, survey_document_title: str):
+    engine, _ = create_session_maker(pool_size=1)
+    # Сессия как у воркера: объекты истекают после commit
+    session_maker = async_sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    try:
+        async with session_maker() as db:
+            await dependencies.refresh_survey_document(db, survey_document_id, survey_document_title)
+    finally:
+        await engine.dispose()
+
+
+def _measure_refresh(save_path: str, survey_document_id: uuid.UUID, survey_document_title: str, results):
+    config.SURVEY_DOCUMENT_SAVE_PATH = save_path
+    start_rss_kilobytes: int = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    start: float = time.perf_counter()
+    asyncio.run(_refresh(survey_document_id, survey_document_title))
+
+    results.put((time.perf_counter() - start, start_rss_kilobytes, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss))
+
+
+def measure_refresh(save_path: str, survey_document_id: uuid.UUID, survey_document_title: str) -> tuple[float, int, int]:
+    # (секунды, RSS после импортов в KB, пиковый RSS в KB)
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=_measure_refresh, args=(save_path, survey_document_id, survey_document_title, results))
+
+    process.start()
+    result: tuple[float, int, int] = results.get()
+    process.join()
+
+    return result
+
+
+async def _create_survey_document(response_count: int) -> tuple:
+    engine, session_maker = create_session_maker()
+
+    try:
+        async with session_maker() as db:
+            user = await create_user(db)
+            survey = await create_survey(db, user.id, QUESTION_COUNT)
+            await create_survey_results(db, random.Random(0), survey, response_count)
+            survey_document_id: uuid.UUID = await crud.create_survey_document(db, survey.id, str(survey.id))
+    finally:
+        await engine.dispose()
+
+    return survey, survey_document_id
+
+
+async def _add_survey_results(survey, response_count: int):
+    engine, session_maker = create_session_maker()
+
+    try:
+        async with session_maker() as db:
+            # Новые ответы старше SURVEY_DOCUMENT_REFRESH_LAG_SECONDS, но позже уже собранных
+            await create_survey_results(db, random.Random(1), survey, response_count, created_at=datetime.now() - timedelta(hours=1))
+    finally:
+        await engine.dispose()
+
+
+def main():
+    reset_database()
+
+    with tempfile.TemporaryDirectory() as save_path:
+        save_path = f"{save_path}/"
+
+        for response_count in RESPONSE_COUNTS:
+            survey, survey_document_id = asyncio.run(_create_survey_document(response_count))
+
+            full_seconds, start_rss_kilobytes, full_rss_kilobytes = measure_refresh(save_path, survey_document_id, str(survey.id))
+
+            asyncio.run(_add_survey_results(survey, int(response_count * INCREMENT_RATE)))
+            incremental_seconds, _, incremental_rss_kilobytes = measure_refresh(save_path, survey_document_id, str(survey.id))
+
+            print(
+                f"{response_count} responses x {QUESTION_COUNT} questions: "
+                f"full {full_seconds:.2f} s, peak RSS {full_rss_kilobytes // 1024} MB; "
+                f"+{INCREMENT_RATE:.0%} responses {incremental_seconds:.2f} s, peak RSS {incremental_rss_kilobytes // 1024} MB; "
+                f"RSS after imports {start_rss_kilobytes // 1024} MB"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Запросов в секунду на GET /api/v1/survey/{survey_id}/: сборка ответа из ORM,
+готовые байты из кэша опросов и 304 по If-None-Match.
+
+Запуск: python -m tests.benchmark_survey_read
+Нужны тестовая база TEST_DATABASE_NAME (схема пересоздается) и Redis.
+"""
+import asyncio
+import uuid
+
+from fastapi import APIRouter, Depends, Header
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from fastapp import crud, dependencies, models, schemas
+from fastapp.database import get_db, sessionmanager
+from fastapp.redis_client import redis_client
+from tests.asgi import create_app, request, measure_requests_per_second
+from tests.database import TEST_DATABASE_URL, reset_database, create_session_maker, create_user, create_survey
+
+
+CLIENT_COUNT = 20
+DURATION_SECONDS = 5
+
+legacy_router = APIRouter(prefix="/legacy")
+
+
+@legacy_router.get("/survey/{survey_id}/", response_model=schemas.SurveyGet)
+async def get_survey_by_id(survey_id: uuid.UUID, authorization: str | None = Header(None), db: AsyncSession = Depends(get_db)) -> models.Survey:
+    # Чтение опроса до кэша готовых байтов: граф ORM, валидация SurveyGet и JSON на каждый запрос
+    survey: models.Survey | None = await crud.get_survey_by_id(db, survey_id)
+
+    await dependencies.check_survey_is_valid(db, survey, authorization)
+
+    return survey
+
+
+async def run():
+    engine, session_maker = create_session_maker()
+    sessionmanager.init_db(TEST_DATABASE_URL)
+    app = create_app(legacy_router)
+
+    try:
+        for question_count in [10, 100]:
+            async with session_maker() as db:
+                user = await create_user(db)
+                survey = await create_survey(db, user.id, question_count, is_anonim=True)
+
+            path: str = f"/api/v1/survey/{survey.id}/"
+            status, headers, body = await request(app, "GET", path)
+            etag: str = headers["etag"]
+
+            async def send_legacy():
+                assert (await request(app, "GET", f"/api/legacy/survey/{survey.id}/"))[0] == 200
+
+            async def send_cached():
+                assert (await request(app, "GET", path))[0] == 200
+
+            async def send_revalidation():
+                assert (await request(app, "GET", path, {"If-None-Match": etag}))[0] == 304
+
+            legacy_rps: float = await measure_requests_per_second(send_legacy, CLIENT_COUNT, DURATION_SECONDS)
+            cached_rps: float = await measure_requests_per_second(send_cached, CLIENT_COUNT, DURATION_SECONDS)
+            revalidation_rps: float = await measure_requests_per_second(send_revalidation, CLIENT_COUNT, DURATION_SECONDS)
+
+            print(
+                f"{question_count} questions ({len(body)} bytes): "
+                f"ORM + SurveyGet {legacy_rps:.0f} rps, "
+                f"cached bytes {cached_rps:.0f} rps (x{cached_rps / legacy_rps:.1f}), "
+                f"304 {revalidation_rps:.0f} rps (x{revalidation_rps / legacy_rps:.1f})"
+            )
+    finally:
+        await engine.dispose()
+        await sessionmanager.close()
+        await redis_client.aclose()
+
+
+def main():
+    reset_database()
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,18 @@
+import pytest
+
+import config
+from tests.database import TEST_DATABASE_URL, reset_database
+
+
+@pytest.fixture(scope="session")
+def test_database_url() -> str:
+    # Тесты с базой создают свой engine внутри asyncio.run: соединения asyncpg привязаны к event loop
+    if not config.TEST_DATABASE_NAME:
+        pytest.skip("TEST_DATABASE_NAME is not set")
+
+    try:
+        reset_database()
+    except OSError as e:
+        pytest.skip(f"Test database is unavailable: {e}")
+
+    return TEST_DATABASE_URL
@@ -0,0 +1,148 @@
+import asyncio
+import os
+import random
+import uuid
+from datetime import datetime, timedelta
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import insert, text
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncEngine, AsyncSession
+
+import config
+from fastapp import crud, models, schemas, scoring
+
+
+TEST_DATABASE_URL = f"postgresql+asyncpg://{config.DATABASE_USER}:{config.DATABASE_PASSWORD}@{config.DATABASE_HOST}:{config.DATABASE_PORT}/{config.TEST_DATABASE_NAME}"
+ALEMBIC_INI_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alembic.ini")
+
+ANSWER_TEXTS: list[str] = ["a", "b", "c", "d"]
+
+
+async def _drop_schema():
+    engine: AsyncEngine = create_async_engine(TEST_DATABASE_URL)
+
+    try:
+        async with engine.begin() as connection:
+            await connection.execute(text("DROP SCHEMA public CASCADE"))
+            await connection.execute(text("CREATE SCHEMA public"))
+    finally:
+        await engine.dispose()
+
+
+def _upgrade_schema():
+    # Схема строится цепочкой миграций test_forms, как в рабочей базе: типы ENUM
+    # и индексы создаются миграциями, а не metadata.create_all
+    alembic_config = Config(ALEMBIC_INI_PATH, ini_section="test_forms")
+    alembic_config.set_section_option("test_forms", "sqlalchemy.url", f"postgresql://{{}}:{{}}@{{}}:{{}}/{config.TEST_DATABASE_NAME}")
+    command.upgrade(alembic_config, "head")
+
+
+def reset_database():
+    # Вызывается вне event loop: env.py миграций запускает свой
+    asyncio.run(_drop_schema())
+    _upgrade_schema()
+
+
+def create_session_maker(pool_size: int = 10) -> tuple[AsyncEngine, async_sessionmaker[AsyncSession]]:
+    # expire_on_commit=False: созданный опрос читается и после commit пачек прохождений
+    engine: AsyncEngine = create_async_engine(TEST_DATABASE_URL, pool_size=pool_size, max_overflow=0)
+
+    return engine, async_sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+
+
+async def create_user(db: AsyncSession) -> models.User:
+    return await crud.create_user(db, schemas.UserCreate(name="Test", surname="User", email=f"{uuid.uuid4().hex}@example.com", code="000000"))
+
+
+def create_survey_schema(question_count: int, **survey_fields) -> schemas.SurveyCreate:
+    # Вопросы всех типов по кругу, у каждого вопроса четыре варианта:
+    # правильный первый, у choose_many - первые два
+    question_types: list[schemas.QuestionTypeEnum] = list(schemas.QuestionTypeEnum)
+    question_schemas: list[schemas.QuestionCreate] = []
+
+    for index in range(question_count):
+        question_type: schemas.QuestionTypeEnum = question_types[index % len(question_types)]
+        correct_answer_count: int = 2 if question_type == schemas.QuestionTypeEnum.choose_many else 1
+
+        question_schemas.append(schemas.QuestionCreate(
+            title=f"Question {index}",
+            score=1,
+            type=question_type,
+            is_required=index % 2 == 0,
+            answers=[
+                schemas.QuestionAnswerCreate(text=answer_text, is_correct=answer_index < correct_answer_count)
+                for answer_index, answer_text in enumerate(ANSWER_TEXTS)
+            ]
+        ))
+
+    return schemas.SurveyCreate(title="Test survey", questions=question_schemas, **survey_fields)
+
+
+async def create_survey(db: AsyncSession, user_id: uuid.UUID, question_count: int, **survey_fields) -> models.Survey:
+    survey_id: uuid.UUID = await crud.create_survey(db, user_id, create_survey_schema(question_count, **survey_fields))
+
+    return await crud.get_survey_by_id(db, survey_id)
+
+
+def create_user_questions(rng: random.Random, survey: models.Survey) -> list[schemas.UserQuestionsResultCreate]:
+    # Ответ на каждый вопрос: обычно один вариант, для choose_many - один-два
+    user_questions: list[schemas.UserQuestionsResultCreate] = []
+
+    for question in survey.questions:
+        answer_count: int = rng.randint(1, 2) if question.type == schemas.QuestionTypeEnum.choose_many else 1
+        answer_texts: list[str] = rng.sample(ANSWER_TEXTS, answer_count)
+
+        user_questions.append(schemas.UserQuestionsResultCreate(
+            question_id=question.id,
+            user_answers=[schemas.UserAnswerResultCreate(text=answer_text) for answer_text in answer_texts]
+        ))
+
+    return user_questions
+
+
+async def create_survey_results(
+    db: AsyncSession,
+    rng: random.Random,
+    survey: models.Survey,
+    count: int,
+    graded: bool = True,
+    created_at: datetime | None = None,
+    batch_size: int = 1000
+):
+    # Прохождения вставляются пачками напрямую, без create_answer_for_survey:
+    # так 100k ответов создаются за секунды. graded=False - прохождения до появления сохраненных баллов.
+    # created_at - время первого прохождения, следующие идут через миллисекунду
+    survey_scorer = scoring.SurveyScorer(survey.questions)
+    created_at = created_at or datetime.now() - timedelta(days=1)
+
+    for batch_start in range(0, count, batch_size):
+        survey_result_rows: list[dict] = []
+        question_result_rows: list[dict] = []
+        answer_result_rows: list[dict] = []
+
+        for index in range(batch_start, min(batch_start + batch_size, count)):
+            user_questions: list[schemas.UserQuestionsResultCreate] = create_user_questions(rng, survey)
+            respondent_grade: scoring.RespondentGrade = survey_scorer.grade_respondent(
+                [(user_question.question_id, [user_answer.text for user_answer in user_question.user_answers]) for user_question in user_questions]
+            )
+            survey_result_id: uuid.UUID = uuid.uuid4()
+            survey_result_rows.append(dict(
+                id=survey_result_id, survey_id=survey.id, user_id=None,
+                score=respondent_grade.score if graded else None, created_at=created_at + timedelta(milliseconds=index)
+            ))
+
+            for user_question, question_grade in zip(user_questions, respondent_grade.question_grades):
+                question_result_id: uuid.UUID = uuid.uuid4()
+                question_result_rows.append(dict(
+                    id=question_result_id, user_survey_result_id=survey_result_id, question_id=user_question.question_id,
+                    is_correct=question_grade.is_correct, score=question_grade.score if graded else None
+                ))
+
+                for user_answer, answer_is_correct in zip(user_question.user_answers, question_grade.answer_is_correct):
+                    answer_result_rows.append(dict(id=uuid.uuid4(), user_question_result_id=question_result_id, text=user_answer.text, is_correct=answer_is_correct))
+
+        await db.execute(insert(models.UserSurveyResult), survey_result_rows)
+        await db.execute(insert(models.UserQuestionResult), question_result_rows)
+        await db.execute(insert(models.UserAnswerResult), answer_result_rows)
+        await db.commit()
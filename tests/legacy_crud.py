@@ -0,0 +1,54 @@
+import uuid
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from fastapp import crud, models, schemas
+
+
+async def create_survey(
+    db: AsyncSession,
+    user_id: uuid.UUID,
+    survey_schema: schemas.SurveyCreate
+) -> uuid.UUID:
+    # Создание опроса до массовой вставки: INSERT ... RETURNING на каждый вопрос и INSERT на каждый ответ
+    insert_survey_stmt = insert(models.Survey).values(
+        user_id=user_id, **survey_schema.model_dump(exclude={"questions"})
+    ).returning(models.Survey.id)
+
+    survey_model = await db.execute(insert_survey_stmt)
+    survey_id: uuid.UUID = survey_model.scalar()
+
+    question_schemas: list[schemas.QuestionCreate] = survey_schema.questions
+    for question_schema in question_schemas:
+        insert_question_stmt = insert(models.Question).values(
+            survey_id=survey_id, **question_schema.model_dump(exclude={"answers"})
+        ).returning(models.Question.id)
+
+        question_model = await db.execute(insert_question_stmt)
+        question_id: uuid.UUID = question_model.scalar()
+
+        answer_schemas: list[schemas.QuestionAnswerCreate] = question_schema.answers
+        for answer_schema in answer_schemas:
+            insert_answer_stmt = insert(models.QuestionAnswer).values(
+                question_id=question_id, **answer_schema.model_dump()
+            )
+
+            await db.execute(insert_answer_stmt)
+
+    await db.commit()
+
+    return survey_id
+
+
+async def has_user_passed_survey(
+    db: AsyncSession,
+    survey_id: uuid.UUID,
+    user_id: uuid.UUID
+) -> bool:
+    # Проверка повторной отправки до запроса EXISTS: опрос загружается со всеми ответами,
+    # id пользователей ищутся в Python
+    survey: models.Survey = await crud.get_survey_by_id(db, survey_id, load_user_answers=True)
+    user_passed_survey_ids: list[uuid.UUID] = [user_survey_result.user_id for user_survey_result in survey.user_survey_results]
+
+    return user_id in user_passed_survey_ids
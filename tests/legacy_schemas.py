@@ -0,0 +1,53 @@
+from pydantic import model_validator
+
+from fastapp.schemas import SurveyOwnerGet, UserSurveyResultOwnerGet, QuestionAnswerGet, QuestionTypeEnum
+# Строковые аннотации полей родительских моделей разрешаются в этом модуле
+from fastapp.schemas import User, QuestionGet, SurveyBase, UserQuestionsResultGet
+
+
+class SurveyGet(SurveyOwnerGet):
+    # Фильтрация до разделения на представления: скрытые ответы пересоздаются через .dict()
+    @model_validator(mode="after")
+    def filter_answers_based_on_type(cls, survey):
+        if not survey.show_results:
+            for question in survey.questions:
+                if not question.show_answers:
+                    if question.type == QuestionTypeEnum.text:
+                        question.answers = None
+                    else:
+                        if question.answers is not None:
+                            question.answers = [
+                                QuestionAnswerGet(
+                                    **{k: v for k, v in answer.dict().items() if k != "is_correct"}
+                                ) for answer in question.answers
+                            ]
+
+        return survey
+
+
+class UserSurveyResultGet(UserSurveyResultOwnerGet):
+    @model_validator(mode="after")
+    def filter_answers_based_on_type(cls, survey):
+        if not survey.survey.show_score:
+            survey.score = None
+            for user_question in survey.user_questions:
+                user_question.score = None
+
+        if not survey.survey.show_results:
+            for user_question in survey.user_questions:
+                if not user_question.question.show_answers:
+                    # Скрываем правильность ответов пользователя
+                    user_question.is_correct = False
+                    for user_answer in user_question.user_answers:
+                        user_answer.is_correct = False
+
+                    if user_question.question.type == QuestionTypeEnum.text:
+                        user_question.question.answers = None
+                    else:
+                        if user_question.question.answers is not None:
+                            user_question.question.answers = [
+                                QuestionAnswerGet(
+                                    **{k: v for k, v in answer.dict().items() if k != "is_correct"}
+                                ) for answer in user_question.question.answers
+                            ]
+        return survey
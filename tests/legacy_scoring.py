@@ -0,0 +1,65 @@
+import uuid
+
+
+def group_rows(rows: list[tuple[uuid.UUID, uuid.UUID | None, uuid.UUID | None, str | None]]) -> list[list[tuple[uuid.UUID, list[str]]]]:
+    # Группировка строк базы (survey_result_id, question_result_id, question_id, text)
+    # в прохождения, как это делалось перед циклом проверки
+    respondents: list[list[tuple[uuid.UUID, list[str]]]] = []
+    last_survey_result_id: uuid.UUID | None = None
+    last_question_result_id: uuid.UUID | None = None
+
+    for survey_result_id, question_result_id, question_id, text in rows:
+        if survey_result_id != last_survey_result_id:
+            last_survey_result_id = survey_result_id
+            last_question_result_id = None
+            respondents.append([])
+
+        if question_result_id is None:
+            continue
+
+        if question_result_id != last_question_result_id:
+            last_question_result_id = question_result_id
+            respondents[-1].append((question_id, []))
+
+        if text is not None:
+            respondents[-1][-1][1].append(text)
+
+    return respondents
+
+
+def grade_respondents(questions: list, respondents: list[list[tuple[uuid.UUID, list[str]]]]) -> list[tuple[int, list[bool]]]:
+    # Цикл проверки из refresh_survey_document до появления fastapp.scoring,
+    # эталон для SurveyScorer. Возвращает баллы и правильность каждого результата вопроса
+    questions_info: dict = {}
+
+    for question in questions:
+        questions_info[question.id] = {
+            "correct_answers": list(sorted([question_answer.text for question_answer in question.answers if question_answer.is_correct])),
+            "type": question.type,
+            "score": question.score if question.score else 0,
+        }
+
+    respondent_grades: list[tuple[int, list[bool]]] = []
+
+    for user_questions in respondents:
+        user_score: int = 0
+        question_results: list[bool] = []
+
+        for question_id, answers in user_questions:
+            question_info: dict = questions_info[question_id]
+            user_answers: list[str] = list(sorted(answers))
+            is_correct: bool = False
+
+            if question_info["type"] in ["text", "choose_one", "dropdown_list"]:
+                is_correct = len(user_answers) == 1 and user_answers[0] in question_info["correct_answers"]
+            elif question_info["type"] == "choose_many":
+                is_correct = user_answers == question_info["correct_answers"]
+
+            if is_correct:
+                user_score += question_info["score"]
+
+            question_results.append(is_correct)
+
+        respondent_grades.append((user_score, question_results))
+
+    return respondent_grades
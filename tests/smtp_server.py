@@ -0,0 +1,110 @@
+import contextlib
+import datetime
+import ipaddress
+import logging
+import multiprocessing
+import os
+import ssl
+import tempfile
+import time
+from typing import Iterator
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+
+
+SMTP_HOST = "localhost"
+
+
+def create_certificate(directory_path: str) -> tuple[str, str]:
+    # Самоподписанный сертификат localhost: клиенту он же служит корневым
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, SMTP_HOST)])
+    now: datetime.datetime = datetime.datetime.now(datetime.timezone.utc)
+
+    certificate = x509.CertificateBuilder().subject_name(name).issuer_name(name).public_key(
+        key.public_key()
+    ).serial_number(x509.random_serial_number()).not_valid_before(
+        now - datetime.timedelta(days=1)
+    ).not_valid_after(
+        now + datetime.timedelta(days=1)
+    ).add_extension(
+        x509.SubjectAlternativeName([x509.DNSName(SMTP_HOST), x509.IPAddress(ipaddress.ip_address("127.0.0.1"))]), critical=False
+    ).add_extension(
+        x509.BasicConstraints(ca=True, path_length=None), critical=True
+    ).sign(key, hashes.SHA256())
+
+    certificate_path: str = os.path.join(directory_path, "smtp.crt")
+    key_path: str = os.path.join(directory_path, "smtp.key")
+
+    with open(certificate_path, "wb") as certificate_file:
+        certificate_file.write(certificate.public_bytes(serialization.Encoding.PEM))
+
+    with open(key_path, "wb") as key_file:
+        key_file.write(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()))
+
+    return certificate_path, key_path
+
+
+def _run_server(port: int, certificate_path: str, key_path: str, message_count, ready):
+    from aiosmtpd.controller import Controller
+    from aiosmtpd.smtp import AuthResult
+
+    class Handler:
+        async def handle_DATA(self, server, session, envelope) -> str:
+            with message_count.get_lock():
+                message_count.value += 1
+
+            return "250 Message accepted for delivery"
+
+    # aiosmtpd пишет в лог об устаревшем Session.login_data на каждый AUTH
+    logging.getLogger("mail.log").setLevel(logging.ERROR)
+
+    ssl_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    ssl_context.load_cert_chain(certificate_path, key_path)
+
+    # Соединение сразу в TLS, как у почтового сервера на порту 465; принимается любой логин.
+    # aiosmtpd считает TLS только STARTTLS, поэтому без auth_require_tls=False AUTH не объявляется
+    controller = Controller(
+        Handler(), hostname=SMTP_HOST, port=port, ssl_context=ssl_context,
+        authenticator=lambda *args: AuthResult(success=True), auth_require_tls=False
+    )
+    controller.start()
+    ready.set()
+
+    while True:
+        time.sleep(60)
+
+
+@contextlib.contextmanager
+def run_smtp_server(port: int) -> Iterator:
+    # Сервер работает в отдельном процессе, чтобы не делить GIL с клиентом.
+    # Возвращает счетчик принятых писем; клиенты процесса доверяют сертификату через SSL_CERT_FILE
+    context = multiprocessing.get_context("spawn")
+    message_count = context.Value("q", 0)
+    ready = context.Event()
+
+    with tempfile.TemporaryDirectory() as directory_path:
+        certificate_path, key_path = create_certificate(directory_path)
+        process = context.Process(target=_run_server, args=(port, certificate_path, key_path, message_count, ready), daemon=True)
+        previous_certificate_file: str | None = os.environ.get("SSL_CERT_FILE")
+
+        process.start()
+
+        try:
+            if not ready.wait(30):
+                raise RuntimeError("SMTP server did not start")
+
+            os.environ["SSL_CERT_FILE"] = certificate_path
+
+            yield message_count
+        finally:
+            if previous_certificate_file is None:
+                os.environ.pop("SSL_CERT_FILE", None)
+            else:
+                os.environ["SSL_CERT_FILE"] = previous_certificate_file
+
+            process.terminate()
+            process.join()
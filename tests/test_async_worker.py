@@ -0,0 +1,138 @@
+import asyncio
+import time
+import uuid
+
+import pytest
+from redis import asyncio as aioredis
+from redis.exceptions import RedisError
+
+import config
+from fastapp.tasks import async_worker
+from fastapp.tasks.celeryconfig import celery_app
+
+
+TASK_NAME = "tests.async_worker_task"
+
+
+@pytest.fixture
+def broker_queues(monkeypatch) -> str:
+    # Свои имена очередей на каждый тест, рабочие очереди брокера не трогаются
+    async def ping():
+        redis = aioredis.from_url(config.CELERY_BROKER_URL)
+
+        try:
+            await redis.ping()
+        finally:
+            await redis.aclose()
+
+    try:
+        asyncio.run(ping())
+    except (RedisError, OSError) as e:
+        pytest.skip(f"Celery broker is unavailable: {e}")
+
+    prefix: str = f"test.{uuid.uuid4().hex}"
+    monkeypatch.setattr(config, "CELERY_IO_QUEUE", f"{prefix}.io")
+    monkeypatch.setattr(config, "CELERY_IO_DEAD_LETTER_QUEUE", f"{prefix}.dead_letter")
+    monkeypatch.setattr(config, "CELERY_IO_PROCESSING_QUEUE_PREFIX", f"{prefix}.processing:")
+    monkeypatch.setattr(config, "CELERY_IO_SCHEDULED_QUEUE", f"{prefix}.scheduled")
+
+    yield prefix
+
+    async def clean():
+        redis = aioredis.from_url(config.CELERY_BROKER_URL)
+
+        try:
+            keys: list[bytes] = [key async for key in redis.scan_iter(f"{prefix}*")]
+
+            if keys:
+                await redis.delete(*keys)
+        finally:
+            await redis.aclose()
+
+    asyncio.run(clean())
+
+
+def send_message(args: tuple = (), countdown: float | None = None):
+    # Сообщение celery в том виде, в каком его кладет apply_async
+    celery_app.send_task(TASK_NAME, args=args, queue=config.CELERY_IO_QUEUE, countdown=countdown)
+
+
+async def _run_message(calls: list, fail: bool = False) -> tuple[int, int, int, int]:
+    redis = aioredis.from_url(config.CELERY_BROKER_URL)
+    broker = async_worker.Broker(redis, "worker")
+
+    async def task(*args):
+        calls.append(args)
+
+        if fail:
+            raise ValueError("Task failed")
+
+    async_worker.ASYNC_TASKS[TASK_NAME] = task
+
+    try:
+        raw_message: bytes = await broker.receive()
+        semaphore = asyncio.Semaphore(1)
+        await semaphore.acquire()
+        await async_worker._run_task(broker, raw_message, semaphore)
+
+        return (
+            await redis.llen(config.CELERY_IO_QUEUE),
+            await redis.llen(broker.processing_queue),
+            await redis.zcard(config.CELERY_IO_SCHEDULED_QUEUE),
+            await redis.llen(config.CELERY_IO_DEAD_LETTER_QUEUE),
+        )
+    finally:
+        async_worker.ASYNC_TASKS.pop(TASK_NAME, None)
+        await redis.aclose()
+
+
+def test_completed_and_failed_messages_are_acknowledged(broker_queues: str):
+    calls: list = []
+
+    send_message((1,))
+    assert asyncio.run(_run_message(calls)) == (0, 0, 0, 0)
+
+    send_message((2,))
+    assert asyncio.run(_run_message(calls, fail=True)) == (0, 0, 0, 0)
+
+    assert calls == [(1,), (2,)]
+
+
+def test_future_eta_message_is_scheduled_without_waiting(broker_queues: str):
+    calls: list = []
+    send_message(countdown=60)
+
+    start: float = time.monotonic()
+    assert asyncio.run(_run_message(calls)) == (0, 0, 1, 0)
+    assert time.monotonic() - start < 5
+    assert calls == []
+
+
+def test_unknown_task_is_dead_lettered(broker_queues: str):
+    celery_app.send_task("tests.unknown_task", queue=config.CELERY_IO_QUEUE)
+
+    assert asyncio.run(_run_message([])) == (0, 0, 0, 1)
+
+
+async def _restore_and_requeue() -> tuple[int, int, int]:
+    redis = aioredis.from_url(config.CELERY_BROKER_URL)
+    broker = async_worker.Broker(redis, "worker")
+
+    try:
+        # Воркер упал, не выполнив взятое сообщение
+        await broker.receive()
+        restored_count: int = await broker.restore_processing_messages()
+
+        # Отложенное сообщение, время которого пришло
+        await redis.zadd(config.CELERY_IO_SCHEDULED_QUEUE, {b"due": time.time() - 1, b"later": time.time() + 60})
+        requeued_count: int = await broker.requeue_due_messages()
+
+        return restored_count, requeued_count, await redis.llen(config.CELERY_IO_QUEUE)
+    finally:
+        await redis.aclose()
+
+
+def test_processing_and_due_messages_return_to_queue(broker_queues: str):
+    send_message()
+
+    assert asyncio.run(_restore_and_requeue()) == (1, 1, 2)
@@ -0,0 +1,48 @@
+import asyncio
+import uuid
+
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncEngine
+
+import config
+from fastapp import crud, exceptions, models
+
+
+CONCURRENT_REQUEST_COUNT = 500
+DATABASE_POOL_SIZE = 50 # Меньше max_connections postgres, остальные запросы ждут соединения из пула
+
+
+async def _create_codes_concurrently(database_url: str, email: str) -> tuple[int, int, int]:
+    engine: AsyncEngine = create_async_engine(database_url, pool_size=DATABASE_POOL_SIZE, max_overflow=0)
+    session_maker = async_sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    async def create_code() -> bool:
+        async with session_maker() as db:
+            try:
+                await crud.create_code(db, email)
+                return True
+            except exceptions.CodeMoreThanExisting:
+                return False
+
+    try:
+        results: list[bool] = await asyncio.gather(*(create_code() for _ in range(CONCURRENT_REQUEST_COUNT)))
+
+        async with session_maker() as db:
+            code_count: int = (await db.execute(
+                select(func.count()).select_from(models.Code).where(models.Code.email == email)
+            )).scalar_one()
+    finally:
+        await engine.dispose()
+
+    return results.count(True), results.count(False), code_count
+
+
+def test_create_code_concurrently_respects_max_existing_code_count(test_database_url: str):
+    email: str = f"{uuid.uuid4().hex}@example.com"
+
+    created_count, rejected_count, code_count = asyncio.run(_create_codes_concurrently(test_database_url, email))
+
+    expected_count: int = min(config.MAX_EXISTING_CODE_COUNT, CONCURRENT_REQUEST_COUNT)
+    assert code_count <= config.MAX_EXISTING_CODE_COUNT
+    assert code_count == created_count == expected_count
+    assert rejected_count == CONCURRENT_REQUEST_COUNT - expected_count
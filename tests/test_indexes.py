@@ -0,0 +1,193 @@
+import asyncio
+import json
+import random
+import uuid
+from typing import Awaitable, Callable
+
+import pytest
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from fastapp import crud, models, schemas, scoring
+from tests.database import create_session_maker, create_user, create_survey, create_user_questions, create_survey_results
+
+
+# Вызов функции crud -> индексы, которыми должны пользоваться ее запросы.
+# Каждый элемент списка индексов - варианты, хотя бы один из которых должен попасть в план
+LOOKUP_CALLS: list[tuple[str, Callable[[AsyncSession, dict], Awaitable], list[set[str]]]] = [
+    (
+        "get_user_by_email",
+        lambda db, seed: crud.get_user_by_email(db, seed["email"]),
+        [{"ix_user_table_email"}]
+    ),
+    (
+        "get_code_by_user_email_and_code",
+        lambda db, seed: crud.get_code_by_user_email_and_code(db, seed["email"], seed["code"]),
+        [{"ix_code_table_email_code_expire_datetime"}]
+    ),
+    (
+        "create_code",
+        lambda db, seed: crud.create_code(db, seed["email"]),
+        [{"ix_code_table_email_code_expire_datetime"}]
+    ),
+    (
+        "delete_expired_codes",
+        lambda db, seed: crud.delete_expired_codes(db, 100),
+        [{"ix_code_table_expire_datetime"}]
+    ),
+    (
+        "get_surveys_by_user_id",
+        lambda db, seed: crud.get_surveys_by_user_id(db, seed["user"].id),
+        [{"ix_survey_table_user_id"}, {"ix_question_table_survey_id"}, {"ix_question_answer_table_question_id"}]
+    ),
+    (
+        "get_survey_by_id",
+        lambda db, seed: crud.get_survey_by_id(db, seed["survey"].id, load_document_survey=True),
+        [{"ix_question_table_survey_id"}, {"ix_question_answer_table_question_id"}, {"ix_survey_document_table_survey_id"}]
+    ),
+    (
+        "has_user_passed_survey",
+        lambda db, seed: crud.has_user_passed_survey(db, seed["survey"].id, seed["user"].id),
+        [{"ix_user_survey_result_table_survey_id_user_id"}]
+    ),
+    (
+        "get_survey_results_page",
+        lambda db, seed: crud.get_survey_results_page(db, seed["survey"].id, after=seed["after"]),
+        [{"ix_user_survey_result_table_survey_id_created_at_id"}]
+    ),
+    (
+        "get_answers_by_survey_result_ids",
+        lambda db, seed: crud.get_answers_by_survey_result_ids(db, seed["survey_result_ids"]),
+        [{"ix_user_question_result_table_user_survey_result_id"}, {"ix_user_answer_result_table_user_question_result_id"}]
+    ),
+    (
+        "count_survey_results",
+        lambda db, seed: crud.count_survey_results(db, seed["survey"].id),
+        [{"ix_user_survey_result_table_survey_id_user_id", "ix_user_survey_result_table_survey_id_created_at_id"}]
+    ),
+    (
+        "get_survey_results_by_survey_id",
+        lambda db, seed: crud.get_survey_results_by_survey_id(db, seed["survey"].id, after=seed["after"]),
+        [
+            {"ix_user_survey_result_table_survey_id_created_at_id"},
+            {"ix_user_question_result_table_user_survey_result_id"},
+            {"ix_user_answer_result_table_user_question_result_id"}
+        ]
+    ),
+    (
+        "get_survey_results_by_user_id",
+        lambda db, seed: crud.get_survey_results_by_user_id(db, seed["user"].id),
+        [{"ix_user_survey_result_table_user_id"}]
+    ),
+    (
+        "get_survey_document_by_survey_id",
+        lambda db, seed: crud.get_survey_document_by_survey_id(db, seed["survey"].id),
+        [{"ix_survey_document_table_survey_id"}]
+    ),
+    (
+        "delete_codes_by_email",
+        lambda db, seed: crud.delete_codes_by_email(db, seed["email"]),
+        [{"ix_code_table_email_code_expire_datetime"}]
+    ),
+]
+
+
+def _get_plan_nodes(plan: dict) -> list[dict]:
+    plan_nodes: list[dict] = [plan]
+
+    for sub_plan in plan.get("Plans", []):
+        plan_nodes += _get_plan_nodes(sub_plan)
+
+    return plan_nodes
+
+
+async def _seed(db: AsyncSession) -> dict:
+    # По строке в каждой таблице: без родительских строк selectinload не выполняет свои запросы
+    user: models.User = await create_user(db)
+    code: str = await crud.create_code(db, user.email)
+    survey: models.Survey = await create_survey(db, user.id, 4)
+    await create_survey_results(db, random.Random(0), survey, 3)
+
+    # Прохождение от пользователя для has_user_passed_survey и get_survey_results_by_user_id
+    survey_result_schema = schemas.UserSurveyResultCreate(survey_id=survey.id, user_questions=create_user_questions(random.Random(1), survey))
+    await crud.create_answer_for_survey(db, user.id, survey.id, scoring.SurveyScorer(survey.questions), survey_result_schema)
+    await crud.create_survey_document(db, survey.id, uuid.uuid4().hex)
+
+    survey_results = await crud.get_survey_results_page(db, survey.id)
+
+    return {
+        "email": user.email,
+        "code": code,
+        "user": user,
+        "survey": survey,
+        "after": tuple(survey_results[0]),
+        "survey_result_ids": [survey_result.id for survey_result in survey_results],
+    }
+
+
+async def _explain_lookup_calls() -> dict[str, list[tuple[str, list[dict]]]]:
+    # Запросы снимаются с курсора при вызове настоящих функций crud и затем
+    # разбираются EXPLAIN с теми же параметрами
+    engine, session_maker = create_session_maker(pool_size=1)
+    plans: dict[str, list[tuple[str, list[dict]]]] = {}
+
+    try:
+        async with session_maker() as db:
+            seed: dict = await _seed(db)
+
+        for name, lookup_call, _ in LOOKUP_CALLS:
+            statements: list[tuple[str, tuple]] = []
+
+            def record_statement(conn, cursor, statement, parameters, context, executemany):
+                if statement.lstrip().upper().startswith(("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")):
+                    statements.append((statement, parameters))
+
+            event.listen(engine.sync_engine, "before_cursor_execute", record_statement)
+
+            try:
+                async with session_maker() as db:
+                    await lookup_call(db, seed)
+            finally:
+                event.remove(engine.sync_engine, "before_cursor_execute", record_statement)
+
+            plans[name] = []
+
+            async with engine.connect() as connection:
+                # Таблицы почти пустые, без этого планировщик всегда выбирает seq scan
+                await connection.execute(text("SET enable_seqscan = off"))
+
+                for statement, parameters in statements:
+                    explain_result = (await connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters)).scalar_one()
+
+                    if isinstance(explain_result, str):
+                        explain_result = json.loads(explain_result)
+
+                    plans[name].append((statement, _get_plan_nodes(explain_result[0]["Plan"])))
+
+                await connection.rollback()
+    finally:
+        await engine.dispose()
+
+    return plans
+
+
+@pytest.fixture(scope="module")
+def lookup_plans(test_database_url: str) -> dict[str, list[tuple[str, list[dict]]]]:
+    return asyncio.run(_explain_lookup_calls())
+
+
+@pytest.mark.parametrize("name, index_name_variants", [(name, index_name_variants) for name, _, index_name_variants in LOOKUP_CALLS], ids=[name for name, _, _ in LOOKUP_CALLS])
+def test_crud_lookup_uses_index(lookup_plans: dict, name: str, index_name_variants: list[set[str]]):
+    statement_plans: list[tuple[str, list[dict]]] = lookup_plans[name]
+    plan_index_names: set[str] = set()
+
+    assert statement_plans, f"{name} executed no statements"
+
+    for statement, plan_nodes in statement_plans:
+        seq_scan_tables: list[str] = [plan_node["Relation Name"] for plan_node in plan_nodes if plan_node["Node Type"] == "Seq Scan"]
+        assert not seq_scan_tables, f"Seq scan on {seq_scan_tables} in {statement}"
+
+        plan_index_names |= {plan_node["Index Name"] for plan_node in plan_nodes if "Index Name" in plan_node}
+
+    for index_names in index_name_variants:
+        assert plan_index_names & index_names, f"Plans use {plan_index_names or 'no indexes'}, expected one of {index_names}"
@@ -0,0 +1,55 @@
+import uuid
+from datetime import datetime
+
+from fastapp import schemas
+
+
+def create_survey_result(show_score: bool, show_results: bool, show_answers: bool) -> dict:
+    survey_id: uuid.UUID = uuid.uuid4()
+    question_id: uuid.UUID = uuid.uuid4()
+    question_result_id: uuid.UUID = uuid.uuid4()
+    now: datetime = datetime.now()
+
+    return {
+        "id": uuid.uuid4(),
+        "created_at": now,
+        "survey_id": survey_id,
+        "survey": {"title": "Survey", "show_score": show_score, "show_results": show_results},
+        "score": 3,
+        "user_questions": [{
+            "id": question_result_id,
+            "created_at": now,
+            "question_id": question_id,
+            "user_survey_result_id": uuid.uuid4(),
+            "is_correct": True,
+            "score": 3,
+            "question": {
+                "id": question_id,
+                "created_at": now,
+                "title": "Question",
+                "score": 3,
+                "type": schemas.QuestionTypeEnum.choose_one,
+                "show_answers": show_answers,
+                "answers": [{"id": uuid.uuid4(), "created_at": now, "text": "a", "is_correct": True}],
+            },
+            "user_answers": [{"id": uuid.uuid4(), "created_at": now, "text": "a", "is_correct": True, "user_question_result_id": question_result_id}],
+        }],
+    }
+
+
+def test_hidden_question_does_not_leak_score():
+    survey_result = schemas.UserSurveyResultGet.model_validate(create_survey_result(show_score=True, show_results=False, show_answers=False))
+    user_question = survey_result.user_questions[0]
+
+    assert survey_result.score == 3
+    assert user_question.is_correct is False
+    assert user_question.score is None
+    assert [user_answer.is_correct for user_answer in user_question.user_answers] == [False]
+
+
+def test_shown_question_keeps_score():
+    survey_result = schemas.UserSurveyResultGet.model_validate(create_survey_result(show_score=True, show_results=False, show_answers=True))
+    user_question = survey_result.user_questions[0]
+
+    assert user_question.is_correct is True
+    assert user_question.score == 3
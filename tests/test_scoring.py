@@ -0,0 +1,153 @@
+import random
+import uuid
+from types import SimpleNamespace
+
+from fastapp.schemas import QuestionTypeEnum
+from fastapp.scoring import SurveyScorer
+from tests.legacy_scoring import grade_respondents, group_rows
+
+
+QUESTION_TYPES: list[str] = [question_type.value for question_type in QuestionTypeEnum]
+# Маленький алфавит, чтобы чаще попадались одинаковые тексты вариантов и повторные ответы
+ANSWER_TEXTS: list[str] = ["a", "b", "c", "d"]
+
+
+def create_questions(rng: random.Random, question_count: int) -> list[SimpleNamespace]:
+    return [
+        SimpleNamespace(
+            id=uuid.uuid4(),
+            type=rng.choice(QUESTION_TYPES),
+            is_required=rng.random() < 0.5,
+            score=rng.choice([None, 0, 1, 3]),
+            answers=[
+                SimpleNamespace(text=rng.choice(ANSWER_TEXTS), is_correct=rng.random() < 0.5)
+                for _ in range(rng.randint(0, 4))
+            ]
+        ) for _ in range(question_count)
+    ]
+
+
+def create_respondents(rng: random.Random, questions: list[SimpleNamespace], respondent_count: int) -> list[list[tuple[uuid.UUID, list[str]]]]:
+    respondents: list[list[tuple[uuid.UUID, list[str]]]] = []
+
+    for _ in range(respondent_count):
+        user_questions: list[tuple[uuid.UUID, list[str]]] = []
+
+        for question in questions:
+            if rng.random() < 0.1:
+                continue
+
+            # Иногда отвечаем ровно правильными вариантами, иначе вероятность верного ответа мала
+            if rng.random() < 0.3:
+                answers: list[str] = [answer.text for answer in question.answers if answer.is_correct]
+            else:
+                answers = [rng.choice(ANSWER_TEXTS + ["unknown"]) for _ in range(rng.randint(0, 3))]
+
+            rng.shuffle(answers)
+            user_questions.append((question.id, answers))
+
+        respondents.append(user_questions)
+
+    return respondents
+
+
+def create_rows(respondents: list[list[tuple[uuid.UUID, list[str]]]], id_factory=uuid.uuid4) -> list[tuple]:
+    # Строки в том виде, в каком их отдает база: (survey_result_id, question_result_id, question_id, text)
+    rows: list[tuple] = []
+
+    for user_questions in respondents:
+        survey_result_id = id_factory()
+
+        if not user_questions:
+            rows.append((survey_result_id, None, None, None))
+
+        for question_id, answers in user_questions:
+            question_result_id = id_factory()
+
+            if not answers:
+                rows.append((survey_result_id, question_result_id, question_id, None))
+
+            for answer in answers:
+                rows.append((survey_result_id, question_result_id, question_id, answer))
+
+    return rows
+
+
+def test_grade_respondent_matches_legacy_loop():
+    rng = random.Random(0)
+
+    for _ in range(300):
+        questions: list[SimpleNamespace] = create_questions(rng, rng.randint(1, 6))
+        respondents = create_respondents(rng, questions, rng.randint(1, 8))
+        survey_scorer = SurveyScorer(questions)
+
+        respondent_grades = [survey_scorer.grade_respondent(user_questions) for user_questions in respondents]
+
+        assert [
+            (respondent_grade.score, [question_grade.is_correct for question_grade in respondent_grade.question_grades])
+            for respondent_grade in respondent_grades
+        ] == grade_respondents(questions, respondents)
+
+        for user_questions, respondent_grade in zip(respondents, respondent_grades):
+            for (question_id, answers), question_grade in zip(user_questions, respondent_grade.question_grades):
+                question = next(question for question in questions if question.id == question_id)
+                correct_texts: set[str] = {answer.text for answer in question.answers if answer.is_correct}
+
+                assert question_grade.answer_is_correct == [answer in correct_texts for answer in answers]
+
+
+def test_score_rows_matches_legacy_loop():
+    rng = random.Random(1)
+
+    for _ in range(300):
+        questions: list[SimpleNamespace] = create_questions(rng, rng.randint(1, 6))
+        respondents = create_respondents(rng, questions, rng.randint(1, 8))
+        rows: list[tuple] = create_rows(respondents)
+        survey_scorer = SurveyScorer(questions)
+
+        batch = survey_scorer.encode_rows(rows)
+        survey_scores = survey_scorer.score(batch)
+        legacy_grades = grade_respondents(questions, group_rows(rows))
+
+        assert survey_scores.respondent_scores.tolist() == [score for score, _ in legacy_grades]
+        assert survey_scores.result_is_correct.tolist() == [is_correct for _, question_results in legacy_grades for is_correct in question_results]
+        assert survey_scores.answer_is_correct.tolist() == [
+            survey_scorer.grade_respondent([(question_id, [text])]).question_grades[0].answer_is_correct[0]
+            for _, _, question_id, text in rows if text is not None
+        ]
+
+
+def test_choose_many_with_duplicate_correct_texts():
+    question = SimpleNamespace(
+        id=uuid.uuid4(),
+        type=QuestionTypeEnum.choose_many.value,
+        is_required=False,
+        score=2,
+        answers=[SimpleNamespace(text="c", is_correct=True), SimpleNamespace(text="c", is_correct=True)]
+    )
+    respondents = [[(question.id, ["c"])], [(question.id, ["c", "c"])]]
+    survey_scorer = SurveyScorer([question])
+
+    assert [survey_scorer.grade_respondent(user_questions).score for user_questions in respondents] == [0, 2]
+    assert survey_scorer.score(survey_scorer.encode_rows(create_rows(respondents))).respondent_scores.tolist() == [0, 2]
+
+
+def test_unknown_question_is_not_graded():
+    question = SimpleNamespace(
+        id=uuid.uuid4(),
+        type=QuestionTypeEnum.choose_one.value,
+        is_required=True,
+        score=1,
+        answers=[SimpleNamespace(text="a", is_correct=True)]
+    )
+    respondents = [[(uuid.uuid4(), ["a"]), (question.id, ["a"])]]
+    survey_scorer = SurveyScorer([question])
+
+    respondent_grade = survey_scorer.grade_respondent(respondents[0])
+    survey_scores = survey_scorer.score(survey_scorer.encode_rows(create_rows(respondents)))
+
+    assert respondent_grade.score == 1
+    assert [question_grade.is_correct for question_grade in respondent_grade.question_grades] == [False, True]
+    assert survey_scores.respondent_scores.tolist() == [1]
+    assert survey_scores.result_is_correct.tolist() == [False, True]
+    assert survey_scores.question_result_counts.tolist() == [1]
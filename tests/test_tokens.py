@@ -0,0 +1,51 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import jwt
+import pytest
+
+import config
+from fastapp import dependencies, exceptions
+
+
+pytestmark = pytest.mark.skipif(not config.JWT_SECRET or not config.JWT_ALGORITHM, reason="JWT_SECRET is not set")
+
+
+def create_legacy_token(minutes: int) -> str:
+    # Токен в том виде, в каком его выдавали до claim type: пара токенов с общим jti
+    issued_at: datetime = datetime.now(timezone.utc)
+    payload: dict = {
+        config.SUB: str(uuid.uuid4()),
+        config.JTI: str(uuid.uuid4()),
+        config.IAT: issued_at,
+        config.EXP: issued_at + timedelta(minutes=minutes),
+    }
+
+    return jwt.encode(payload, config.JWT_SECRET, algorithm=config.JWT_ALGORITHM)
+
+
+def test_typed_tokens_are_not_interchangeable():
+    token_pair = dependencies.create_token_pair(uuid.uuid4())
+
+    assert dependencies.decode_access_token(token_pair.access.token)[config.SUB] == token_pair.access.payload[config.SUB]
+    assert dependencies.decode_refresh_token(token_pair.refresh.token)[config.SUB] == token_pair.refresh.payload[config.SUB]
+
+    with pytest.raises(jwt.exceptions.InvalidTokenError):
+        dependencies.decode_access_token(token_pair.refresh.token)
+
+    with pytest.raises(exceptions.AuthFailedException):
+        dependencies.decode_refresh_token(token_pair.access.token)
+
+
+def test_legacy_tokens_are_accepted_by_lifetime():
+    legacy_access_token: str = create_legacy_token(config.LEGACY_ACCESS_TOKEN_EXPIRES_MINUTES)
+    legacy_refresh_token: str = create_legacy_token(config.REFRESH_TOKEN_EXPIRES_MINUTES)
+
+    dependencies.decode_access_token(legacy_access_token)
+    dependencies.decode_refresh_token(legacy_refresh_token)
+
+    with pytest.raises(jwt.exceptions.InvalidTokenError):
+        dependencies.decode_access_token(legacy_refresh_token)
+
+    with pytest.raises(exceptions.AuthFailedException):
+        dependencies.decode_refresh_token(legacy_access_token)